@@ -0,0 +1,199 @@
+"""
+Núcleo vetorizado das estatísticas de eventos de /estatisticas.
+
+A janela de eventos é carregada uma única vez em colunas tipadas (código da
+fonte, código do estado, tensão, ts) e todas as métricas por fonte saem de
+reduções agrupadas: contagens por (fonte, estado) com um único bincount,
+média por bincount ponderado, e mínimo/máximo/percentis de trechos contíguos
+por fonte obtidos com uma ordenação estável do código da fonte. Em vez de uma
+varredura da lista de eventos por fonte e por métrica, cada coluna é
+percorrida um número fixo de vezes, independente do número de fontes.
+
+Sem numpy, a mesma interface usa um laço Python de passada única.
+"""
+import math
+from array import array
+from itertools import repeat
+from operator import itemgetter
+
+try:
+    import numpy as np
+    NUMPY_DISPONIVEL = True
+except ImportError:
+    NUMPY_DISPONIVEL = False
+
+ESTADOS = ('ATIVA', 'INSTAVEL', 'FALHA', 'ERRO')
+OUTRO = len(ESTADOS)
+_CODIGO_ESTADO = {estado: i for i, estado in enumerate(ESTADOS)}
+_FALHA = _CODIGO_ESTADO['FALHA']
+
+PERCENTIS = (5, 50, 95)
+
+class JanelaEventos:
+    """Eventos de uma janela em colunas tipadas; fonte é o índice em `fontes`"""
+
+    def __init__(self, fontes, fonte, estado, tensao, ts):
+        self.fontes = list(fontes)
+        self.fonte = fonte
+        self.estado = estado
+        self.tensao = tensao
+        self.ts = ts
+
+    def __len__(self):
+        return len(self.fonte)
+
+def _codificar_lote(lote, codigo_fonte):
+    """Colunas de um lote de linhas (fonte, tipo, tensao, ts), com fonte e tipo já codificados"""
+    return (
+        map(codigo_fonte.get, map(itemgetter(0), lote), repeat(-1)),
+        map(_CODIGO_ESTADO.get, map(itemgetter(1), lote), repeat(OUTRO)),
+        list(map(itemgetter(2), lote)),
+        map(itemgetter(3), lote)
+    )
+
+def carregar_janela(lotes, fontes):
+    """
+    Carrega lotes de linhas (fonte, tipo, tensao, ts), como os de
+    exportacao.ler_lotes(), em uma JanelaEventos. Fontes fora de `fontes`
+    são descartadas.
+    """
+    fontes = list(fontes)
+    codigo_fonte = {fonte: i for i, fonte in enumerate(fontes)}
+
+    if not NUMPY_DISPONIVEL:
+        colunas = (array('b'), array('B'), array('d'), array('q'))
+        for lote in lotes:
+            fonte, estado, tensao, ts = _codificar_lote(lote, codigo_fonte)
+            colunas[0].extend(fonte)
+            colunas[1].extend(estado)
+            # tensao nula ou zero não conta como leitura (mesma regra do cálculo antigo)
+            colunas[2].extend(t or math.nan for t in tensao)
+            colunas[3].extend(ts)
+        fonte, estado, tensao, ts = colunas
+        manter = [i for i, codigo in enumerate(fonte) if codigo >= 0]
+        if len(manter) != len(fonte):
+            fonte, estado, tensao, ts = (
+                array(c.typecode, (c[i] for i in manter)) for c in colunas
+            )
+        return JanelaEventos(fontes, fonte, estado, tensao, ts)
+
+    partes = ([], [], [], [])
+    for lote in lotes:
+        fonte, estado, tensao, ts = _codificar_lote(lote, codigo_fonte)
+        partes[0].append(np.fromiter(fonte, dtype=np.int8, count=len(lote)))
+        partes[1].append(np.fromiter(estado, dtype=np.uint8, count=len(lote)))
+        # None vira NaN na conversão; zero também não conta como leitura
+        tensoes = np.array(tensao, dtype=np.float64)
+        tensoes[tensoes == 0] = np.nan
+        partes[2].append(tensoes)
+        partes[3].append(np.fromiter(ts, dtype=np.int64, count=len(lote)))
+
+    tipos = (np.int8, np.uint8, np.float64, np.int64)
+    fonte, estado, tensao, ts = (
+        np.concatenate(p) if p else np.empty(0, dtype=t) for p, t in zip(partes, tipos)
+    )
+    if len(fonte) and fonte.min() < 0:
+        manter = fonte >= 0
+        fonte, estado, tensao, ts = fonte[manter], estado[manter], tensao[manter], ts[manter]
+    return JanelaEventos(fontes, fonte, estado, tensao, ts)
+
+def _percentil_ordenado(valores, p):
+    """Percentil com interpolação linear (mesmo método padrão do numpy)"""
+    posicao = (len(valores) - 1) * p / 100.0
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicao - inferior)
+
+def _resultado_vazio():
+    return {
+        'total_eventos': 0,
+        'eventos_estado': {estado: 0 for estado in ESTADOS},
+        'leituras_tensao': 0,
+        'tensao_media': None,
+        'tensao_min': None,
+        'tensao_max': None,
+        'percentis_tensao': {},
+        'ultima_falha_ms': None
+    }
+
+def estatisticas_por_fonte(janela, percentis=PERCENTIS):
+    """
+    Contagens por estado, tensão (média, mín., máx., percentis) e último
+    evento FALHA de cada fonte da janela.
+    """
+    if NUMPY_DISPONIVEL and not isinstance(janela.fonte, array):
+        return _estatisticas_numpy(janela, percentis)
+    return _estatisticas_python(janela, percentis)
+
+def _estatisticas_numpy(janela, percentis):
+    n_fontes = len(janela.fontes)
+    n_estados = OUTRO + 1
+    fonte = janela.fonte.astype(np.intp)
+
+    contagens = np.bincount(
+        fonte * n_estados + janela.estado, minlength=n_fontes * n_estados
+    ).reshape(n_fontes, n_estados)
+
+    # Tensões válidas agrupadas por fonte (ordenação estável de int8, linear):
+    # cada fonte vira um trecho contíguo para mínimo, máximo e percentis
+    validas = ~np.isnan(janela.tensao)
+    fonte_v = fonte[validas]
+    tensao_v = janela.tensao[validas]
+    tensao_agrupada = tensao_v[np.argsort(fonte_v, kind='stable')]
+    n_validas = np.bincount(fonte_v, minlength=n_fontes)
+    somas = np.bincount(fonte_v, weights=tensao_v, minlength=n_fontes)
+    limites = np.concatenate(([0], np.cumsum(n_validas)))
+
+    ultima_falha = np.full(n_fontes, -1, dtype=np.int64)
+    falhas = janela.estado == _FALHA
+    np.maximum.at(ultima_falha, fonte[falhas], janela.ts[falhas])
+
+    resultado = {}
+    for i, nome in enumerate(janela.fontes):
+        item = _resultado_vazio()
+        item['total_eventos'] = int(contagens[i].sum())
+        item['eventos_estado'] = {estado: int(contagens[i, j]) for j, estado in enumerate(ESTADOS)}
+        n = int(n_validas[i])
+        if n:
+            trecho = tensao_agrupada[limites[i]:limites[i + 1]]
+            item['leituras_tensao'] = n
+            item['tensao_media'] = float(somas[i] / n)
+            item['tensao_min'] = float(trecho.min())
+            item['tensao_max'] = float(trecho.max())
+            item['percentis_tensao'] = {
+                p: float(v) for p, v in zip(percentis, np.percentile(trecho, percentis))
+            }
+        if ultima_falha[i] >= 0:
+            item['ultima_falha_ms'] = int(ultima_falha[i])
+        resultado[nome] = item
+    return resultado
+
+def _estatisticas_python(janela, percentis):
+    n_fontes = len(janela.fontes)
+    contagens = [[0] * (OUTRO + 1) for _ in range(n_fontes)]
+    tensoes = [[] for _ in range(n_fontes)]
+    ultima_falha = [None] * n_fontes
+
+    for fonte, estado, tensao, ts in zip(janela.fonte, janela.estado, janela.tensao, janela.ts):
+        contagens[fonte][estado] += 1
+        if tensao == tensao:  # descarta NaN
+            tensoes[fonte].append(tensao)
+        if estado == _FALHA and (ultima_falha[fonte] is None or ts > ultima_falha[fonte]):
+            ultima_falha[fonte] = ts
+
+    resultado = {}
+    for i, nome in enumerate(janela.fontes):
+        item = _resultado_vazio()
+        item['total_eventos'] = sum(contagens[i])
+        item['eventos_estado'] = {estado: contagens[i][j] for j, estado in enumerate(ESTADOS)}
+        valores = tensoes[i]
+        if valores:
+            valores.sort()
+            item['leituras_tensao'] = len(valores)
+            item['tensao_media'] = math.fsum(valores) / len(valores)
+            item['tensao_min'] = valores[0]
+            item['tensao_max'] = valores[-1]
+            item['percentis_tensao'] = {p: _percentil_ordenado(valores, p) for p in percentis}
+        item['ultima_falha_ms'] = ultima_falha[i]
+        resultado[nome] = item
+    return resultado
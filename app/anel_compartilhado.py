@@ -0,0 +1,324 @@
+"""
+Anel de instantâneos em memória compartilhada (implantação multiprocesso).
+
+Na implantação multiprocesso (servidor_multiprocesso.py) um único processo
+é dono do hardware, da máquina de estados e dos rastreadores; N workers de
+API sem estado próprio servem HTTP e WebSocket a partir do que ele publica
+aqui. Cada ciclo do motor de aquisição vira um registro no anel:
+
+    cabeçalho | contadores de versão | slot 0 | slot 1 | ... | slot N-1
+
+O slot de um ciclo é seq % slots. O escritor marca o slot com uma versão
+ímpar (2*seq - 1) enquanto copia o ciclo e com 2*seq ao terminar, e só
+então avança seq_escrita no cabeçalho. O leitor confere a versão antes e
+depois da cópia e o CRC32 do conteúdo, e repete a leitura se algo mudou no
+meio (seqlock); o CRC cobre também CPUs com ordenação fraca de memória,
+como o ARM do Raspberry Pi, em que a versão pode ficar visível antes do
+conteúdo. Ninguém espera lock: o escritor nunca bloqueia por causa de um
+worker lento, e um worker atrasado ainda encontra os últimos `slots`
+ciclos para repassar aos seus clientes WebSocket.
+
+Cada registro leva o JSON dos dados do ciclo (o mesmo quadro v1 do hub,
+serializado uma vez no processo de aquisição) e um JSON de extras com o
+estado que só o dono da aquisição mantém: apagão em curso e minutos
+abertos dos rollups.
+
+Os contadores de versão propagam entre processos as invalidações que num
+processo único são chamadas diretas: eventos gravados (CONTADOR_DADOS) e
+configuração alterada (CONTADOR_CONFIG). Cada processo incrementa apenas a
+sua própria célula, indexada pelo índice do processo (0 = aquisição), e a
+versão é a soma das células: um só escritor por célula, sem lock entre
+processos.
+"""
+import json
+import logging
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from multiprocessing import shared_memory
+
+from aquisicao import Instantaneo
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b'PEAN'
+VERSAO_FORMATO = 1
+MAX_PROCESSOS = 64
+
+CONTADOR_DADOS = 0
+CONTADOR_CONFIG = 1
+_CONTADORES = 2
+
+# mágico, formato, hardware, slots, tamanho do slot, início do processo de aquisição (epoch ms)
+_CABECALHO = struct.Struct('<4sHHIIq')
+_SEQ = struct.Struct('<Q')
+_OFFSET_SEQ = 32
+_OFFSET_CONTADORES = 64
+_SOMA_CONTADORES = struct.Struct(f'<{MAX_PROCESSOS}Q')
+_OFFSET_SLOTS = _OFFSET_CONTADORES + _CONTADORES * MAX_PROCESSOS * 8
+
+# versão, ts_ms, monotônico do escritor, bytes de dados, bytes de extras, crc32
+_SLOT = struct.Struct('<QqdIII4x')
+
+class AnelInstantaneos:
+    """
+    Use criar() no processo de aquisição (dono e único escritor) e abrir()
+    nos workers. fechar() solta o mapeamento; destruir() remove o segmento.
+    """
+
+    def __init__(self, memoria, dono):
+        self._memoria = memoria
+        self._buf = memoria.buf
+        self.dono = dono
+        magico, formato, hardware, slots, tamanho_slot, inicio_ms = _CABECALHO.unpack_from(self._buf, 0)
+        if magico != MAGICO or formato != VERSAO_FORMATO:
+            memoria.close()
+            raise ValueError(f"Segmento {memoria.name} não é um anel PowerEdge v{VERSAO_FORMATO}")
+        self.nome = memoria.name
+        self.hardware = bool(hardware)
+        self.slots = slots
+        self.tamanho_slot = tamanho_slot
+        self.inicio_ms = inicio_ms
+        self.capacidade = tamanho_slot - _SLOT.size
+
+    @classmethod
+    def criar(cls, nome, slots=16, tamanho_slot=16384, inicio_ms=0, hardware=False):
+        tamanho = _OFFSET_SLOTS + slots * tamanho_slot
+        memoria = shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+        memoria.buf[:tamanho] = bytes(tamanho)
+        _CABECALHO.pack_into(memoria.buf, 0, MAGICO, VERSAO_FORMATO, int(bool(hardware)),
+                             slots, tamanho_slot, int(inicio_ms))
+        return cls(memoria, dono=True)
+
+    @classmethod
+    def abrir(cls, nome):
+        return cls(shared_memory.SharedMemory(name=nome), dono=False)
+
+    def fechar(self):
+        self._buf = None
+        self._memoria.close()
+
+    def destruir(self):
+        """Remove o segmento (só o dono; os workers já devem ter saído)"""
+        self.fechar()
+        try:
+            self._memoria.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _base(self, seq):
+        return _OFFSET_SLOTS + (seq % self.slots) * self.tamanho_slot
+
+    def seq_atual(self):
+        """Último ciclo publicado (0 antes do primeiro)"""
+        return _SEQ.unpack_from(self._buf, _OFFSET_SEQ)[0]
+
+    def publicar(self, seq, ts_ms, monotonico, dados, extras=b''):
+        """Grava o ciclo `seq` (bytes JSON); chamado só pelo processo de aquisição"""
+        tamanho = len(dados) + len(extras)
+        if tamanho > self.capacidade:
+            raise ValueError(f"Ciclo de {tamanho} bytes excede o slot ({self.capacidade} bytes)")
+        buf = self._buf
+        base = self._base(seq)
+        inicio = base + _SLOT.size
+        crc = zlib.crc32(extras, zlib.crc32(dados))
+        # Versão ímpar: escrita em andamento
+        _SLOT.pack_into(buf, base, 2 * seq - 1, ts_ms, monotonico, len(dados), len(extras), crc)
+        buf[inicio:inicio + len(dados)] = dados
+        buf[inicio + len(dados):inicio + tamanho] = extras
+        _SEQ.pack_into(buf, base, 2 * seq)
+        _SEQ.pack_into(buf, _OFFSET_SEQ, seq)
+
+    def ler(self, seq=None, tentativas=8):
+        """
+        (seq, ts_ms, monotonico, dados, extras) do ciclo `seq` (o último por
+        padrão), ou None se ele ainda não existe ou já foi sobrescrito.
+        """
+        buf = self._buf
+        for _ in range(tentativas):
+            atual = self.seq_atual()
+            alvo = atual if seq is None else seq
+            if alvo <= 0 or alvo > atual or atual - alvo >= self.slots:
+                return None
+            base = self._base(alvo)
+            versao, ts_ms, monotonico, n_dados, n_extras, crc = _SLOT.unpack_from(buf, base)
+            if versao != 2 * alvo:
+                if seq is not None and versao > 2 * alvo:
+                    return None
+                continue
+            inicio = base + _SLOT.size
+            conteudo = bytes(buf[inicio:inicio + n_dados + n_extras])
+            if _SEQ.unpack_from(buf, base)[0] != versao or zlib.crc32(conteudo) != crc:
+                continue
+            return alvo, ts_ms, monotonico, conteudo[:n_dados], conteudo[n_dados:]
+        return None
+
+    def incrementar(self, contador, indice):
+        """Incrementa a célula do processo `indice` (só ele escreve nela)"""
+        offset = _OFFSET_CONTADORES + (contador * MAX_PROCESSOS + indice) * 8
+        _SEQ.pack_into(self._buf, offset, _SEQ.unpack_from(self._buf, offset)[0] + 1)
+
+    def versao(self, contador):
+        """Soma das células de todos os processos"""
+        return sum(_SOMA_CONTADORES.unpack_from(self._buf, _OFFSET_CONTADORES + contador * MAX_PROCESSOS * 8))
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100.0))]
+
+class LeitorAnel:
+    """
+    Lado do worker: ocupa o lugar do MotorAquisicao (mesma interface de
+    instantaneo/idade/assinar/metricas) sem tocar no hardware. Uma thread
+    consulta seq_atual() a cada `intervalo` segundos, decodifica cada ciclo
+    novo uma única vez e notifica os ouvintes, como o motor faria. Também
+    acompanha os contadores de versão e chama ao_mudar_dados/ao_mudar_config
+    quando outro processo grava eventos ou altera a configuração.
+    """
+
+    def __init__(self, anel, intervalo=0.01, ao_mudar_dados=None, ao_mudar_config=None, janela=600):
+        self.anel = anel
+        self.intervalo = intervalo
+        self._ao_mudar_dados = ao_mudar_dados
+        self._ao_mudar_config = ao_mudar_config
+
+        self._instantaneo = None
+        self._extras = {}
+        self._ouvintes = []
+        self._parar = threading.Event()
+        self._thread = None
+        self._versao_dados = anel.versao(CONTADOR_DADOS)
+        self._versao_config = anel.versao(CONTADOR_CONFIG)
+
+        # Atraso entre a publicação no processo de aquisição e a leitura aqui
+        self._atrasos = deque(maxlen=janela)
+        self.ciclos = 0
+        self.ciclos_perdidos = 0
+        self.erros = 0
+
+    def assinar(self, ouvinte):
+        """callable(instantaneo) chamado na thread do leitor a cada ciclo novo"""
+        self._ouvintes.append(ouvinte)
+
+    def instantaneo(self):
+        return self._instantaneo
+
+    def idade(self, instantaneo=None):
+        # time.monotonic() é o mesmo relógio do sistema em todos os processos
+        instantaneo = instantaneo or self._instantaneo
+        if instantaneo is None:
+            return None
+        return time.monotonic() - instantaneo.monotonico
+
+    def extras(self):
+        """Estado do processo de aquisição publicado com o último ciclo"""
+        return self._extras
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self.sincronizar()
+        self._thread = threading.Thread(target=self._executar, name="leitor-anel", daemon=True)
+        self._thread.start()
+        logger.info(f"Leitor do anel {self.anel.nome} iniciado")
+
+    def parar(self, timeout=5.0):
+        if not self._thread:
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                self.erros += 1
+                logger.error(f"Erro ao ler o anel de aquisição: {e}")
+
+    def sincronizar(self):
+        """Consome os ciclos novos e as mudanças de versão desde a última chamada"""
+        anel = self.anel
+        atual = anel.seq_atual()
+        ultimo = self._instantaneo.seq if self._instantaneo else 0
+        if atual > ultimo:
+            # Na partida só interessa o último ciclo; depois, todos os que o
+            # anel ainda guarda, para o hub v2 não pular deltas
+            primeiro = atual if not ultimo else max(ultimo + 1, atual - anel.slots + 1)
+            if ultimo:
+                self.ciclos_perdidos += primeiro - ultimo - 1
+            for seq in range(primeiro, atual + 1):
+                registro = anel.ler(seq)
+                if registro is None:
+                    self.ciclos_perdidos += 1
+                    continue
+                # O atraso da leitura inicial é o tempo até o worker subir
+                self._publicar(registro, medir=bool(ultimo))
+
+        versao = anel.versao(CONTADOR_CONFIG)
+        if versao != self._versao_config:
+            self._versao_config = versao
+            if self._ao_mudar_config:
+                self._ao_mudar_config()
+        versao = anel.versao(CONTADOR_DADOS)
+        if versao != self._versao_dados:
+            self._versao_dados = versao
+            if self._ao_mudar_dados:
+                self._ao_mudar_dados()
+
+    def _publicar(self, registro, medir=True):
+        seq, ts_ms, monotonico, dados, extras = registro
+        mensagem = dados.decode('utf-8')
+        instantaneo = Instantaneo(seq, ts_ms, monotonico, json.loads(mensagem), mensagem)
+        self._extras = json.loads(extras) if extras else {}
+        self._instantaneo = instantaneo
+        self.ciclos += 1
+        if medir:
+            self._atrasos.append(time.monotonic() - monotonico)
+
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(instantaneo)
+            except Exception as e:
+                logger.error(f"Erro ao notificar ouvinte do anel: {e}")
+
+    def metricas(self):
+        atrasos = sorted(self._atrasos)
+        idade = self.idade()
+        return {
+            'ativo': bool(self._thread and self._thread.is_alive()),
+            'origem': 'anel',
+            'anel': self.anel.nome,
+            'ciclos': self.ciclos,
+            'ciclos_perdidos': self.ciclos_perdidos,
+            'erros': self.erros,
+            'seq': self._instantaneo.seq if self._instantaneo else 0,
+            'seq_anel': self.anel.seq_atual(),
+            'idade_ms': round(idade * 1000, 1) if idade is not None else None,
+            'atraso_leitura_ms': {
+                'p50': round(_percentil(atrasos, 50) * 1000, 3),
+                'p99': round(_percentil(atrasos, 99) * 1000, 3),
+                'max': round(atrasos[-1] * 1000, 3)
+            } if atrasos else None
+        }
+
+class ApagoesRemotos:
+    """situacao() do RastreadorApagoes do processo de aquisição, lida do anel"""
+
+    def __init__(self, leitor):
+        self.leitor = leitor
+
+    def situacao(self):
+        situacao = self.leitor.extras().get('apagao')
+        return tuple(situacao) if situacao else (False, None, None)
+
+class RollupsRemotos:
+    """balde_aberto() do AgregadorRollups do processo de aquisição, lido do anel"""
+
+    def __init__(self, leitor):
+        self.leitor = leitor
+
+    def balde_aberto(self, fonte):
+        return self.leitor.extras().get('baldes', {}).get(fonte)
@@ -0,0 +1,96 @@
+"""
+Rastreamento incremental de apagões totais.
+
+Um apagão total é o período em que TODAS as fontes estão em FALHA ao mesmo
+tempo. Em vez de reprocessar o histórico de eventos a cada consulta, a
+máquina de estados informa cada estado observado e o rastreador mantém o
+conjunto de fontes em FALHA: início e fim de apagão são detectados quando o
+contador atinge ou deixa o total de fontes. Os períodos são persistidos em
+`apagoes`, e o último fica em memória, então "tempo desde o último apagão"
+é uma consulta O(1) que sobrevive a reinícios.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS apagoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        inicio_ms INTEGER NOT NULL UNIQUE,
+        fim_ms INTEGER
+    )
+"""
+
+class RastreadorApagoes:
+    def __init__(self, escritor, fontes):
+        self.escritor = escritor
+        self.fontes = frozenset(fontes)
+        self._em_falha = set()
+        self._observadas = set()
+        self._lock = threading.Lock()
+
+        # Apagão em andamento (inicio_ms) e o último concluído (inicio_ms, fim_ms)
+        self.inicio_atual_ms = None
+        self.ultimo = None
+
+    def carregar(self, conn):
+        """Recupera o último apagão; um apagão aberto continua até a 1ª observação completa"""
+        row = conn.execute(
+            "SELECT inicio_ms, fim_ms FROM apagoes ORDER BY inicio_ms DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return
+        with self._lock:
+            if row[1] is None:
+                self.inicio_atual_ms = row[0]
+                anterior = conn.execute(
+                    "SELECT inicio_ms, fim_ms FROM apagoes WHERE fim_ms IS NOT NULL "
+                    "ORDER BY inicio_ms DESC LIMIT 1"
+                ).fetchone()
+                self.ultimo = tuple(anterior) if anterior else None
+                logger.info("Apagão total em andamento recuperado da execução anterior")
+            else:
+                self.ultimo = (row[0], row[1])
+
+    def observar(self, fonte, estado, ts_ms):
+        """Atualiza o contador de fontes em FALHA e detecta início/fim de apagão"""
+        if fonte not in self.fontes:
+            return
+        with self._lock:
+            self._observadas.add(fonte)
+            if estado == 'FALHA':
+                self._em_falha.add(fonte)
+            else:
+                self._em_falha.discard(fonte)
+
+            # Enquanto nem todas as fontes foram observadas, o estado é incerto
+            if len(self._observadas) < len(self.fontes):
+                return
+
+            todas_em_falha = len(self._em_falha) == len(self.fontes)
+            if todas_em_falha and self.inicio_atual_ms is None:
+                self.inicio_atual_ms = ts_ms
+                self.escritor.enfileirar(('apagao_inicio', ts_ms))
+                logger.warning("Apagão total: todas as fontes em FALHA")
+            elif not todas_em_falha and self.inicio_atual_ms is not None:
+                self.ultimo = (self.inicio_atual_ms, ts_ms)
+                self.escritor.enfileirar(('apagao_fim', self.inicio_atual_ms, ts_ms))
+                self.inicio_atual_ms = None
+                logger.info(f"Apagão total encerrado por recuperação de {fonte}")
+
+    def gravar_item(self, conn, item):
+        """Aplica um item enfileirado (executa na thread do escritor)"""
+        if item[0] == 'apagao_inicio':
+            conn.execute("INSERT OR IGNORE INTO apagoes (inicio_ms) VALUES (?)", (item[1],))
+        elif item[0] == 'apagao_fim':
+            conn.execute("UPDATE apagoes SET fim_ms = ? WHERE inicio_ms = ?", (item[2], item[1]))
+
+    def situacao(self):
+        """(em_apagao, inicio_ms do apagão atual ou do último, fim_ms do último)"""
+        with self._lock:
+            if self.inicio_atual_ms is not None:
+                return True, self.inicio_atual_ms, None
+            if self.ultimo is not None:
+                return False, self.ultimo[0], self.ultimo[1]
+            return False, None, None
@@ -0,0 +1,199 @@
+"""
+Motor de aquisição: thread de tempo real dona exclusiva do hardware.
+
+Uma única thread chama a fonte de amostras (ADS1115, leitor em rajadas ou
+simulador) no período de aquisição e publica o resultado como um
+Instantaneo imutável. Publicar é trocar uma referência, atômico no CPython:
+leitores (/status, o hub WebSocket, métricas) pegam a referência vigente
+sem lock e sem nunca ver um quadro pela metade, o mesmo efeito de um
+seqlock sem o laço de releitura. Ninguém fora desta thread toca o
+barramento I2C, e uma transação I2C lenta atrasa só a aquisição, não o
+event loop nem os workers do Flask.
+
+O agendamento é por prazo absoluto (próximo = anterior + período), então o
+tempo gasto na leitura não se acumula como deriva. O atraso de cada ciclo
+em relação ao prazo (jitter) e o período efetivo entre ciclos são medidos e
+expostos em metricas().
+
+A fonte de amostras e o relógio são plugáveis: amostrar(ts_ms) recebe o
+instante do ciclo no relógio do motor, e um relógio virtual pode substituir
+RelogioReal para reprodução ou geração acelerada.
+"""
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# seq: contador de ciclos; ts_ms: epoch ms do ciclo; monotonico: relógio do
+# motor no instante da publicação (base da idade); dados: {fonte: {...}};
+# mensagem: dados já serializados em JSON, quando quem publica já os tem
+Instantaneo = namedtuple('Instantaneo', ('seq', 'ts_ms', 'monotonico', 'dados', 'mensagem'),
+                         defaults=(None,))
+
+class RelogioReal:
+    """Relógio de parede do sistema"""
+
+    def monotonico(self):
+        return time.monotonic()
+
+    def epoch_ms(self):
+        return int(time.time() * 1000)
+
+    def esperar(self, segundos, parar):
+        """Dorme até `segundos` ou até o evento `parar`; retorna True se parar"""
+        return parar.wait(segundos)
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100.0))]
+
+class MotorAquisicao:
+    """
+    amostrar: callable(ts_ms) -> dados do ciclo, chamado só pela thread do motor
+    periodo: segundos entre ciclos, ou callable sem argumentos (lido a cada ciclo)
+    relogio: RelogioReal ou equivalente virtual
+    janela_jitter: quantos ciclos recentes entram nas estatísticas de jitter
+    """
+
+    def __init__(self, amostrar, periodo, relogio=None, janela_jitter=600):
+        self._amostrar = amostrar
+        self._periodo = periodo if callable(periodo) else (lambda: periodo)
+        self.relogio = relogio or RelogioReal()
+
+        self._instantaneo = None
+        self._ouvintes = []
+        self._parar = threading.Event()
+        self._thread = None
+
+        # Amostras recentes (segundos) para as métricas de jitter
+        self._atrasos = deque(maxlen=janela_jitter)
+        self._intervalos = deque(maxlen=janela_jitter)
+        self._duracoes = deque(maxlen=janela_jitter)
+        self.ciclos = 0
+        self.ciclos_perdidos = 0
+        self.erros = 0
+
+    def assinar(self, ouvinte):
+        """
+        Registra callable(instantaneo) chamado a cada publicação, na thread
+        do motor. Deve ser rápido e não bloquear (ex.: call_soon_threadsafe).
+        """
+        self._ouvintes.append(ouvinte)
+
+    def instantaneo(self):
+        """Último Instantaneo publicado (None antes do primeiro ciclo)"""
+        return self._instantaneo
+
+    def idade(self, instantaneo=None):
+        """Segundos desde a publicação do instantâneo (o vigente por padrão)"""
+        instantaneo = instantaneo or self._instantaneo
+        if instantaneo is None:
+            return None
+        return self.relogio.monotonico() - instantaneo.monotonico
+
+    def iniciar(self):
+        """Inicia a thread de aquisição (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="aquisicao", daemon=True)
+        self._thread.start()
+        logger.info("Motor de aquisição iniciado")
+
+    def parar(self, timeout=5.0):
+        if not self._thread:
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+        logger.info("Motor de aquisição encerrado")
+
+    def _executar(self):
+        relogio = self.relogio
+        prazo = relogio.monotonico()
+        inicio_anterior = None
+        while True:
+            espera = prazo - relogio.monotonico()
+            if espera > 0 and relogio.esperar(espera, self._parar):
+                break
+            if self._parar.is_set():
+                break
+
+            inicio = relogio.monotonico()
+            self._atrasos.append(inicio - prazo)
+            if inicio_anterior is not None:
+                self._intervalos.append(inicio - inicio_anterior)
+            inicio_anterior = inicio
+
+            self.ciclo()
+            self._duracoes.append(relogio.monotonico() - inicio)
+
+            periodo = max(float(self._periodo()), 0.001)
+            prazo += periodo
+            agora = relogio.monotonico()
+            if agora > prazo:
+                # Ciclo mais longo que o período: não tenta recuperar em rajada
+                perdidos = int((agora - prazo) // periodo) + 1
+                self.ciclos_perdidos += perdidos
+                prazo += perdidos * periodo
+
+    def ciclo(self):
+        """Executa um ciclo de aquisição e publica o instantâneo"""
+        ts_ms = self.relogio.epoch_ms()
+        try:
+            dados = self._amostrar(ts_ms)
+        except Exception as e:
+            self.erros += 1
+            logger.error(f"Erro no ciclo de aquisição: {e}")
+            return None
+
+        anterior = self._instantaneo
+        instantaneo = Instantaneo(
+            (anterior.seq if anterior else 0) + 1, ts_ms, self.relogio.monotonico(), dados
+        )
+        self._instantaneo = instantaneo
+        self.ciclos += 1
+
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(instantaneo)
+            except Exception as e:
+                logger.error(f"Erro ao notificar ouvinte da aquisição: {e}")
+        return instantaneo
+
+    def metricas(self):
+        atrasos = sorted(self._atrasos)
+        intervalos = list(self._intervalos)
+        duracoes = sorted(self._duracoes)
+        idade = self.idade()
+        resultado = {
+            'ativo': bool(self._thread and self._thread.is_alive()),
+            'periodo_s': self._periodo(),
+            'ciclos': self.ciclos,
+            'ciclos_perdidos': self.ciclos_perdidos,
+            'erros': self.erros,
+            'seq': self._instantaneo.seq if self._instantaneo else 0,
+            'idade_ms': round(idade * 1000, 1) if idade is not None else None,
+            'jitter_ms': None,
+            'periodo_efetivo_s': None,
+            'duracao_ciclo_ms': None
+        }
+        if atrasos:
+            resultado['jitter_ms'] = {
+                'media': round(sum(atrasos) / len(atrasos) * 1000, 3),
+                'p50': round(_percentil(atrasos, 50) * 1000, 3),
+                'p99': round(_percentil(atrasos, 99) * 1000, 3),
+                'max': round(atrasos[-1] * 1000, 3)
+            }
+        if intervalos:
+            media = sum(intervalos) / len(intervalos)
+            resultado['periodo_efetivo_s'] = {
+                'media': round(media, 6),
+                'desvio': round((sum((i - media) ** 2 for i in intervalos) / len(intervalos)) ** 0.5, 6)
+            }
+        if duracoes:
+            resultado['duracao_ciclo_ms'] = {
+                'p50': round(_percentil(duracoes, 50) * 1000, 3),
+                'max': round(duracoes[-1] * 1000, 3)
+            }
+        return resultado
@@ -0,0 +1,192 @@
+"""
+Aquisição em rajadas do ADS1115 em modo de conversão contínua.
+
+No modo padrão cada ciclo lê cada canal uma vez por AnalogIn.voltage: o
+ADS1115 faz uma conversão single-shot (escrita do registrador de
+configuração e espera ativa pelo bit OS) e o ciclo vê uma única amostra de
+cada fonte. Uma queda mais curta que INTERVALO_LEITURA passa despercebida e
+uma amostra ruidosa basta para trocar o estado.
+
+Aqui uma thread dedicada é a única dona do ADC, configurado em modo contínuo
+a uma taxa alta (até 860 SPS). Ela percorre os canais em rodízio: troca o
+mux (a biblioteca espera duas conversões para estabilizar) e lê uma rajada
+de N conversões pelo caminho rápido (só a leitura do registrador de
+conversão, sem reescrever o ponteiro), no ritmo da taxa de conversão. Os
+valores brutos de cada rajada entram em acumuladores inteiros por canal
+(n, soma, soma dos quadrados, mínimo, máximo) e o loop de aquisição, uma vez
+por ciclo, troca os acumuladores e recebe média, mínimo, máximo e RMS em
+volts de todas as rajadas desde o ciclo anterior.
+"""
+import logging
+import math
+import threading
+import time
+from operator import mul
+
+logger = logging.getLogger(__name__)
+
+# Fundo de escala (V) por ganho do PGA, como em adafruit_ads1x15.analog_in
+PGA_VOLTS = {2 / 3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
+REDUCOES = ('media', 'min', 'max', 'rms')
+
+def escala_volts(ganho):
+    """Volts por unidade do valor bruto (mesma conversão de AnalogIn.voltage)"""
+    return PGA_VOLTS[ganho] / 32767
+
+class _Acumulador:
+    __slots__ = ('n', 'soma', 'soma_quad', 'minimo', 'maximo', 'rajadas')
+
+    def __init__(self):
+        self.n = 0
+        self.soma = 0
+        self.soma_quad = 0
+        self.minimo = None
+        self.maximo = None
+        self.rajadas = 0
+
+    def adicionar(self, amostras):
+        self.n += len(amostras)
+        self.soma += sum(amostras)
+        self.soma_quad += sum(map(mul, amostras, amostras))
+        menor = min(amostras)
+        maior = max(amostras)
+        if self.minimo is None or menor < self.minimo:
+            self.minimo = menor
+        if self.maximo is None or maior > self.maximo:
+            self.maximo = maior
+        self.rajadas += 1
+
+    def reduzir(self, escala):
+        return {
+            'media': self.soma / self.n * escala,
+            'min': self.minimo * escala,
+            'max': self.maximo * escala,
+            'rms': math.sqrt(self.soma_quad / self.n) * escala,
+            'amostras': self.n,
+            'rajadas': self.rajadas
+        }
+
+class LeitorRajadas:
+    """
+    Thread leitora do ADS1115 em modo contínuo.
+
+    ads: objeto ADS1115 já criado com mode=Mode.CONTINUOUS e data_rate=taxa
+    canais: dict nome da fonte -> pino (ADS.P0..P3)
+    escala: volts por unidade bruta, ver escala_volts()
+    """
+
+    def __init__(self, ads, canais, escala, taxa=860, amostras_por_rajada=32):
+        self.ads = ads
+        self.canais = dict(canais)
+        self.escala = escala
+        self.taxa = taxa
+        self.amostras_por_rajada = max(1, int(amostras_por_rajada))
+
+        self._acumuladores = {nome: _Acumulador() for nome in self.canais}
+        self._ultimo = {}
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Contadores expostos em metricas()
+        self.rajadas = 0
+        self.amostras = 0
+        self.erros = 0
+        self.ultimo_rodizio_ms = 0.0
+        self.cpu_s = 0.0
+        self._iniciado_em = None
+
+    def iniciar(self):
+        """Inicia a thread leitora (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._iniciado_em = time.monotonic()
+        self._thread = threading.Thread(target=self._executar, name="leitor-ads", daemon=True)
+        self._thread.start()
+        logger.info(f"Leitor em rajadas do ADS1115 iniciado ({self.taxa} SPS, "
+                    f"{self.amostras_por_rajada} amostras por rajada)")
+
+    def parar(self, timeout=2.0):
+        if not self._thread:
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+        logger.info("Leitor em rajadas do ADS1115 encerrado")
+
+    def _executar(self):
+        while not self._parar.is_set():
+            inicio = time.perf_counter()
+            for nome, pino in self.canais.items():
+                try:
+                    amostras = self._ler_rajada(pino)
+                except Exception as e:
+                    self.erros += 1
+                    # Evitar inundar o log com um barramento I2C em falha
+                    if self.erros == 1 or self.erros % 1000 == 0:
+                        logger.error(f"Erro na rajada do canal {nome}: {e} ({self.erros} erros)")
+                    self._parar.wait(0.1)
+                    continue
+                with self._lock:
+                    self._acumuladores[nome].adicionar(amostras)
+                    self.rajadas += 1
+                    self.amostras += len(amostras)
+            self.ultimo_rodizio_ms = (time.perf_counter() - inicio) * 1000
+            self.cpu_s = time.thread_time()
+
+    def _ler_rajada(self, pino):
+        """
+        A primeira leitura troca o mux e espera a estabilização; as seguintes
+        caem no caminho rápido da biblioteca (mesmo pino em modo contínuo).
+        As leituras são espaçadas pelo período de conversão para não repetir
+        a mesma conversão.
+        """
+        ads = self.ads
+        periodo = 1.0 / self.taxa
+        amostras = [ads.read(pino)]
+        proxima = time.perf_counter() + periodo
+        for _ in range(self.amostras_por_rajada - 1):
+            espera = proxima - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            amostras.append(ads.read(pino))
+            proxima += periodo
+        return amostras
+
+    def coletar(self):
+        """
+        Reduz as rajadas acumuladas desde a última coleta e reinicia os
+        acumuladores. Chamado uma vez por ciclo pelo loop de aquisição; um
+        canal sem rajada nova repete a última redução com 'amostras': 0.
+        """
+        with self._lock:
+            acumuladores = self._acumuladores
+            self._acumuladores = {nome: _Acumulador() for nome in self.canais}
+
+        resultado = {}
+        for nome, acumulador in acumuladores.items():
+            if acumulador.n:
+                self._ultimo[nome] = acumulador.reduzir(self.escala)
+                resultado[nome] = self._ultimo[nome]
+            elif nome in self._ultimo:
+                resultado[nome] = dict(self._ultimo[nome], amostras=0, rajadas=0)
+        return resultado
+
+    def ultimo(self, nome):
+        """Última redução coletada da fonte (None antes da primeira coleta)"""
+        return self._ultimo.get(nome)
+
+    def metricas(self):
+        decorrido = time.monotonic() - self._iniciado_em if self._iniciado_em else 0.0
+        with self._lock:
+            return {
+                'ativo': bool(self._thread and self._thread.is_alive()),
+                'taxa_sps': self.taxa,
+                'amostras_por_rajada': self.amostras_por_rajada,
+                'rajadas': self.rajadas,
+                'amostras': self.amostras,
+                'amostras_por_segundo': round(self.amostras / decorrido, 1) if decorrido else 0.0,
+                'ultimo_rodizio_ms': round(self.ultimo_rodizio_ms, 2),
+                'cpu_percentual': round(100 * self.cpu_s / decorrido, 2) if decorrido else 0.0,
+                'erros': self.erros
+            }
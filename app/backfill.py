@@ -0,0 +1,379 @@
+"""
+Geração de histórico simulado (backfill) em tempo virtual.
+
+    python app/backfill.py --dias 365 --semente 42
+    python app/backfill.py --inicio 2024-01-01 --fim 2024-07-01 --passo 0.5 --banco /tmp/carga.db
+
+Os modelos de simulacao.py (os mesmos de simular_leitura_avancada) geram
+meses ou anos de ciclos com o GeradorLotes, uma hora por lote, sem esperar
+pelo relógio. Cada lote passa pelas mesmas regras do servidor ao vivo, de
+forma vetorizada:
+
+- estado por amostra com os thresholds de FONTES_CONFIG e o
+  percentual_instabilidade do banco (determinar_estado_fonte);
+- eventos nas transições de estado (o estado inicial é ATIVA, como em
+  amostrar_fontes);
+- blocos de leituras no formato de leituras.py;
+- rollups de 1 min, 1 h e 1 dia, com o tempo entre amostras atribuído ao
+  estado anterior (AgregadorRollups);
+- intervalos de estado com as somas de prefixos (intervalos.py) e apagões
+  totais (apagoes.py).
+
+A gravação usa executemany em transações grandes (um dia de dados por
+padrão) e synchronous=OFF: o banco gerado é descartável até o fim. Com a
+mesma semente, faixa e passo o banco sai igual, então os benchmarks de
+/estatisticas, /eventos e /exportar são reprodutíveis.
+
+Leituras e rollups de 1 min mais antigos que a retenção do servidor
+(LEITURAS_RETENCAO_DIAS, ROLLUP_1M_RETENCAO_DIAS) seriam apagados na
+primeira purga e não são gravados, a menos que se use --sem-retencao.
+A faixa precisa começar depois dos dados que já estão no banco.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import apagoes
+import intervalos
+import leituras
+import migracoes
+import rollups
+import simulacao
+from config import (DATABASE_PATH, FONTES_CONFIG, LEITURAS_BLOCO_SEGUNDOS,
+                    LEITURAS_RETENCAO_DIAS, ROLLUP_1M_RETENCAO_DIAS)
+
+if simulacao.NUMPY_DISPONIVEL:
+    import numpy as np
+
+ESTADOS = rollups.ESTADOS
+FALHA = ESTADOS.index('FALHA')
+HORA = 3600
+
+SQL_EVENTO = "INSERT INTO eventos (fonte, tipo, tensao, ts) VALUES (?, ?, ?, ?)"
+SQL_BLOCO = """
+    INSERT INTO leituras_blocos
+        (fonte, inicio_ms, fim_ms, n, tensao_min, tensao_max, soma, soma_quadrados, dados)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_INTERVALO = """
+    INSERT INTO intervalos_estado
+        (fonte, estado, inicio_ms, fim_ms, aberto,
+         acum_ativa_ms, acum_instavel_ms, acum_falha_ms, acum_erro_ms)
+    VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)
+"""
+SQL_APAGAO = "INSERT INTO apagoes (inicio_ms, fim_ms) VALUES (?, ?)"
+
+def criar_esquema(conn):
+    """Tabelas usadas pelo backfill (o restante é criado pelo servidor)"""
+    migracoes.garantir_esquema(conn)
+    conn.execute(leituras.SQL_CRIAR_TABELA)
+    conn.execute(leituras.SQL_CRIAR_INDICE)
+    for comando in rollups.sql_criar_tabelas():
+        conn.execute(comando)
+    conn.execute(intervalos.SQL_CRIAR_TABELA)
+    conn.execute(intervalos.SQL_CRIAR_INDICE)
+    conn.execute(apagoes.SQL_CRIAR_TABELA)
+    conn.commit()
+
+def percentual_instabilidade(conn, padrao=70):
+    """percentual_instabilidade salvo pela interface, se houver"""
+    try:
+        row = conn.execute(
+            "SELECT valor FROM configuracoes WHERE chave = 'percentual_instabilidade'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return padrao
+    return float(row[0]) if row else padrao
+
+def ultimo_dado_ms(conn):
+    """Instante do dado mais recente já gravado (None em banco vazio)"""
+    consultas = (
+        "SELECT MAX(ts) FROM eventos",
+        "SELECT MAX(fim_ms) FROM leituras_blocos",
+        "SELECT MAX(fim_ms) FROM intervalos_estado",
+        "SELECT MAX(COALESCE(fim_ms, inicio_ms)) FROM apagoes",
+        f"SELECT MAX(inicio) * 1000 FROM {rollups.TABELAS[3600]}",
+    )
+    valores = [conn.execute(sql).fetchone()[0] for sql in consultas]
+    valores = [v for v in valores if v is not None]
+    return max(valores) if valores else None
+
+class GeradorHistorico:
+    """
+    Converte lotes do GeradorLotes em linhas das tabelas do servidor.
+    O estado entre lotes (último estado por fonte, intervalo e apagão em
+    andamento) fica aqui; cada lote deve começar em uma hora cheia.
+    """
+
+    def __init__(self, conn, fontes, passo, percentual, bloco_segundos,
+                 limite_leituras_ms=None, limite_rollup_1m_ms=None):
+        self.conn = conn
+        self.fontes = list(fontes)
+        self.passo = passo
+        self.passo_ms = int(round(passo * 1000))
+        self.amostras_minuto = int(round(60 / passo))
+        self.amostras_bloco = int(round(bloco_segundos / passo))
+        self.limite_leituras_ms = limite_leituras_ms
+        self.limite_rollup_1m_ms = limite_rollup_1m_ms
+
+        self.thresholds = {}
+        for fonte in self.fontes:
+            threshold = FONTES_CONFIG.get(fonte, {}).get('threshold', 100.0)
+            self.thresholds[fonte] = (threshold, threshold * (percentual / 100.0))
+
+        # Estado anterior para eventos (ATIVA, como em amostrar_fontes) e para
+        # o tempo em cada estado (-1: ainda sem amostra, nenhum tempo atribuído)
+        self._estado_evento = dict.fromkeys(self.fontes, 0)
+        self._estado_tempo = dict.fromkeys(self.fontes, -1)
+        # Intervalo corrente: [codigo, inicio_ms] e acumulados antes dele
+        self._intervalo = dict.fromkeys(self.fontes)
+        self._acumulados = {fonte: np.zeros(4, dtype=np.int64) for fonte in self.fontes}
+        self._dia = {}
+        self._apagao_inicio = None
+        self._em_apagao = False
+
+        self.linhas = dict.fromkeys(('eventos', 'leituras_blocos', 'rollup_1m', 'rollup_1h',
+                                     'rollup_1d', 'intervalos_estado', 'apagoes'), 0)
+
+    def continuar_intervalos(self):
+        """Soma de prefixos continua a partir do último intervalo já gravado"""
+        for fonte in self.fontes:
+            row = self.conn.execute(
+                "SELECT estado, inicio_ms, fim_ms, acum_ativa_ms, acum_instavel_ms, "
+                "acum_falha_ms, acum_erro_ms FROM intervalos_estado "
+                "WHERE fonte = ? ORDER BY inicio_ms DESC LIMIT 1", (fonte,)
+            ).fetchone()
+            if row is None:
+                continue
+            acumulados = np.array(row[3:7], dtype=np.int64)
+            if row[0] in ESTADOS:
+                acumulados[ESTADOS.index(row[0])] += max(0, row[2] - row[1])
+            self._acumulados[fonte] = acumulados
+
+    def processar(self, lote):
+        ts_ms = np.rint(lote.ts * 1000).astype(np.int64)
+        em_falha = None
+        for fonte in self.fontes:
+            tensoes = lote.tensoes[fonte]
+            threshold, limiar = self.thresholds[fonte]
+            codigos = np.where(tensoes >= threshold, 0, np.where(tensoes >= limiar, 1, 2)).astype(np.int8)
+
+            self._eventos(fonte, codigos, tensoes, ts_ms)
+            self._rollups(fonte, codigos, tensoes, int(ts_ms[0]) // 1000)
+            self._blocos(fonte, tensoes, ts_ms)
+            self._intervalos(fonte, codigos, ts_ms)
+
+            falha = codigos == FALHA
+            em_falha = falha if em_falha is None else em_falha & falha
+        self._apagoes(em_falha, ts_ms)
+
+    def encerrar(self, fim_ms):
+        """Fecha o intervalo e o apagão em andamento no fim da faixa"""
+        for fonte in self.fontes:
+            atual = self._intervalo[fonte]
+            if atual is not None:
+                self._gravar_intervalos(fonte, [ESTADOS[atual[0]]], [atual[1]], [fim_ms],
+                                        self._acumulados[fonte][None, :])
+        if self._em_apagao:
+            self.conn.execute(SQL_APAGAO, (self._apagao_inicio, fim_ms))
+            self.linhas['apagoes'] += 1
+
+    def _eventos(self, fonte, codigos, tensoes, ts_ms):
+        anterior = np.empty_like(codigos)
+        anterior[0] = self._estado_evento[fonte]
+        anterior[1:] = codigos[:-1]
+        indices = np.flatnonzero(codigos != anterior)
+        self._estado_evento[fonte] = int(codigos[-1])
+        if len(indices):
+            nomes = [ESTADOS[c] for c in codigos[indices].tolist()]
+            self.conn.executemany(SQL_EVENTO, zip([fonte] * len(indices), nomes,
+                                                  tensoes[indices].tolist(), ts_ms[indices].tolist()))
+            self.linhas['eventos'] += len(indices)
+
+    def _rollups(self, fonte, codigos, tensoes, inicio):
+        # O tempo até cada amostra pertence ao estado da amostra anterior
+        tempo = np.empty(len(codigos), dtype=np.int8)
+        tempo[0] = self._estado_tempo[fonte]
+        tempo[1:] = codigos[:-1]
+        self._estado_tempo[fonte] = int(codigos[-1])
+
+        k = self.amostras_minuto
+        valores = tensoes.reshape(-1, k)
+        segundos = (tempo.reshape(-1, k)[:, :, None] == np.arange(4)).sum(axis=1) * self.passo
+        n = np.full(len(valores), k)
+        minimos = valores.min(axis=1)
+        maximos = valores.max(axis=1)
+        somas = valores.sum(axis=1)
+        quadrados = np.einsum('ij,ij->i', valores, valores)
+
+        if self.limite_rollup_1m_ms is None or inicio * 1000 >= self.limite_rollup_1m_ms:
+            inicios = inicio + 60 * np.arange(len(valores))
+            colunas = [inicios.tolist(), n.tolist(), minimos.tolist(), maximos.tolist(),
+                       somas.tolist(), quadrados.tolist()] + segundos.T.tolist()
+            self.conn.executemany(rollups.sql_somar('rollup_1m'), zip([fonte] * len(valores), *colunas))
+            self.linhas['rollup_1m'] += len(valores)
+
+        hora = (int(n.sum()), float(minimos.min()), float(maximos.max()), float(somas.sum()),
+                float(quadrados.sum())) + tuple(segundos.sum(axis=0).tolist())
+        dia = inicio - inicio % 86400
+        self.conn.execute(rollups.sql_somar('rollup_1h'), (fonte, inicio) + hora)
+        self.conn.execute(rollups.sql_somar('rollup_1d'), (fonte, dia) + hora)
+        self.linhas['rollup_1h'] += 1
+        if self._dia.get(fonte) != dia:
+            self._dia[fonte] = dia
+            self.linhas['rollup_1d'] += 1
+
+    def _blocos(self, fonte, tensoes, ts_ms):
+        m = self.amostras_bloco
+        inicios = ts_ms[::m]
+        primeiro = 0
+        if self.limite_leituras_ms is not None:
+            primeiro = int(np.searchsorted(inicios, self.limite_leituras_ms))
+            if primeiro >= len(inicios):
+                return
+        blocos = leituras.codificar_blocos_uniformes(self.passo_ms, tensoes[primeiro * m:].reshape(-1, m))
+        inicios = inicios[primeiro:].tolist()
+        fins = ts_ms[m - 1::m][primeiro:].tolist()
+        self.conn.executemany(SQL_BLOCO, (
+            (fonte, inicio_ms, fim_ms) + resumo + (blob,)
+            for inicio_ms, fim_ms, (resumo, blob) in zip(inicios, fins, blocos)
+        ))
+        self.linhas['leituras_blocos'] += len(blocos)
+
+    def _intervalos(self, fonte, codigos, ts_ms):
+        atual = self._intervalo[fonte]
+        anterior = np.empty_like(codigos)
+        anterior[0] = -1 if atual is None else atual[0]
+        anterior[1:] = codigos[:-1]
+        indices = np.flatnonzero(codigos != anterior)
+        if not len(indices):
+            return
+
+        # Intervalos que começam neste lote; o corrente (se houver) vem antes
+        estados = codigos[indices].astype(np.int64)
+        inicios = ts_ms[indices]
+        if atual is not None:
+            estados = np.concatenate(([atual[0]], estados))
+            inicios = np.concatenate(([atual[1]], inicios))
+
+        # Todos menos o último fecham no início do seguinte
+        fins = inicios[1:]
+        duracoes = np.zeros((len(fins), 4), dtype=np.int64)
+        duracoes[np.arange(len(fins)), estados[:-1]] = fins - inicios[:-1]
+        acumulados = self._acumulados[fonte] + np.cumsum(duracoes, axis=0) - duracoes
+        self._gravar_intervalos(fonte, [ESTADOS[c] for c in estados[:-1].tolist()],
+                                inicios[:-1].tolist(), fins.tolist(), acumulados)
+
+        self._acumulados[fonte] = self._acumulados[fonte] + duracoes.sum(axis=0)
+        self._intervalo[fonte] = [int(estados[-1]), int(inicios[-1])]
+
+    def _gravar_intervalos(self, fonte, estados, inicios, fins, acumulados):
+        if not estados:
+            return
+        self.conn.executemany(SQL_INTERVALO, zip([fonte] * len(estados), estados, inicios, fins,
+                                                 *acumulados.T.tolist()))
+        self.linhas['intervalos_estado'] += len(estados)
+
+    def _apagoes(self, em_falha, ts_ms):
+        anterior = np.empty_like(em_falha)
+        anterior[0] = self._em_apagao
+        anterior[1:] = em_falha[:-1]
+        indices = np.flatnonzero(em_falha != anterior).tolist()
+        self._em_apagao = bool(em_falha[-1])
+        linhas = []
+        for i in indices:
+            if em_falha[i]:
+                self._apagao_inicio = int(ts_ms[i])
+            else:
+                linhas.append((self._apagao_inicio, int(ts_ms[i])))
+        if linhas:
+            self.conn.executemany(SQL_APAGAO, linhas)
+            self.linhas['apagoes'] += len(linhas)
+
+def _data(texto):
+    return datetime.fromisoformat(texto).timestamp()
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera histórico simulado em tempo virtual')
+    parser.add_argument('--banco', default=DATABASE_PATH, help='Banco SQLite (padrão: DATABASE_PATH)')
+    parser.add_argument('--dias', type=float, default=30, help='Dias gerados até agora (ignorado com --inicio)')
+    parser.add_argument('--inicio', type=_data, help='Início da faixa (ISO 8601, hora local)')
+    parser.add_argument('--fim', type=_data, help='Fim da faixa (ISO 8601; padrão: agora)')
+    parser.add_argument('--passo', type=float, default=1.0, help='Segundos entre ciclos (divisor de 60)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--percentual', type=float,
+                        help='percentual_instabilidade (padrão: o do banco, ou 70)')
+    parser.add_argument('--horas-transacao', type=int, default=24, help='Horas de dados por transação')
+    parser.add_argument('--sem-retencao', action='store_true',
+                        help='Gravar leituras e rollups de 1 min que a retenção apagaria')
+    args = parser.parse_args()
+
+    if not simulacao.NUMPY_DISPONIVEL:
+        sys.exit("numpy não está instalado: pip install numpy")
+    bloco_segundos = LEITURAS_BLOCO_SEGUNDOS
+    if not (0 < args.passo <= 60) or not all(
+        abs(x - round(x)) < 1e-9 for x in (60 / args.passo, bloco_segundos / args.passo, HORA / bloco_segundos)
+    ):
+        sys.exit("--passo deve dividir 60 s e LEITURAS_BLOCO_SEGUNDOS, que deve dividir 1 h")
+
+    # Faixa em horas cheias: cada lote do gerador é uma hora de calendário
+    agora = time.time()
+    fim_ts = (args.fim if args.fim is not None else agora) // HORA * HORA
+    inicio_ts = args.inicio if args.inicio is not None else fim_ts - args.dias * 86400
+    inicio_ts = -(-inicio_ts // HORA) * HORA
+    if fim_ts <= inicio_ts:
+        sys.exit("Faixa vazia: o fim precisa estar pelo menos uma hora cheia depois do início")
+
+    conn = sqlite3.connect(args.banco, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    criar_esquema(conn)
+
+    ultimo_ms = ultimo_dado_ms(conn)
+    if ultimo_ms is not None and ultimo_ms > inicio_ts * 1000:
+        sys.exit(f"{args.banco} já tem dados até {datetime.fromtimestamp(ultimo_ms / 1000)}: "
+                 f"use --inicio depois disso ou outro --banco")
+
+    percentual = args.percentual if args.percentual is not None else percentual_instabilidade(conn)
+    limites = (None, None)
+    if not args.sem_retencao:
+        limites = tuple(int((agora - dias * 86400) * 1000) if dias > 0 else None
+                        for dias in (LEITURAS_RETENCAO_DIAS, ROLLUP_1M_RETENCAO_DIAS))
+    fontes = list(FONTES_CONFIG.keys())
+    historico = GeradorHistorico(conn, fontes, args.passo, percentual, bloco_segundos, *limites)
+    historico.continuar_intervalos()
+    gerador = simulacao.GeradorLotes(fontes, inicio_ts, passo=args.passo, semente=args.semente)
+
+    horas = int((fim_ts - inicio_ts) // HORA)
+    print(f"Gerando {horas / 24:g} dias ({datetime.fromtimestamp(inicio_ts)} a "
+          f"{datetime.fromtimestamp(fim_ts)}), {len(fontes)} fontes, passo {args.passo:g}s, "
+          f"semente {args.semente} -> {args.banco}")
+    inicio = time.perf_counter()
+    conn.execute("BEGIN")
+    for hora, lote in enumerate(gerador.lotes(fim_ts, tamanho=int(round(HORA / args.passo))), 1):
+        historico.processar(lote)
+        if hora % args.horas_transacao == 0:
+            conn.execute("COMMIT")
+            if hora % (args.horas_transacao * 30) == 0:
+                decorrido = time.perf_counter() - inicio
+                print(f"   {hora / 24:6.0f} dias, {sum(historico.linhas.values()):,} linhas, {decorrido:.1f} s")
+            conn.execute("BEGIN")
+    historico.encerrar(int(fim_ts * 1000))
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA optimize")
+    conn.close()
+
+    decorrido = time.perf_counter() - inicio
+    total = sum(historico.linhas.values())
+    for tabela, linhas in historico.linhas.items():
+        print(f"   {tabela:<18} {linhas:>12,}")
+    print(f"{total:,} linhas em {decorrido:.1f} s ({total / decorrido * 60:,.0f} linhas/min, "
+          f"{horas * HORA / args.passo * len(fontes) / decorrido:,.0f} amostras/s)")
+
+if __name__ == "__main__":
+    main()
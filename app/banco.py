@@ -0,0 +1,152 @@
+"""
+Pool de conexões SQLite.
+
+As conexões são abertas uma única vez, já com os pragmas de desempenho
+(WAL, synchronous=NORMAL, mmap e cache de páginas maior), e reutilizadas
+entre threads. Um pool separado entrega conexões somente leitura aos
+endpoints de consulta: em modo WAL os leitores nunca bloqueiam o escritor
+de eventos e vice-versa.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+logger = logging.getLogger(__name__)
+
+class PoolConexoes:
+    """Pool fixo de conexões SQLite compartilhado entre threads"""
+
+    def __init__(self, caminho, tamanho=4, somente_leitura=False, timeout=10.0,
+                 mmap_bytes=64 * 1024 * 1024, cache_kb=8192):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.somente_leitura = somente_leitura
+        self.timeout = timeout
+        self.mmap_bytes = mmap_bytes
+        self.cache_kb = cache_kb
+
+        self._livres = queue.LifoQueue()
+        self._todas = []
+        self._lock = threading.Lock()
+        self.esperas = 0
+        self.em_uso = 0
+        self.avulsas = 0
+
+    def _abrir(self):
+        if self.somente_leitura:
+            uri = f"file:{pathname2url(os.path.abspath(self.caminho))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.caminho, timeout=self.timeout, check_same_thread=False)
+            # journal_mode é persistente no arquivo; basta o escritor definir
+            conn.execute("PRAGMA journal_mode=WAL")
+
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if self.somente_leitura:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _obter(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._todas) < self.tamanho:
+                conn = self._abrir()
+                self._todas.append(conn)
+                return conn
+            self.esperas += 1
+
+        # Pool esgotado: aguardar uma conexão ser devolvida
+        try:
+            return self._livres.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Nenhuma conexão disponível no pool após {self.timeout}s"
+            )
+
+    def _descartar(self, conn):
+        with self._lock:
+            if conn in self._todas:
+                self._todas.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def conexao(self):
+        conn = self._obter()
+        with self._lock:
+            self.em_uso += 1
+        reutilizar = True
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                reutilizar = False
+            raise
+        finally:
+            # Transação esquecida aberta pelo chamador equivale ao close() antigo
+            if reutilizar:
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                except sqlite3.Error:
+                    reutilizar = False
+            with self._lock:
+                self.em_uso -= 1
+            if reutilizar:
+                self._livres.put(conn)
+            else:
+                self._descartar(conn)
+
+    @contextmanager
+    def conexao_avulsa(self):
+        """
+        Conexão própria, com os mesmos pragmas, fora das vagas do pool: para
+        usos longos (streaming de exportação) que não podem segurar uma
+        conexão da qual as consultas rápidas dependem. Fechada ao sair.
+        """
+        conn = self._abrir()
+        with self._lock:
+            self.avulsas += 1
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self.avulsas -= 1
+            conn.close()
+
+    def fechar(self):
+        """Fecha todas as conexões livres (usado no encerramento)"""
+        while True:
+            try:
+                conn = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'somente_leitura': self.somente_leitura,
+                'tamanho': self.tamanho,
+                'abertas': len(self._todas),
+                'em_uso': self.em_uso,
+                'esperas': self.esperas,
+                'avulsas': self.avulsas
+            }
@@ -0,0 +1,138 @@
+"""
+Cache de respostas HTTP com ETag/Last-Modified.
+
+O dashboard consulta os mesmos endpoints em intervalos fixos a partir de
+cada navegador aberto. As respostas ficam em cache por endpoint e
+parâmetros da query, marcadas com a versão de dados vigente quando foram
+calculadas; a versão é um contador monotônico incrementado por invalidar()
+(eventos gravados, configuração alterada). Endpoints que também dependem do
+relógio usam um TTL curto além da versão.
+
+Toda resposta servida leva ETag (hash do corpo) e Last-Modified, então uma
+consulta condicional de um cliente que já tem o corpo recebe 304 sem corpo.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+logger = logging.getLogger(__name__)
+
+class _Entrada:
+    __slots__ = ('versao', 'criada', 'corpo', 'mimetype', 'etag', 'ultima_modificacao')
+
+    def __init__(self, versao, criada, corpo, mimetype, ultima_modificacao):
+        self.versao = versao
+        self.criada = criada
+        self.corpo = corpo
+        self.mimetype = mimetype
+        self.etag = hashlib.blake2b(corpo, digest_size=12).hexdigest()
+        self.ultima_modificacao = ultima_modificacao
+
+class CacheRespostas:
+    def __init__(self, max_entradas=256, ativo=True):
+        self.max_entradas = max_entradas
+        self.ativo = ativo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Versão dos dados e instante da última alteração (epoch)
+        self.versao = 0
+        self.modificado_em = time.time()
+
+        # Contadores expostos em metricas()
+        self.acertos = 0
+        self.faltas = 0
+        self.respostas_304 = 0
+        self.bytes_economizados = 0
+        self.invalidacoes = 0
+
+    def invalidar(self):
+        """Incrementa a versão de dados; entradas anteriores deixam de valer"""
+        with self._lock:
+            self.versao += 1
+            self.modificado_em = time.time()
+            self.invalidacoes += 1
+
+    def _buscar(self, chave, ttl):
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            valida = (
+                entrada is not None
+                and entrada.versao == self.versao
+                and (ttl is None or time.monotonic() - entrada.criada < ttl)
+            )
+            if valida:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return entrada, self.versao, self.modificado_em
+            self.faltas += 1
+            return None, self.versao, self.modificado_em
+
+    def _guardar(self, chave, entrada):
+        with self._lock:
+            self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def em_cache(self, ttl=None):
+        """
+        Decorador de rota. ttl (segundos) limita a idade da entrada para
+        respostas que mudam com o tempo mesmo sem novos dados.
+        """
+        def decorador(funcao):
+            if not self.ativo:
+                return funcao
+
+            @wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                chave = (request.path, tuple(sorted(request.args.items(multi=True))))
+                entrada, versao, modificado_em = self._buscar(chave, ttl)
+
+                if entrada is None:
+                    # A versão foi lida antes do cálculo: se os dados mudarem
+                    # durante ele, a entrada já nasce desatualizada
+                    resposta = make_response(funcao(*args, **kwargs))
+                    if resposta.status_code != 200 or resposta.is_streamed:
+                        return resposta
+                    entrada = _Entrada(
+                        versao, time.monotonic(), resposta.get_data(), resposta.mimetype,
+                        modificado_em if ttl is None else time.time()
+                    )
+                    self._guardar(chave, entrada)
+
+                resposta = Response(entrada.corpo, mimetype=entrada.mimetype)
+                resposta.set_etag(entrada.etag)
+                resposta.last_modified = entrada.ultima_modificacao
+                # Obriga o navegador a revalidar em vez de usar cache heurístico
+                resposta.headers['Cache-Control'] = 'no-cache'
+                resposta.make_conditional(request)
+
+                if resposta.status_code == 304:
+                    with self._lock:
+                        self.respostas_304 += 1
+                        self.bytes_economizados += len(entrada.corpo)
+                return resposta
+            return envoltorio
+        return decorador
+
+    def metricas(self):
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                'ativo': self.ativo,
+                'versao_dados': self.versao,
+                'entradas': len(self._entradas),
+                'capacidade': self.max_entradas,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': round(self.acertos / consultas, 4) if consultas else None,
+                'respostas_304': self.respostas_304,
+                'bytes_economizados': self.bytes_economizados,
+                'invalidacoes': self.invalidacoes
+            }
@@ -3,6 +3,10 @@ import os
 
 # Configurações do banco de dados
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'energia.db')
+DB_POOL_ESCRITA = int(os.getenv('DB_POOL_ESCRITA', 2))  # conexões de escrita
+DB_POOL_LEITURA = int(os.getenv('DB_POOL_LEITURA', 4))  # conexões somente leitura
+DB_MMAP_BYTES = int(os.getenv('DB_MMAP_BYTES', 64 * 1024 * 1024))  # PRAGMA mmap_size
+DB_CACHE_KB = int(os.getenv('DB_CACHE_KB', 8192))  # PRAGMA cache_size (KiB)
 
 # Configurações de rede
 FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
@@ -14,6 +18,61 @@ WEBSOCKET_PORT = int(os.getenv('WEBSOCKET_PORT', 8765))
 LIMIAR_TENSAO = float(os.getenv('LIMIAR_TENSAO', 0.8))  # volts
 INTERVALO_LEITURA = float(os.getenv('INTERVALO_LEITURA', 1.0))  # segundos
 
+# Simulação (modo sem hardware)
+SIMULACAO_SEMENTE = int(os.getenv('SIMULACAO_SEMENTE')) if os.getenv('SIMULACAO_SEMENTE') else None  # reprodutível
+
+# Reprodução de gravações (reproducao.py): substitui hardware e simulador
+REPRODUCAO_ARQUIVOS = os.getenv('REPRODUCAO_ARQUIVOS', '')  # caminhos separados por os.pathsep; vazio = desligada
+REPRODUCAO_VELOCIDADE = os.getenv('REPRODUCAO_VELOCIDADE', '1')  # fator sobre o tempo real ou 'max'
+REPRODUCAO_PERIODO = float(os.getenv('REPRODUCAO_PERIODO', 0))  # segundos virtuais; 0 = menor intervalo da gravação
+
+# Configurações do escritor de eventos em lote
+EVENTOS_FILA_MAX = int(os.getenv('EVENTOS_FILA_MAX', 10000))  # eventos pendentes
+EVENTOS_JANELA_FLUSH = float(os.getenv('EVENTOS_JANELA_FLUSH', 0.5))  # segundos
+EVENTOS_LOTE_MAX = int(os.getenv('EVENTOS_LOTE_MAX', 500))  # eventos por transação
+
+# Configurações das leituras brutas (série temporal de tensões)
+LEITURAS_ATIVAS = os.getenv('LEITURAS_ATIVAS', 'true').lower() in ('true', '1', 'yes')
+LEITURAS_BLOCO_SEGUNDOS = float(os.getenv('LEITURAS_BLOCO_SEGUNDOS', 60))  # duração de cada bloco
+LEITURAS_RETENCAO_DIAS = float(os.getenv('LEITURAS_RETENCAO_DIAS', 90))  # 0 = sem retenção
+
+# Configurações dos rollups (agregados de 1 min / 1 h / 1 dia)
+ROLLUP_1M_RETENCAO_DIAS = float(os.getenv('ROLLUP_1M_RETENCAO_DIAS', 35))  # 1h e 1d não expiram
+
+# Configurações dos intervalos de estado
+INTERVALOS_CHECKPOINT_SEGUNDOS = float(os.getenv('INTERVALOS_CHECKPOINT_SEGUNDOS', 60))  # persistência do intervalo aberto
+
+# Configurações de exportação
+EXPORTAR_LOTE = int(os.getenv('EXPORTAR_LOTE', 5000))  # linhas por fetchmany no streaming
+
+# Configurações de estatísticas
+ESTATISTICAS_LOTE = int(os.getenv('ESTATISTICAS_LOTE', 50000))  # linhas por fetchmany ao carregar a janela
+
+# Cache de respostas HTTP (ETag/304)
+CACHE_RESPOSTAS_ATIVO = os.getenv('CACHE_RESPOSTAS_ATIVO', 'true').lower() in ('true', '1', 'yes')
+CACHE_RESPOSTAS_MAX_ENTRADAS = int(os.getenv('CACHE_RESPOSTAS_MAX_ENTRADAS', 256))
+CACHE_ESTATISTICAS_TTL = float(os.getenv('CACHE_ESTATISTICAS_TTL', 5.0))  # segundos; depende do relógio
+
+# Hub WebSocket: backpressure por cliente
+WEBSOCKET_FILA_MAX = int(os.getenv('WEBSOCKET_FILA_MAX', 32))  # quadros v2 pendentes antes de virar snapshot
+WEBSOCKET_BUFFER_MAX = int(os.getenv('WEBSOCKET_BUFFER_MAX', 64 * 1024))  # bytes no buffer de escrita
+WEBSOCKET_ATRASO_MAX = float(os.getenv('WEBSOCKET_ATRASO_MAX', 30.0))  # segundos atrasado antes de desconectar
+
+# Servidor ASGI de produção (HTTP e WebSocket na mesma porta)
+ASGI_HOST = os.getenv('ASGI_HOST', '0.0.0.0')
+ASGI_PORT = int(os.getenv('ASGI_PORT', 8000))
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))  # threads que executam as rotas Flask
+
+# Implantação multiprocesso: um processo de aquisição e N workers de API
+ASGI_WORKERS = int(os.getenv('ASGI_WORKERS', 4))  # workers de servidor_multiprocesso.py
+ANEL_SLOTS = int(os.getenv('ANEL_SLOTS', 16))  # ciclos guardados no anel compartilhado
+ANEL_TAMANHO_SLOT = int(os.getenv('ANEL_TAMANHO_SLOT', 16384))  # bytes por ciclo
+ANEL_INTERVALO_POLL = float(os.getenv('ANEL_INTERVALO_POLL', 0.01))  # segundos entre consultas do worker
+# Definidos pelo servidor_multiprocesso.py para cada worker
+PAPEL_PROCESSO = os.getenv('POWEREDGE_PAPEL', 'completo')  # completo ou api
+PROCESSO_INDICE = int(os.getenv('POWEREDGE_INDICE', 0))  # 0 = processo de aquisição
+ANEL_NOME = os.getenv('POWEREDGE_ANEL', '')
+
 # Configurações de logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FILE = os.getenv('LOG_FILE', 'energia.log')
@@ -22,6 +81,12 @@ LOG_FILE = os.getenv('LOG_FILE', 'energia.log')
 ADS_GAIN = 1  # Para tensões até 4.096V
 ADS_DATA_RATE = 128  # Samples per second
 
+# Aquisição em rajadas (modo contínuo, thread leitora dedicada)
+ADS_MODO_RAJADA = os.getenv('ADS_MODO_RAJADA', 'false').lower() in ('true', '1', 'yes')
+ADS_RAJADA_TAXA = int(os.getenv('ADS_RAJADA_TAXA', 860))  # SPS em modo contínuo
+ADS_RAJADA_AMOSTRAS = int(os.getenv('ADS_RAJADA_AMOSTRAS', 32))  # conversões por rajada e canal
+ADS_RAJADA_ESTADO = os.getenv('ADS_RAJADA_ESTADO', 'media')  # redução usada no estado: media, min, max, rms
+
 # Mapeamento das fontes
 FONTES_CONFIG = {
     "gerador": {"canal": 0, "nome": "Gerador", "cor": "#ff6b6b", "icone": "⚡", "prioridade": 3, "threshold": 180.0},
@@ -0,0 +1,153 @@
+"""
+Escrita em lote para o SQLite.
+
+Os produtores (loop de aquisição, endpoints REST) apenas enfileiram itens em
+uma fila limitada; uma thread dedicada agrupa tudo o que chegar dentro da
+janela de flush e grava em uma única transação. Assim nenhum produtor espera
+por fsync e uma rajada de transições custa um único commit.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class EscritorEmLote:
+    """
+    Thread de gravação com fila limitada.
+
+    conectar: callable que retorna um context manager de conexão SQLite
+    gravar_lote: callable(conn, itens) que executa os INSERTs do lote
+    apos_gravar: callable(itens) opcional, chamado após o commit do lote
+    """
+
+    def __init__(self, nome, conectar, gravar_lote, tamanho_fila=10000,
+                 janela_flush=0.5, tamanho_lote=500, apos_gravar=None):
+        self.nome = nome
+        self._conectar = conectar
+        self._gravar_lote = gravar_lote
+        self._apos_gravar = apos_gravar
+        self.tamanho_fila = tamanho_fila
+        self.janela_flush = janela_flush
+        self.tamanho_lote = tamanho_lote
+
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._parar = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Contadores expostos em metricas()
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.falhas_gravacao = 0
+        self.lotes = 0
+        self.maior_lote = 0
+        self.ultimo_flush = None
+
+    def iniciar(self):
+        """Inicia a thread de gravação (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(
+            target=self._executar, name=f"escritor-{self.nome}", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Escritor em lote '{self.nome}' iniciado")
+
+    def enfileirar(self, item):
+        """Enfileira um item sem bloquear; retorna False se a fila estiver cheia"""
+        try:
+            self._fila.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+                descartados = self.descartados
+            # Evitar inundar o log durante uma rajada longa
+            if descartados == 1 or descartados % 1000 == 0:
+                logger.warning(f"Fila do escritor '{self.nome}' cheia: {descartados} itens descartados")
+            return False
+
+        with self._lock:
+            self.enfileirados += 1
+        return True
+
+    def _executar(self):
+        while True:
+            try:
+                primeiro = self._fila.get(timeout=0.5)
+            except queue.Empty:
+                if self._parar.is_set():
+                    break
+                continue
+
+            lote = [primeiro]
+            limite = time.monotonic() + self.janela_flush
+            while len(lote) < self.tamanho_lote:
+                # No encerramento não esperamos a janela, apenas drenamos
+                restante = 0 if self._parar.is_set() else limite - time.monotonic()
+                try:
+                    if restante <= 0:
+                        lote.append(self._fila.get_nowait())
+                    else:
+                        lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        try:
+            with self._conectar() as conn:
+                self._gravar_lote(conn, lote)
+                conn.commit()
+
+            with self._lock:
+                self.gravados += len(lote)
+                self.lotes += 1
+                self.maior_lote = max(self.maior_lote, len(lote))
+                self.ultimo_flush = time.time()
+        except Exception as e:
+            with self._lock:
+                self.falhas_gravacao += len(lote)
+            logger.error(f"Erro ao gravar lote de {len(lote)} itens ({self.nome}): {e}")
+            return
+
+        if self._apos_gravar:
+            try:
+                self._apos_gravar(lote)
+            except Exception as e:
+                logger.error(f"Erro no callback após gravação ({self.nome}): {e}")
+
+    def parar(self, timeout=10.0):
+        """Sinaliza o encerramento e aguarda a fila ser drenada"""
+        if not self._thread:
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Escritor '{self.nome}' não drenou a fila em {timeout}s "
+                           f"({self._fila.qsize()} itens pendentes)")
+        else:
+            logger.info(f"Escritor em lote '{self.nome}' encerrado")
+
+    def pendentes(self):
+        """Itens na fila aguardando gravação"""
+        return self._fila.qsize()
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'profundidade_fila': self._fila.qsize(),
+                'capacidade_fila': self.tamanho_fila,
+                'enfileirados': self.enfileirados,
+                'gravados': self.gravados,
+                'descartados': self.descartados,
+                'falhas_gravacao': self.falhas_gravacao,
+                'lotes': self.lotes,
+                'maior_lote': self.maior_lote,
+                'ultimo_flush': self.ultimo_flush,
+                'ativo': bool(self._thread and self._thread.is_alive())
+            }
@@ -0,0 +1,240 @@
+"""
+Serializadores de exportação de eventos em streaming.
+
+Cada serializador recebe um iterável de lotes de linhas
+(id, fonte, tipo, tensao, ts) vindos de cursor.fetchmany() e produz pedaços
+de texto à medida que os lotes chegam, então a memória usada é a de um lote,
+independentemente do tamanho do período exportado.
+
+Os formatos colunares (Parquet, Arrow IPC e NumPy .npz) gravam colunas
+tipadas: id/ts int64 (epoch ms), fonte como dicionário, tensao float32 e
+estado uint8 (códigos em ESTADOS_EXPORTACAO, 255 para tipos desconhecidos).
+Dependem de pyarrow e numpy, que são opcionais.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+try:
+    import numpy as np
+    NUMPY_DISPONIVEL = True
+except ImportError:
+    NUMPY_DISPONIVEL = False
+
+ESTADOS_EXPORTACAO = ('ATIVA', 'INSTAVEL', 'FALHA', 'ERRO', 'manual')
+ESTADO_DESCONHECIDO = 255
+_CODIGO_ESTADO = {estado: i for i, estado in enumerate(ESTADOS_EXPORTACAO)}
+
+FORMATOS_COLUNARES = ('parquet', 'arrow', 'npz')
+
+def formatar_ts(ts_ms):
+    """Formata um timestamp epoch ms no formato legado de data_hora (hora local)"""
+    return datetime.fromtimestamp(ts_ms / 1000.0).strftime('%Y-%m-%d %H:%M:%S')
+
+def ler_lotes(cursor, tamanho_lote):
+    """Itera o cursor do lado do servidor em lotes de tamanho_lote linhas"""
+    while True:
+        lote = cursor.fetchmany(tamanho_lote)
+        if not lote:
+            return
+        yield lote
+
+def serializar_csv(lotes, nomes_fontes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['ID', 'Fonte', 'Nome da Fonte', 'Estado', 'Tensão (V)', 'Data/Hora'])
+    yield buffer.getvalue()
+
+    for lote in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (
+                id_evento,
+                fonte,
+                nomes_fontes.get(fonte, fonte),
+                tipo,
+                f"{tensao:.2f}" if tensao else "N/A",
+                formatar_ts(ts)
+            )
+            for id_evento, fonte, tipo, tensao, ts in lote
+        )
+        yield buffer.getvalue()
+
+def _evento_dict(evento, nomes_fontes):
+    id_evento, fonte, tipo, tensao, ts = evento
+    return {
+        'id': id_evento,
+        'fonte': fonte,
+        'nome_fonte': nomes_fontes.get(fonte, fonte),
+        'estado': tipo,
+        'tensao': round(tensao, 2) if tensao else None,
+        'data_hora': formatar_ts(ts),
+        'ts': ts
+    }
+
+def serializar_json(lotes, nomes_fontes, cabecalho):
+    """
+    Documento JSON em streaming, no mesmo formato da exportação em memória:
+    {"exportacao": cabecalho, "eventos": [...]}. O cabeçalho já traz
+    total_eventos, contado antes da consulta.
+    """
+    yield '{"exportacao": ' + json.dumps(cabecalho, ensure_ascii=False) + ', "eventos": ['
+    primeiro = True
+    for lote in lotes:
+        partes = [json.dumps(_evento_dict(evento, nomes_fontes), ensure_ascii=False) for evento in lote]
+        yield ('' if primeiro else ', ') + ', '.join(partes)
+        primeiro = False
+    yield ']}'
+
+def serializar_ndjson(lotes, nomes_fontes):
+    """Um objeto JSON por linha (NDJSON)"""
+    for lote in lotes:
+        yield ''.join(
+            json.dumps(_evento_dict(evento, nomes_fontes), ensure_ascii=False) + '\n'
+            for evento in lote
+        )
+
+def compactar_gzip(partes, nivel=6):
+    """Compacta em gzip um fluxo de pedaços de texto sem acumulá-lo"""
+    compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for parte in partes:
+        dados = compressor.compress(parte.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+def codificar_utf8(partes):
+    for parte in partes:
+        yield parte.encode('utf-8')
+
+def formato_disponivel(formato):
+    """Indica se as dependências opcionais do formato estão instaladas"""
+    if formato in ('parquet', 'arrow'):
+        return PYARROW_DISPONIVEL
+    if formato == 'npz':
+        return NUMPY_DISPONIVEL
+    return True
+
+def _colunas_lote(lote, codigo_fonte):
+    """Transpõe um lote de linhas em listas por coluna com os códigos aplicados"""
+    ids, fontes, estados, tensoes, tss = [], [], [], [], []
+    for id_evento, fonte, tipo, tensao, ts in lote:
+        ids.append(id_evento)
+        codigo = codigo_fonte.get(fonte)
+        if codigo is None:
+            codigo = codigo_fonte[fonte] = len(codigo_fonte)
+        fontes.append(codigo)
+        estados.append(_CODIGO_ESTADO.get(tipo, ESTADO_DESCONHECIDO))
+        tensoes.append(tensao)
+        tss.append(ts)
+    return ids, fontes, estados, tensoes, tss
+
+class _SaidaIncremental(io.RawIOBase):
+    """Arquivo somente escrita cujo conteúdo é retirado a cada lote gravado"""
+
+    def __init__(self):
+        super().__init__()
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+def _esquema_arrow(nomes_fontes):
+    metadados = {
+        'estados': json.dumps(list(ESTADOS_EXPORTACAO)),
+        'estado_desconhecido': str(ESTADO_DESCONHECIDO),
+        'nomes_fontes': json.dumps(nomes_fontes, ensure_ascii=False)
+    }
+    return pa.schema([
+        ('id', pa.int64()),
+        ('ts', pa.int64()),
+        ('fonte', pa.dictionary(pa.int8(), pa.string())),
+        ('estado', pa.uint8()),
+        ('tensao', pa.float32())
+    ], metadata=metadados)
+
+def _lotes_arrow(lotes, esquema):
+    codigo_fonte = {}
+    for lote in lotes:
+        ids, fontes, estados, tensoes, tss = _colunas_lote(lote, codigo_fonte)
+        dicionario = pa.array(list(codigo_fonte), type=pa.string())
+        yield pa.RecordBatch.from_arrays([
+            pa.array(ids, type=pa.int64()),
+            pa.array(tss, type=pa.int64()),
+            pa.DictionaryArray.from_arrays(pa.array(fontes, type=pa.int8()), dicionario),
+            pa.array(estados, type=pa.uint8()),
+            pa.array(tensoes, type=pa.float32())
+        ], schema=esquema)
+
+def serializar_arrow(lotes, nomes_fontes):
+    """Arrow IPC (formato stream): um record batch por lote do cursor"""
+    esquema = _esquema_arrow(nomes_fontes)
+    saida = _SaidaIncremental()
+    with pa.ipc.new_stream(pa.PythonFile(saida, mode='w'), esquema) as escritor:
+        yield saida.retirar()
+        for batch in _lotes_arrow(lotes, esquema):
+            escritor.write_batch(batch)
+            yield saida.retirar()
+    yield saida.retirar()
+
+def serializar_parquet(lotes, nomes_fontes, compressao='zstd'):
+    """Parquet: cada lote do cursor vira um row group; o rodapé sai no fim"""
+    esquema = _esquema_arrow(nomes_fontes)
+    saida = _SaidaIncremental()
+    with pq.ParquetWriter(pa.PythonFile(saida, mode='w'), esquema, compression=compressao) as escritor:
+        for batch in _lotes_arrow(lotes, esquema):
+            escritor.write_batch(batch)
+            yield saida.retirar()
+    yield saida.retirar()
+
+def serializar_npz(lotes, nomes_fontes):
+    """
+    NumPy .npz compactado. O formato zip exige cada coluna inteira antes da
+    próxima, então os lotes são acumulados já tipados (~18 bytes por evento)
+    e o arquivo é gerado ao final.
+    """
+    codigo_fonte = {}
+    colunas = ([], [], [], [], [])
+    for lote in lotes:
+        ids, fontes, estados, tensoes, tss = _colunas_lote(lote, codigo_fonte)
+        colunas[0].append(np.array(ids, dtype=np.int64))
+        colunas[1].append(np.array(tss, dtype=np.int64))
+        colunas[2].append(np.array(fontes, dtype=np.int8))
+        colunas[3].append(np.array(estados, dtype=np.uint8))
+        colunas[4].append(np.array([np.nan if t is None else t for t in tensoes], dtype=np.float32))
+
+    def juntar(partes, dtype):
+        return np.concatenate(partes) if partes else np.empty(0, dtype=dtype)
+
+    saida = io.BytesIO()
+    np.savez_compressed(
+        saida,
+        id=juntar(colunas[0], np.int64),
+        ts=juntar(colunas[1], np.int64),
+        fonte=juntar(colunas[2], np.int8),
+        estado=juntar(colunas[3], np.uint8),
+        tensao=juntar(colunas[4], np.float32),
+        fontes=np.array(list(codigo_fonte), dtype=str),
+        nomes_fontes=np.array([nomes_fontes.get(f, f) for f in codigo_fonte], dtype=str),
+        estados=np.array(ESTADOS_EXPORTACAO, dtype=str)
+    )
+    yield saida.getvalue()
@@ -0,0 +1,327 @@
+"""
+Hub de transmissão do servidor WebSocket.
+
+Cada quadro é serializado uma única vez por variante (o quadro v1 completo e
+uma vez por assinatura v2 distinta, ver protocolo_ws.SessaoV2.chave) e os
+mesmos bytes do frame WebSocket já montado são escritos no transporte de
+cada cliente, sem reencodar nem recompactar por conexão (o servidor roda
+com compression=None).
+
+O hub fala com cada cliente por um canal: CanalWebsockets escreve o frame
+pronto no transporte de uma conexão da biblioteca websockets; o servidor
+ASGI (servidor_asgi.CanalASGI) entrega a mensagem já serializada ao
+servidor, que monta o frame. Qualquer objeto com o método escrever() é
+aceito como canal; os demais são tratados como conexões websockets.
+
+Backpressure por cliente: enquanto o buffer de escrita do transporte está
+abaixo de buffer_max o quadro é escrito direto; acima disso vai para uma
+fila limitada do cliente, escoada nos ciclos seguintes:
+
+- v1 (quadro completo): coalesce para o mais recente, a fila nunca passa
+  de um quadro;
+- v2 (deltas): ao estourar fila_max a fila é descartada e trocada por um
+  snapshot da variante, que já contém o efeito dos deltas perdidos.
+
+Um cliente com quadros pendentes há mais de atraso_max segundos é
+desconectado.
+"""
+import json
+import logging
+import time
+from collections import deque
+
+from websockets.frames import Frame, Opcode
+from websockets.protocol import State
+
+import protocolo_ws
+
+logger = logging.getLogger(__name__)
+
+def montar_frame(mensagem):
+    """Frame WebSocket de servidor (sem máscara nem extensões) pronto para o transporte"""
+    if isinstance(mensagem, str):
+        return Frame(Opcode.TEXT, mensagem.encode('utf-8')).serialize(mask=False)
+    return Frame(Opcode.BINARY, bytes(mensagem)).serialize(mask=False)
+
+class Quadro:
+    """Mensagem serializada uma vez; o frame é montado na primeira escrita que o pedir"""
+    __slots__ = ('mensagem', '_frame')
+
+    def __init__(self, mensagem):
+        self.mensagem = mensagem
+        self._frame = None
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = montar_frame(self.mensagem)
+        return self._frame
+
+class CanalWebsockets:
+    """Canal sobre uma conexão do servidor websockets: escreve o frame direto no transporte"""
+    __slots__ = ('websocket', 'endereco')
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.endereco = str(getattr(websocket, 'remote_address', None))
+
+    @property
+    def aberto(self):
+        return self.websocket.state is State.OPEN
+
+    def pendente(self):
+        transporte = self.websocket.transport
+        return transporte.get_write_buffer_size() if transporte is not None else 0
+
+    def escrever(self, quadro):
+        frame = quadro.frame
+        self.websocket.transport.write(frame)
+        return len(frame)
+
+    def abortar(self):
+        # O buffer está cheio, então um close handshake também ficaria preso
+        self.websocket.transport.abort()
+
+def _canal(conexao):
+    return conexao if hasattr(conexao, 'escrever') else CanalWebsockets(conexao)
+
+class Assinante:
+    __slots__ = ('conexao', 'canal', 'endereco', 'variante', 'fila', 'atrasado_desde',
+                 'enviados', 'bytes_enviados', 'descartados', 'coalescencias', 'conectado_em')
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.canal = _canal(conexao)
+        self.endereco = self.canal.endereco
+        self.variante = None  # None = protocolo v1
+        self.fila = deque()
+        self.atrasado_desde = None
+        self.enviados = 0
+        self.bytes_enviados = 0
+        self.descartados = 0
+        self.coalescencias = 0
+        self.conectado_em = time.monotonic()
+
+class _Variante:
+    """Uma assinatura v2 compartilhada por todos os clientes com a mesma chave"""
+    __slots__ = ('sessao', 'assinantes')
+
+    def __init__(self, sessao):
+        self.sessao = sessao
+        self.assinantes = set()
+
+class HubTransmissao:
+    def __init__(self, fontes, fila_max=32, buffer_max=64 * 1024, atraso_max=30.0):
+        self.fontes = list(fontes)
+        self.fila_max = fila_max
+        self.buffer_max = buffer_max
+        self.atraso_max = atraso_max
+
+        self._assinantes = {}
+        self._variantes = {}
+
+        self._quadro_v1 = None
+        self._dados = None
+        self.seq = 0
+        self.ts_ms = 0
+
+        # Contadores globais
+        self.quadros_publicados = 0
+        self.serializacoes = 0
+        self.desconectados_por_atraso = 0
+        self.descartados = 0
+        self.ultimo_publicar_ms = 0.0
+
+    # Conexões
+
+    def registrar_v1(self, websocket):
+        """websocket: conexão do servidor websockets ou um canal (ver _canal)"""
+        assinante = Assinante(websocket)
+        self._assinantes[websocket] = assinante
+        if self._quadro_v1 is not None:
+            self._entregar(assinante, self._quadro_v1, time.monotonic())
+
+    def assinar_v2(self, websocket, mensagem):
+        """
+        Aplica uma assinatura v2 (nova conexão ou troca de assinatura) e
+        entrega a confirmação e o snapshot. Levanta protocolo_ws.ErroAssinatura.
+        """
+        candidata = protocolo_ws.SessaoV2(self.fontes)
+        confirmacao = candidata.assinar(mensagem)
+
+        assinante = self._assinantes.get(websocket)
+        if assinante is None:
+            assinante = self._assinantes[websocket] = Assinante(websocket)
+        self._sair_da_variante(assinante)
+
+        chave = candidata.chave()
+        variante = self._variantes.get(chave)
+        if variante is None:
+            variante = self._variantes[chave] = _Variante(candidata)
+            snapshot = candidata.snapshot(self._dados, self.seq, self.ts_ms) if self._dados else None
+        else:
+            snapshot = variante.sessao.snapshot_base(self.seq, self.ts_ms)
+        variante.assinantes.add(assinante)
+        assinante.variante = chave
+
+        # Tudo síncrono: nenhum delta da variante pode passar entre o snapshot e o registro
+        agora = time.monotonic()
+        self._entregar(assinante, Quadro(confirmacao), agora)
+        if snapshot is not None:
+            self._entregar(assinante, Quadro(snapshot), agora)
+
+    def enviar_controle(self, websocket, mensagem):
+        """Quadro de controle (ok/erro) para um único cliente, pela mesma fila"""
+        assinante = self._assinantes.get(websocket)
+        if assinante is not None:
+            self._entregar(assinante, Quadro(mensagem), time.monotonic())
+
+    def remover(self, websocket):
+        assinante = self._assinantes.pop(websocket, None)
+        if assinante is not None:
+            self._sair_da_variante(assinante)
+
+    def _sair_da_variante(self, assinante):
+        if assinante.variante is None:
+            return
+        variante = self._variantes.get(assinante.variante)
+        if variante is not None:
+            variante.assinantes.discard(assinante)
+            if not variante.assinantes:
+                del self._variantes[assinante.variante]
+        assinante.variante = None
+
+    def total_conexoes(self):
+        return len(self._assinantes)
+
+    # Publicação
+
+    def publicar(self, dados, seq, ts_ms, mensagem_v1=None):
+        """
+        Distribui um ciclo de aquisição; chamado apenas pelo loop de aquisição.
+        mensagem_v1: json.dumps(dados) já pronto (ex.: lido do anel compartilhado)
+        """
+        inicio = time.perf_counter()
+        agora = time.monotonic()
+        self._dados = dados
+        self.seq = seq
+        self.ts_ms = ts_ms
+
+        if mensagem_v1 is None:
+            mensagem_v1 = json.dumps(dados)
+            self.serializacoes += 1
+        self._quadro_v1 = Quadro(mensagem_v1)
+        quadros_variante = {}
+        for chave, variante in self._variantes.items():
+            quadro = variante.sessao.atualizar(dados, seq, ts_ms)
+            if quadro is not None:
+                quadros_variante[chave] = Quadro(quadro)
+                self.serializacoes += 1
+
+        for assinante in list(self._assinantes.values()):
+            if assinante.variante is None:
+                self._entregar(assinante, self._quadro_v1, agora)
+            else:
+                quadro = quadros_variante.get(assinante.variante)
+                if quadro is not None:
+                    self._entregar(assinante, quadro, agora)
+                elif assinante.fila:
+                    self._escoar(assinante, agora)
+
+            if assinante.atrasado_desde is not None and agora - assinante.atrasado_desde > self.atraso_max:
+                self._desconectar_atrasado(assinante)
+
+        self.quadros_publicados += 1
+        self.ultimo_publicar_ms = (time.perf_counter() - inicio) * 1000
+
+    def _entregar(self, assinante, quadro, agora):
+        canal = assinante.canal
+        if not canal.aberto:
+            return
+
+        if assinante.fila:
+            self._enfileirar(assinante, quadro)
+            self._escoar(assinante, agora)
+            return
+
+        if canal.pendente() < self.buffer_max:
+            assinante.bytes_enviados += canal.escrever(quadro)
+            assinante.enviados += 1
+        else:
+            self._enfileirar(assinante, quadro)
+            if assinante.atrasado_desde is None:
+                assinante.atrasado_desde = agora
+
+    def _enfileirar(self, assinante, quadro):
+        fila = assinante.fila
+        if assinante.variante is None:
+            # Quadro completo: só o mais recente interessa
+            assinante.descartados += len(fila)
+            self.descartados += len(fila)
+            fila.clear()
+            fila.append(quadro)
+        elif len(fila) >= self.fila_max:
+            # Deltas não podem ser descartados isoladamente: troca tudo por um
+            # snapshot da variante, que já inclui o efeito deste quadro
+            variante = self._variantes[assinante.variante]
+            assinante.descartados += len(fila)
+            self.descartados += len(fila)
+            assinante.coalescencias += 1
+            fila.clear()
+            fila.append(Quadro(variante.sessao.snapshot_base(self.seq, self.ts_ms)))
+        else:
+            fila.append(quadro)
+
+    def _escoar(self, assinante, agora):
+        canal = assinante.canal
+        fila = assinante.fila
+        while fila and canal.pendente() < self.buffer_max:
+            assinante.bytes_enviados += canal.escrever(fila.popleft())
+            assinante.enviados += 1
+        if not fila:
+            assinante.atrasado_desde = None
+        elif assinante.atrasado_desde is None:
+            assinante.atrasado_desde = agora
+
+    def _desconectar_atrasado(self, assinante):
+        logger.warning(f"Cliente WebSocket {assinante.endereco} desconectado: "
+                       f"{len(assinante.fila)} quadros pendentes há mais de {self.atraso_max:g}s")
+        self.desconectados_por_atraso += 1
+        self.remover(assinante.conexao)
+        assinante.canal.abortar()
+
+    # Métricas
+
+    def metricas(self, max_clientes=50):
+        # Chamado de threads do Flask enquanto o loop registra e remove
+        # clientes: copiar antes de percorrer (list() de um dict é atômico
+        # sob o GIL; iterar a visão diretamente não é)
+        assinantes = list(self._assinantes.values())
+        variantes = len(self._variantes)
+        agora = time.monotonic()
+        clientes = []
+        for a in assinantes:
+            clientes.append({
+                'endereco': a.endereco,
+                'protocolo': 'v1' if a.variante is None else 'v2',
+                'fila': len(a.fila),
+                'atraso_s': round(agora - a.atrasado_desde, 2) if a.atrasado_desde is not None else 0.0,
+                'buffer_bytes': a.canal.pendente(),
+                'enviados': a.enviados,
+                'bytes_enviados': a.bytes_enviados,
+                'descartados': a.descartados,
+                'coalescencias': a.coalescencias
+            })
+        clientes.sort(key=lambda c: (c['atraso_s'], c['fila']), reverse=True)
+        return {
+            'conexoes': len(assinantes),
+            'conexoes_v1': sum(1 for a in assinantes if a.variante is None),
+            'variantes_v2': variantes,
+            'quadros_publicados': self.quadros_publicados,
+            'serializacoes': self.serializacoes,
+            'ultimo_publicar_ms': round(self.ultimo_publicar_ms, 3),
+            'clientes_atrasados': sum(1 for c in clientes if c['fila']),
+            'descartados': self.descartados,
+            'desconectados_por_atraso': self.desconectados_por_atraso,
+            'clientes': clientes[:max_clientes]
+        }
@@ -0,0 +1,166 @@
+"""
+Motor de duração de estados por fonte.
+
+As transições da máquina de estados viram intervalos contíguos em
+`intervalos_estado` (fonte, estado, inicio_ms, fim_ms). Cada intervalo
+guarda também o tempo acumulado em cada estado ANTES do seu início, uma soma
+de prefixos. Com isso, "segundos em cada estado entre T1 e T2" são duas
+buscas no índice (fonte, inicio_ms), O(log n), e o estado herdado de antes do
+início da janela entra corretamente na conta.
+
+O intervalo aberto tem aberto=1 e o seu fim_ms é atualizado periodicamente
+(checkpoint). Após um reinício ele é fechado no último checkpoint: o tempo
+em que o processo ficou parado não é atribuído a nenhum estado.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+ESTADOS = ('ATIVA', 'INSTAVEL', 'FALHA', 'ERRO')
+_INDICE = {estado: i for i, estado in enumerate(ESTADOS)}
+
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS intervalos_estado (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fonte TEXT NOT NULL,
+        estado TEXT NOT NULL,
+        inicio_ms INTEGER NOT NULL,
+        fim_ms INTEGER NOT NULL,
+        aberto INTEGER NOT NULL DEFAULT 1,
+        acum_ativa_ms INTEGER NOT NULL,
+        acum_instavel_ms INTEGER NOT NULL,
+        acum_falha_ms INTEGER NOT NULL,
+        acum_erro_ms INTEGER NOT NULL
+    )
+"""
+
+SQL_CRIAR_INDICE = """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_intervalos_fonte_inicio
+    ON intervalos_estado(fonte, inicio_ms)
+"""
+
+_SELECT_INTERVALO = """
+    SELECT estado, inicio_ms, fim_ms, aberto,
+           acum_ativa_ms, acum_instavel_ms, acum_falha_ms, acum_erro_ms
+    FROM intervalos_estado
+"""
+
+class RastreadorIntervalos:
+    """
+    Mantém o intervalo corrente de cada fonte e envia aberturas, fechamentos
+    e checkpoints ao escritor. observar() é chamado a cada amostra e, fora
+    das transições e checkpoints, custa apenas uma comparação.
+    """
+
+    def __init__(self, escritor, intervalo_checkpoint=60.0):
+        self.escritor = escritor
+        self.intervalo_checkpoint_ms = int(intervalo_checkpoint * 1000)
+        # fonte -> [estado, inicio_ms, fim_ms, aberto, acumulados, ultimo_checkpoint_ms]
+        self._atual = {}
+        self._lock = threading.Lock()
+
+    def carregar(self, conn):
+        """Recupera o último intervalo de cada fonte e fecha os que ficaram abertos"""
+        fontes = [row[0] for row in conn.execute("SELECT DISTINCT fonte FROM intervalos_estado")]
+        fechados = 0
+        with self._lock:
+            for fonte in fontes:
+                row = conn.execute(
+                    _SELECT_INTERVALO + " WHERE fonte = ? ORDER BY inicio_ms DESC LIMIT 1",
+                    (fonte,)
+                ).fetchone()
+                estado, inicio_ms, fim_ms, aberto = row[0], row[1], row[2], row[3]
+                if aberto:
+                    conn.execute(
+                        "UPDATE intervalos_estado SET aberto = 0 WHERE fonte = ? AND inicio_ms = ?",
+                        (fonte, inicio_ms)
+                    )
+                    fechados += 1
+                self._atual[fonte] = [estado, inicio_ms, fim_ms, False, list(row[4:8]), fim_ms]
+        conn.commit()
+        if fechados:
+            logger.info(f"{fechados} intervalos de estado abertos fechados no último checkpoint")
+
+    def observar(self, fonte, estado, ts_ms):
+        """Registra o estado observado de uma fonte no instante ts_ms"""
+        with self._lock:
+            atual = self._atual.get(fonte)
+            if atual is not None and atual[3] and atual[0] == estado:
+                if ts_ms - atual[5] >= self.intervalo_checkpoint_ms:
+                    atual[2] = atual[5] = ts_ms
+                    self.escritor.enfileirar(('checkpoint', fonte, atual[1], ts_ms))
+                return
+
+            acumulados = [0, 0, 0, 0]
+            if atual is not None:
+                if atual[3]:
+                    # Fechar o intervalo corrente exatamente na transição
+                    atual[2] = ts_ms
+                    self.escritor.enfileirar(('fechar', fonte, atual[1], ts_ms))
+                acumulados = list(atual[4])
+                indice = _INDICE.get(atual[0])
+                if indice is not None:
+                    acumulados[indice] += max(0, atual[2] - atual[1])
+
+            self._atual[fonte] = [estado, ts_ms, ts_ms, True, acumulados, ts_ms]
+            self.escritor.enfileirar(('abrir', fonte, estado, ts_ms) + tuple(acumulados))
+
+    def gravar_item(self, conn, item):
+        """Aplica um item enfileirado (executa na thread do escritor)"""
+        tipo = item[0]
+        if tipo == 'abrir':
+            _, fonte, estado, inicio_ms, a0, a1, a2, a3 = item
+            conn.execute("""
+                INSERT OR REPLACE INTO intervalos_estado
+                    (fonte, estado, inicio_ms, fim_ms, aberto,
+                     acum_ativa_ms, acum_instavel_ms, acum_falha_ms, acum_erro_ms)
+                VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+            """, (fonte, estado, inicio_ms, inicio_ms, a0, a1, a2, a3))
+        elif tipo == 'fechar':
+            _, fonte, inicio_ms, fim_ms = item
+            conn.execute(
+                "UPDATE intervalos_estado SET fim_ms = ?, aberto = 0 WHERE fonte = ? AND inicio_ms = ?",
+                (fim_ms, fonte, inicio_ms)
+            )
+        elif tipo == 'checkpoint':
+            _, fonte, inicio_ms, fim_ms = item
+            conn.execute(
+                "UPDATE intervalos_estado SET fim_ms = ? WHERE fonte = ? AND inicio_ms = ? AND aberto = 1",
+                (fim_ms, fonte, inicio_ms)
+            )
+
+def _acumulado_em(conn, fonte, t_ms, agora_ms):
+    """Tempo acumulado (ms) em cada estado do início do histórico até t_ms"""
+    row = conn.execute(
+        _SELECT_INTERVALO + " WHERE fonte = ? AND inicio_ms <= ? ORDER BY inicio_ms DESC LIMIT 1",
+        (fonte, t_ms)
+    ).fetchone()
+    if row is None:
+        return [0, 0, 0, 0]
+
+    estado, inicio_ms, fim_ms, aberto = row[0], row[1], row[2], row[3]
+    acumulados = list(row[4:8])
+    fim_efetivo = max(fim_ms, agora_ms) if aberto else fim_ms
+    indice = _INDICE.get(estado)
+    if indice is not None:
+        acumulados[indice] += max(0, min(t_ms, fim_efetivo) - inicio_ms)
+    return acumulados
+
+def segundos_em_estado(conn, fonte, inicio_ms, fim_ms, agora_ms=None):
+    """Segundos em cada estado de uma fonte dentro de [inicio_ms, fim_ms]"""
+    if agora_ms is None:
+        agora_ms = fim_ms
+    antes = _acumulado_em(conn, fonte, inicio_ms, agora_ms)
+    depois = _acumulado_em(conn, fonte, fim_ms, agora_ms)
+    return {
+        estado: max(0, depois[i] - antes[i]) / 1000.0
+        for i, estado in enumerate(ESTADOS)
+    }
+
+def disponibilidade(segundos):
+    """Percentual do tempo conhecido em ATIVA (None sem cobertura)"""
+    coberto = sum(segundos.values())
+    if coberto <= 0:
+        return None
+    return segundos['ATIVA'] / coberto * 100.0
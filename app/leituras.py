@@ -0,0 +1,225 @@
+"""
+Armazenamento de leituras brutas de tensão.
+
+Cada fonte acumula suas amostras em memória (dois arrays compactos) e, a cada
+bloco de LEITURAS_BLOCO_SEGUNDOS, o bloco é selado e entregue ao escritor em
+lote. Cada bloco vira uma única linha em `leituras_blocos`:
+
+- resumo exato (n, min, max, soma, soma dos quadrados) do bloco, consultável
+  sem descompactar nada (as agregações de /estatisticas vêm dos rollups);
+- BLOB zlib com os intervalos entre amostras (uint16, ms) e as tensões
+  quantizadas em uint16 na faixa [min, max] do próprio bloco, o que dá
+  resolução equivalente à do ADS1115 com 2 bytes por amostra.
+
+Com 10 Hz x 4 canais isso são 4 linhas por minuto, e a retenção apaga os
+blocos antigos; as páginas liberadas são reaproveitadas pelos novos blocos,
+então o arquivo para de crescer ao atingir o regime.
+"""
+import logging
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+try:
+    import numpy as np
+    NUMPY_DISPONIVEL = True
+except ImportError:
+    NUMPY_DISPONIVEL = False
+
+logger = logging.getLogger(__name__)
+
+_MAX_DELTA_MS = 0xFFFF
+_MAX_QUANT = 0xFFFF
+
+# Blocos duram no máximo LEITURAS_BLOCO_SEGUNDOS, bem menos que 24h: este limite
+# inferior mantém a busca por blocos que cruzam o início da janela como faixa
+# no índice (fonte, inicio_ms)
+_JANELA_BUSCA_MS = 24 * 3600 * 1000
+
+SQL_CRIAR_TABELA = """
+    CREATE TABLE IF NOT EXISTS leituras_blocos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fonte TEXT NOT NULL,
+        inicio_ms INTEGER NOT NULL,
+        fim_ms INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        tensao_min REAL NOT NULL,
+        tensao_max REAL NOT NULL,
+        soma REAL NOT NULL,
+        soma_quadrados REAL NOT NULL,
+        dados BLOB NOT NULL
+    )
+"""
+
+SQL_CRIAR_INDICE = """
+    CREATE INDEX IF NOT EXISTS idx_leituras_fonte_inicio
+    ON leituras_blocos(fonte, inicio_ms)
+"""
+
+def _para_little_endian(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+def codificar_bloco(deltas, valores):
+    """Empacota um bloco; retorna (resumo, blob)"""
+    n = len(valores)
+    tensao_min = min(valores)
+    tensao_max = max(valores)
+    soma = sum(valores)
+    soma_quadrados = sum(v * v for v in valores)
+
+    faixa = tensao_max - tensao_min
+    escala = _MAX_QUANT / faixa if faixa > 0 else 0.0
+    quantizados = array('H', [int(round((v - tensao_min) * escala)) for v in valores])
+
+    blob = zlib.compress(
+        _para_little_endian(deltas).tobytes() + _para_little_endian(quantizados).tobytes(), 6
+    )
+    return (n, tensao_min, tensao_max, soma, soma_quadrados), blob
+
+def codificar_blocos_uniformes(delta_ms, valores):
+    """
+    Versão vetorizada de codificar_bloco para blocos de amostras igualmente
+    espaçadas (geração em lote): valores é um ndarray (blocos, amostras) e
+    todas as amostras distam delta_ms. Retorna [(resumo, blob), ...] no
+    mesmo formato de codificar_bloco. Requer numpy.
+    """
+    blocos, n = valores.shape
+    tensao_min = valores.min(axis=1)
+    tensao_max = valores.max(axis=1)
+    soma = valores.sum(axis=1)
+    soma_quadrados = np.einsum('ij,ij->i', valores, valores)
+
+    faixa = tensao_max - tensao_min
+    escala = np.divide(_MAX_QUANT, faixa, out=np.zeros_like(faixa), where=faixa > 0)
+    quantizados = np.rint((valores - tensao_min[:, None]) * escala[:, None]).astype('<u2')
+
+    deltas = np.full(n, delta_ms, dtype='<u2')
+    deltas[0] = 0
+    deltas = deltas.tobytes()
+    return [
+        ((n, mn, mx, sm, sq), zlib.compress(deltas + q.tobytes(), 6))
+        for mn, mx, sm, sq, q in zip(tensao_min.tolist(), tensao_max.tolist(),
+                                      soma.tolist(), soma_quadrados.tolist(), quantizados)
+    ]
+
+def decodificar_bloco(inicio_ms, n, tensao_min, tensao_max, blob):
+    """Reconstrói a lista [(ts_ms, tensao), ...] de um bloco"""
+    bruto = zlib.decompress(blob)
+    deltas = array('H')
+    deltas.frombytes(bruto[:2 * n])
+    quantizados = array('H')
+    quantizados.frombytes(bruto[2 * n:4 * n])
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+        quantizados.byteswap()
+
+    passo = (tensao_max - tensao_min) / _MAX_QUANT
+    amostras = []
+    ts = inicio_ms
+    for delta, q in zip(deltas, quantizados):
+        ts += delta
+        amostras.append((ts, tensao_min + q * passo))
+    return amostras
+
+class BufferLeituras:
+    """
+    Acumula as amostras de cada fonte e sela um bloco por período.
+
+    adicionar() é chamado no caminho quente da aquisição e custa apenas dois
+    append em arrays; a compactação acontece na thread do escritor.
+    """
+
+    def __init__(self, escritor, duracao_bloco=60.0, max_amostras=8192):
+        self.escritor = escritor
+        self.duracao_bloco_ms = int(duracao_bloco * 1000)
+        self.max_amostras = max_amostras
+        self._blocos = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, fonte, ts_ms, tensao):
+        with self._lock:
+            bloco = self._blocos.get(fonte)
+            if bloco is not None:
+                inicio_ms, ultimo_ms, deltas, valores = bloco
+                delta = ts_ms - ultimo_ms
+                if (delta < 0 or delta > _MAX_DELTA_MS
+                        or ts_ms - inicio_ms >= self.duracao_bloco_ms
+                        or len(valores) >= self.max_amostras):
+                    self._selar(fonte)
+                    bloco = None
+
+            if bloco is None:
+                # A primeira amostra fica no próprio início do bloco (delta 0)
+                self._blocos[fonte] = [ts_ms, ts_ms, array('H', [0]), array('d', [tensao])]
+                return
+
+            bloco[1] = ts_ms
+            deltas.append(delta)
+            valores.append(tensao)
+
+    def _selar(self, fonte):
+        bloco = self._blocos.pop(fonte, None)
+        if bloco:
+            inicio_ms, ultimo_ms, deltas, valores = bloco
+            self.escritor.enfileirar((fonte, inicio_ms, ultimo_ms, deltas, valores))
+
+    def selar_todos(self):
+        """Envia os blocos abertos ao escritor (encerramento)"""
+        with self._lock:
+            for fonte in list(self._blocos.keys()):
+                self._selar(fonte)
+
+class ArmazemLeituras:
+    """Gravação e retenção de blocos de leituras (executa na thread do escritor)"""
+
+    def __init__(self, retencao_dias=90, intervalo_purga=3600.0):
+        self.retencao_ms = int(retencao_dias * 86400 * 1000)
+        self.intervalo_purga = intervalo_purga
+        self._ultima_purga = 0.0
+
+    def gravar_lote(self, conn, blocos):
+        linhas = []
+        for fonte, inicio_ms, fim_ms, deltas, valores in blocos:
+            resumo, blob = codificar_bloco(deltas, valores)
+            linhas.append((fonte, inicio_ms, fim_ms) + resumo + (blob,))
+
+        conn.executemany("""
+            INSERT INTO leituras_blocos
+                (fonte, inicio_ms, fim_ms, n, tensao_min, tensao_max, soma, soma_quadrados, dados)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, linhas)
+
+        agora = time.time()
+        if self.retencao_ms > 0 and agora - self._ultima_purga >= self.intervalo_purga:
+            self._ultima_purga = agora
+            limite_ms = int(agora * 1000) - self.retencao_ms
+            apagados = conn.execute(
+                "DELETE FROM leituras_blocos WHERE inicio_ms < ?", (limite_ms,)
+            ).rowcount
+            if apagados:
+                logger.info(f"Retenção de leituras: {apagados} blocos antigos removidos")
+
+def _consultar_blocos(conn, fonte, inicio_ms, fim_ms):
+    return conn.execute("""
+        SELECT inicio_ms, n, tensao_min, tensao_max, dados
+        FROM leituras_blocos
+        WHERE fonte = ? AND inicio_ms <= ? AND inicio_ms >= ? AND fim_ms >= ?
+        ORDER BY inicio_ms
+    """, (fonte, fim_ms, inicio_ms - _JANELA_BUSCA_MS, inicio_ms))
+
+def ler_leituras(conn, fonte, inicio_ms, fim_ms, limite=None):
+    """Itera as amostras (ts_ms, tensao) de uma fonte em ordem cronológica"""
+    total = 0
+    for row in _consultar_blocos(conn, fonte, inicio_ms, fim_ms):
+        b_inicio, b_n, b_min, b_max, dados = row
+        for ts, tensao in decodificar_bloco(b_inicio, b_n, b_min, b_max, dados):
+            if inicio_ms <= ts <= fim_ms:
+                yield ts, tensao
+                total += 1
+                if limite is not None and total >= limite:
+                    return
@@ -0,0 +1,153 @@
+"""
+Migrações de esquema do banco energia.db.
+
+A versão do esquema fica em PRAGMA user_version:
+
+- 0/1: `eventos.data_hora` TEXT ('%Y-%m-%d %H:%M:%S', hora local) com
+  UNIQUE(fonte, tipo, data_hora) e apenas o índice idx_eventos_data_hora;
+- 2: `eventos.ts` INTEGER (epoch em milissegundos), sem a restrição UNIQUE
+  (que descartava oscilações legítimas dentro do mesmo segundo) e com dois
+  índices de cobertura: (fonte, ts, tipo, tensao) para as consultas
+  filtradas por fonte e (ts, fonte, tipo, tensao) para as janelas de tempo
+  sem filtro.
+
+A migração 1 -> 2 é online: a tabela nova é preenchida em lotes curtos
+(cada lote é uma transação rápida, então a aplicação em execução continua
+gravando), um trigger replica para ela as inserções feitas durante a cópia,
+e a troca de nomes acontece em uma única transação no final.
+
+Uso direto (com a aplicação rodando ou não):
+
+    python migracoes.py /caminho/para/energia.db
+"""
+import logging
+import sqlite3
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSAO_ESQUEMA = 2
+
+SQL_CRIAR_EVENTOS = """
+    CREATE TABLE IF NOT EXISTS {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fonte TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        tensao REAL,
+        ts INTEGER NOT NULL
+    )
+"""
+
+SQL_INDICES_EVENTOS = (
+    """
+    CREATE INDEX IF NOT EXISTS idx_eventos_fonte_ts
+    ON eventos(fonte, ts, tipo, tensao)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_eventos_ts
+    ON eventos(ts, fonte, tipo, tensao)
+    """
+)
+
+# data_hora legado está em hora local; o modificador 'utc' converte para UTC
+# antes de calcular o epoch. Datas ilegíveis viram 0 para não perder a linha.
+_SQL_DATA_HORA_PARA_MS = (
+    "COALESCE(CAST(ROUND((julianday({coluna}, 'utc') - 2440587.5) * 86400000.0) AS INTEGER), 0)"
+)
+
+def _colunas(conn, tabela):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({tabela})")]
+
+def versao_esquema(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def precisa_migrar_eventos(conn):
+    colunas = _colunas(conn, 'eventos')
+    return bool(colunas) and 'ts' not in colunas
+
+def garantir_esquema(conn):
+    """
+    Cria o esquema atual em bancos novos e migra bancos antigos.
+    Deve ser chamada com uma conexão de escrita.
+    """
+    if precisa_migrar_eventos(conn):
+        migrar_eventos_para_epoch(conn)
+
+    conn.execute(SQL_CRIAR_EVENTOS.format(tabela='eventos'))
+    for comando in SQL_INDICES_EVENTOS:
+        conn.execute(comando)
+    conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+    conn.commit()
+
+def migrar_eventos_para_epoch(conn, tamanho_lote=10000, pausa=0.0):
+    """Migra eventos.data_hora (TEXT) para eventos.ts (epoch ms) sem parar a aplicação"""
+    inicio = time.monotonic()
+    conn.commit()
+
+    conn.execute(SQL_CRIAR_EVENTOS.format(tabela='eventos_v2'))
+    conversao_novo = _SQL_DATA_HORA_PARA_MS.format(coluna='NEW.data_hora')
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_eventos_migracao_v2
+        AFTER INSERT ON eventos
+        BEGIN
+            INSERT OR REPLACE INTO eventos_v2 (id, fonte, tipo, tensao, ts)
+            VALUES (NEW.id, NEW.fonte, NEW.tipo, NEW.tensao, {conversao_novo});
+        END
+    """)
+    conn.commit()
+
+    # Tudo acima de id_limite chega pelo trigger; abaixo, copiamos em lotes
+    id_limite = conn.execute("SELECT COALESCE(MAX(id), 0) FROM eventos").fetchone()[0]
+    conversao = _SQL_DATA_HORA_PARA_MS.format(coluna='data_hora')
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM eventos_v2 WHERE id <= ?",
+                             (id_limite,)).fetchone()[0]
+    copiados = 0
+    while ultimo_id < id_limite:
+        proximo = min(ultimo_id + tamanho_lote, id_limite)
+        cursor = conn.execute(f"""
+            INSERT OR IGNORE INTO eventos_v2 (id, fonte, tipo, tensao, ts)
+            SELECT id, fonte, tipo, tensao, {conversao}
+            FROM eventos WHERE id > ? AND id <= ?
+        """, (ultimo_id, proximo))
+        conn.commit()
+        copiados += max(cursor.rowcount, 0)
+        ultimo_id = proximo
+        if pausa:
+            time.sleep(pausa)
+
+    # Troca atômica das tabelas
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TRIGGER IF EXISTS trg_eventos_migracao_v2")
+        conn.execute("DROP TABLE eventos")
+        conn.execute("ALTER TABLE eventos_v2 RENAME TO eventos")
+        for comando in SQL_INDICES_EVENTOS:
+            conn.execute(comando)
+        conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    logger.info(f"Migração de eventos para epoch concluída: {copiados} linhas "
+                f"em {time.monotonic() - inicio:.1f}s")
+    return copiados
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 2:
+        print("Uso: python migracoes.py /caminho/para/energia.db")
+        sys.exit(1)
+
+    conexao = sqlite3.connect(sys.argv[1], timeout=30.0)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    try:
+        if precisa_migrar_eventos(conexao):
+            # Pausa entre lotes para dar espaço aos escritores da aplicação
+            migrar_eventos_para_epoch(conexao, pausa=0.05)
+        else:
+            print("Banco já está no esquema atual")
+        garantir_esquema(conexao)
+    finally:
+        conexao.close()
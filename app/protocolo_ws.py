@@ -0,0 +1,239 @@
+"""
+Protocolo WebSocket v2: assinatura, snapshot inicial e deltas compactos.
+
+O protocolo v1 (padrão, usado por static/script.js) envia a cada ciclo o
+quadro completo de todas as fontes. Clientes v2 conectam em /v2 e recebem:
+
+1. um quadro "ok" (sempre JSON) com a assinatura vigente;
+2. um snapshot ("t": "s") com todos os campos assinados;
+3. deltas ("t": "d") só com os campos que mudaram desde o último envio a
+   ESTE cliente, ou nada quando nada mudou. Com "lote": N os deltas de N
+   ciclos saem juntos em um quadro "t": "l".
+
+A assinatura inicial pode vir na própria URL, sem ida e volta extra:
+
+    ws://host:8765/v2?fontes=rede,solar&campos=tensao&banda_morta=0.5&lote=5&codificacao=struct
+
+e a qualquer momento o cliente pode mandar uma nova (recebe outro "ok" e
+outro snapshot):
+
+    {"tipo": "assinar", "fontes": ["rede"], "campos": ["tensao", "estado"],
+     "banda_morta": 0.5, "lote": 5, "codificacao": "json"}
+
+banda_morta (V) suprime variações de tensão menores que ela em relação ao
+último valor enviado. codificacao pode ser "json", "msgpack" (requer o
+pacote msgpack) ou "struct", um formato binário fixo:
+
+    cabeçalho  <BBIq   versão (2), tipo (0 snapshot, 1 delta, 2 lote), seq, ts (epoch ms)
+    snapshot/delta:    <B n_entradas, seguido das entradas
+    lote:              <B n_ciclos, e para cada ciclo <IB (ts - ts do cabeçalho, n_entradas) + entradas
+    entrada    <BB     índice da fonte em "fontes" do quadro "ok", máscara (bit 0 tensão, bit 1 estado)
+               <f      tensão, se bit 0
+               <B      índice do estado em "estados" do quadro "ok", se bit 1
+"""
+import json
+import math
+import struct
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import msgpack
+    MSGPACK_DISPONIVEL = True
+except ImportError:
+    MSGPACK_DISPONIVEL = False
+
+VERSAO = 2
+CAMPOS = ('tensao', 'estado')
+CODIFICACOES = ('json', 'msgpack', 'struct')
+ESTADOS = ('ATIVA', 'INSTAVEL', 'FALHA', 'ERRO')
+LOTE_MAX = 60
+
+_TIPO_STRUCT = {'s': 0, 'd': 1, 'l': 2}
+_CABECALHO = struct.Struct('<BBIq')
+_CONTAGEM = struct.Struct('<B')
+_CICLO = struct.Struct('<IB')
+_ENTRADA = struct.Struct('<BB')
+_TENSAO = struct.Struct('<f')
+_CODIGO_ESTADO = {estado: i for i, estado in enumerate(ESTADOS)}
+
+class ErroAssinatura(ValueError):
+    pass
+
+def quadro_controle(tipo, **campos):
+    """Quadros de controle (ok, erro) são sempre JSON texto"""
+    return json.dumps(dict({'v': VERSAO, 't': tipo}, **campos), ensure_ascii=False)
+
+def assinatura_da_url(path):
+    """Converte a query string de /v2?... em uma mensagem de assinatura"""
+    query = parse_qs(urlsplit(path).query)
+    mensagem = {'tipo': 'assinar'}
+    for campo in ('fontes', 'campos'):
+        if campo in query:
+            mensagem[campo] = [v for v in query[campo][-1].split(',') if v]
+    for campo in ('banda_morta', 'lote', 'codificacao'):
+        if campo in query:
+            mensagem[campo] = query[campo][-1]
+    return mensagem
+
+class SessaoV2:
+    """Estado de um cliente v2: assinatura e últimos valores enviados"""
+
+    def __init__(self, fontes_disponiveis):
+        self.fontes_disponiveis = list(fontes_disponiveis)
+        self.fontes = list(self.fontes_disponiveis)
+        self._indice_fonte = {fonte: i for i, fonte in enumerate(self.fontes)}
+        self.campos = list(CAMPOS)
+        self.banda_morta = 0.0
+        self.lote = 1
+        self.codificacao = 'json'
+
+        self._enviado = {}
+        self._pendentes = []
+        self._ciclos = 0
+
+    def assinar(self, mensagem):
+        """Aplica uma mensagem de assinatura e retorna o quadro "ok" de confirmação"""
+        if not isinstance(mensagem, dict) or mensagem.get('tipo') != 'assinar':
+            raise ErroAssinatura("Mensagem deve ser {\"tipo\": \"assinar\", ...}")
+
+        fontes = mensagem.get('fontes', self.fontes_disponiveis)
+        campos = mensagem.get('campos', list(CAMPOS))
+        codificacao = mensagem.get('codificacao', 'json')
+        try:
+            banda_morta = float(mensagem.get('banda_morta', 0.0))
+            lote = int(mensagem.get('lote', 1))
+        except (TypeError, ValueError):
+            raise ErroAssinatura("banda_morta e lote devem ser numéricos")
+
+        invalidas = [f for f in fontes if f not in self.fontes_disponiveis]
+        if invalidas or not fontes:
+            raise ErroAssinatura(f"Fontes inválidas: {invalidas}. Opções: {self.fontes_disponiveis}")
+        if not campos or any(c not in CAMPOS for c in campos):
+            raise ErroAssinatura(f"Campos válidos: {list(CAMPOS)}")
+        if codificacao not in CODIFICACOES:
+            raise ErroAssinatura(f"Codificações válidas: {list(CODIFICACOES)}")
+        if codificacao == 'msgpack' and not MSGPACK_DISPONIVEL:
+            raise ErroAssinatura("msgpack não está instalado no servidor")
+        # nan passaria em "< 0" e nunca mais enviaria a tensão (e, como
+        # nan != nan, criaria uma variante própria no hub por assinante)
+        if not math.isfinite(banda_morta) or banda_morta < 0 or not 1 <= lote <= LOTE_MAX:
+            raise ErroAssinatura(f"banda_morta finita >= 0 e 1 <= lote <= {LOTE_MAX}")
+
+        # Ordem estável (a de fontes_disponiveis): é a base dos índices do struct
+        self.fontes = [f for f in self.fontes_disponiveis if f in fontes]
+        self._indice_fonte = {fonte: i for i, fonte in enumerate(self.fontes)}
+        self.campos = [c for c in CAMPOS if c in campos]
+        self.banda_morta = banda_morta
+        self.lote = lote
+        self.codificacao = codificacao
+        return self.confirmacao()
+
+    def confirmacao(self):
+        return quadro_controle(
+            'ok', fontes=self.fontes, campos=self.campos, banda_morta=self.banda_morta,
+            lote=self.lote, codificacao=self.codificacao, estados=list(ESTADOS)
+        )
+
+    def chave(self):
+        """Identifica a assinatura: sessões com a mesma chave recebem os mesmos quadros"""
+        return (tuple(self.fontes), tuple(self.campos), self.banda_morta, self.lote, self.codificacao)
+
+    def snapshot_base(self, seq, ts_ms):
+        """
+        Snapshot dos últimos valores enviados, sem reiniciar a base. Um cliente
+        que entra em uma sessão compartilhada recebe exatamente o estado que
+        os deltas seguintes pressupõem.
+        """
+        entradas = {fonte: dict(self._enviado[fonte]) for fonte in self.fontes if self._enviado.get(fonte)}
+        return self._codificar('s', seq, ts_ms, entradas)
+
+    def snapshot(self, dados, seq, ts_ms):
+        """Quadro completo; reinicia a base dos deltas e descarta o lote pendente"""
+        self._enviado = {}
+        self._pendentes = []
+        self._ciclos = 0
+        entradas = {}
+        for fonte in self.fontes:
+            atual = dados.get(fonte)
+            if atual is None:
+                continue
+            entradas[fonte] = {campo: atual[campo] for campo in self.campos}
+            self._enviado[fonte] = dict(entradas[fonte])
+        return self._codificar('s', seq, ts_ms, entradas)
+
+    def atualizar(self, dados, seq, ts_ms):
+        """Delta (ou lote) do ciclo; None quando não há nada a enviar"""
+        entradas = self._delta(dados)
+
+        if self.lote == 1:
+            return self._codificar('d', seq, ts_ms, entradas) if entradas else None
+
+        if entradas:
+            self._pendentes.append((seq, ts_ms, entradas))
+        self._ciclos += 1
+        if self._ciclos < self.lote:
+            return None
+        self._ciclos = 0
+        if not self._pendentes:
+            return None
+        itens, self._pendentes = self._pendentes, []
+        return self._codificar_lote(seq, itens)
+
+    def _delta(self, dados):
+        entradas = {}
+        for fonte in self.fontes:
+            atual = dados.get(fonte)
+            if atual is None:
+                continue
+            enviado = self._enviado.setdefault(fonte, {})
+            mudancas = {}
+            if 'tensao' in self.campos:
+                tensao = atual['tensao']
+                anterior = enviado.get('tensao')
+                if anterior is None or (abs(tensao - anterior) >= self.banda_morta if self.banda_morta
+                                        else tensao != anterior):
+                    mudancas['tensao'] = tensao
+            if 'estado' in self.campos and atual['estado'] != enviado.get('estado'):
+                mudancas['estado'] = atual['estado']
+            if mudancas:
+                enviado.update(mudancas)
+                entradas[fonte] = mudancas
+        return entradas
+
+    # Codificação
+
+    def _codificar(self, tipo, seq, ts_ms, entradas):
+        if self.codificacao == 'struct':
+            return (_CABECALHO.pack(VERSAO, _TIPO_STRUCT[tipo], seq & 0xFFFFFFFF, ts_ms)
+                    + self._entradas_struct(entradas))
+        return self._serializar({'v': VERSAO, 't': tipo, 'seq': seq, 'ts': ts_ms, 'd': entradas})
+
+    def _codificar_lote(self, seq, itens):
+        ts_base = itens[0][1]
+        if self.codificacao == 'struct':
+            partes = [_CABECALHO.pack(VERSAO, _TIPO_STRUCT['l'], seq & 0xFFFFFFFF, ts_base),
+                      _CONTAGEM.pack(len(itens))]
+            for _, ts_ms, entradas in itens:
+                partes.append(_CICLO.pack(ts_ms - ts_base, len(entradas)))
+                partes.append(self._entradas_struct(entradas, com_contagem=False))
+            return b''.join(partes)
+        return self._serializar({
+            'v': VERSAO, 't': 'l', 'seq': seq, 'ts': ts_base,
+            'itens': [{'seq': s, 'ts': ts_ms, 'd': entradas} for s, ts_ms, entradas in itens]
+        })
+
+    def _serializar(self, quadro):
+        if self.codificacao == 'msgpack':
+            return msgpack.packb(quadro, use_bin_type=True)
+        return json.dumps(quadro, separators=(',', ':'), ensure_ascii=False)
+
+    def _entradas_struct(self, entradas, com_contagem=True):
+        partes = [_CONTAGEM.pack(len(entradas))] if com_contagem else []
+        for fonte, campos in entradas.items():
+            mascara = ('tensao' in campos) | (('estado' in campos) << 1)
+            partes.append(_ENTRADA.pack(self._indice_fonte[fonte], mascara))
+            if 'tensao' in campos:
+                partes.append(_TENSAO.pack(campos['tensao']))
+            if 'estado' in campos:
+                partes.append(_CONTAGEM.pack(_CODIGO_ESTADO.get(campos['estado'], 255)))
+        return b''.join(partes)
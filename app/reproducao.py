@@ -0,0 +1,312 @@
+"""
+Reprodução determinística de gravações pelo pipeline ao vivo.
+
+    python app/reproducao.py eventos.csv --velocidade 100 --banco /tmp/reproducao.db
+    python app/reproducao.py leituras_rede.json leituras_solar.json --velocidade max --json r.json
+
+Uma gravação é a série de tensões de cada fonte, lida de:
+
+- exportações de /exportar em CSV, JSON ou NDJSON (gzip também): cada
+  evento é a tensão da fonte a partir daquele instante (eventos manuais e
+  sem tensão são ignorados);
+- capturas de /leituras (JSON com fonte, ts e tensao), uma ou mais por
+  arquivo;
+- CSV bruto com as colunas ts (epoch ms), fonte e tensao.
+
+Gravacao.ler(nome, ts) devolve a última tensão gravada até ts e substitui
+fontes[nome].voltage / simular_leitura em amostrar_fontes; fontes ausentes
+da gravação continuam simuladas. O motor de aquisição roda em um
+RelogioVirtual que começa no início da gravação e anda 1×, 100× ou o mais
+rápido possível ("max": não dorme, cada espera só avança o tempo virtual).
+Estados, eventos, leituras, rollups, intervalos e o hub WebSocket recebem
+os instantes da gravação. Em "max" os ciclos caem sempre nos mesmos
+instantes (início + k × período) e o simulador das fontes ausentes é
+semeado (--semente, ou SIMULACAO_SEMENTE; padrão SEMENTE_PADRAO) e começa no
+início da gravação, então a reprodução é repetível, e o relógio espera as filas dos escritores esvaziarem em vez de descartar
+itens; em 1× e 100× o instante de cada ciclo segue o agendamento real.
+
+Servidor com reprodução (dashboard e clientes WebSocket reais):
+
+    REPRODUCAO_ARQUIVOS=eventos.csv REPRODUCAO_VELOCIDADE=100 python app/servidor_asgi.py
+
+Os eventos reproduzidos são gravados com as datas da gravação: use um
+banco separado (DATABASE_PATH ou --banco). A retenção de leituras e de
+rollups de 1 min fica desligada durante a reprodução, que senão apagaria
+os dados de gravações mais antigas que ela. As exportações arredondam a
+tensão em 2 casas, então uma leitura colada no limiar pode reproduzir em
+outro estado; capturas de /leituras não têm esse arredondamento.
+"""
+import argparse
+import asyncio
+import bisect
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Semente do simulador das fontes ausentes da gravação quando
+# SIMULACAO_SEMENTE não está definida: sem ela duas reproduções divergem
+SEMENTE_PADRAO = 42
+
+class ErroGravacao(ValueError):
+    """Arquivo de gravação em formato desconhecido ou sem tensões"""
+
+def velocidade_reproducao(texto):
+    """'max' -> None (sem esperas); número -> fator sobre o tempo real"""
+    texto = str(texto).strip().lower()
+    if texto in ('max', 'maxima', 'máxima'):
+        return None
+    velocidade = float(texto)
+    if velocidade <= 0:
+        raise ValueError("a velocidade deve ser positiva ou 'max'")
+    return velocidade
+
+class RelogioVirtual:
+    """
+    Relógio do motor de aquisição durante a reprodução (mesma interface de
+    aquisicao.RelogioReal). O tempo virtual começa em inicio_ms e anda
+    `velocidade` vezes o tempo real; com velocidade None, esperar() não
+    dorme e só avança o tempo virtual. Depois do primeiro ciclo em ou após
+    fim_ms, esperar() retorna True (o motor para) e `concluido` é sinalizado.
+
+    aguardar: callables que retornam True enquanto o pipeline está
+    atrasado; em velocidade máxima o relógio não avança enquanto algum
+    deles retornar True.
+    """
+
+    def __init__(self, inicio_ms, velocidade=1.0, fim_ms=None):
+        self.inicio_ms = inicio_ms
+        self.velocidade = velocidade
+        self.fim_ms = fim_ms
+        self.aguardar = []
+        self.concluido = threading.Event()
+        self._base = time.monotonic()
+        self._virtual = 0.0  # segundos virtuais decorridos (velocidade máxima)
+
+    def monotonico(self):
+        if self.velocidade is None:
+            return self._virtual
+        return (time.monotonic() - self._base) * self.velocidade
+
+    def epoch_ms(self):
+        return self.inicio_ms + int(round(self.monotonico() * 1000))
+
+    def esperar(self, segundos, parar):
+        if self.fim_ms is not None and self.epoch_ms() >= self.fim_ms:
+            if not self.concluido.is_set():
+                logger.info("Reprodução concluída: fim da gravação")
+                self.concluido.set()
+            return True
+        if self.velocidade is not None:
+            return parar.wait(segundos / self.velocidade)
+
+        while any(atrasado() for atrasado in self.aguardar):
+            if parar.wait(0.001):
+                return True
+        self._virtual += segundos
+        return parar.is_set()
+
+class Gravacao:
+    """
+    Séries gravadas por fonte: {fonte: (ts_ms em ordem, tensões)}.
+    A leitura entre duas amostras é a da anterior (sample-and-hold); antes
+    da primeira, a primeira.
+    """
+
+    def __init__(self, series):
+        self._series = {}
+        for fonte, amostras in series.items():
+            # Ordenar por instante; no mesmo instante vale a última amostra
+            por_ts = dict(sorted(amostras, key=lambda amostra: amostra[0]))
+            if por_ts:
+                self._series[fonte] = (list(por_ts), list(por_ts.values()))
+        if not self._series:
+            raise ErroGravacao("nenhuma tensão encontrada na gravação")
+        self.fontes = frozenset(self._series)
+        self.inicio_ms = min(ts[0] for ts, _ in self._series.values())
+        self.fim_ms = max(ts[-1] for ts, _ in self._series.values())
+
+    @classmethod
+    def carregar(cls, caminhos):
+        series = {}
+        for caminho in caminhos:
+            for fonte, ts_ms, tensao in _ler_arquivo(caminho):
+                series.setdefault(fonte, []).append((ts_ms, tensao))
+        gravacao = cls(series)
+        logger.info(f"Gravação carregada: {gravacao.total()} amostras de {sorted(gravacao.fontes)}, "
+                    f"{(gravacao.fim_ms - gravacao.inicio_ms) / 1000:.0f}s")
+        return gravacao
+
+    def total(self):
+        return sum(len(ts) for ts, _ in self._series.values())
+
+    def menor_intervalo(self, padrao=1.0):
+        """Menor intervalo entre amostras da mesma fonte (s): período que não pula amostras"""
+        menor = None
+        for ts, _ in self._series.values():
+            for anterior, atual in zip(ts, ts[1:]):
+                if menor is None or atual - anterior < menor:
+                    menor = atual - anterior
+        return menor / 1000.0 if menor else padrao
+
+    def ler(self, nome, ts):
+        """Tensão gravada da fonte no instante ts (epoch s)"""
+        instantes, tensoes = self._series[nome]
+        i = bisect.bisect_right(instantes, int(round(ts * 1000))) - 1
+        return tensoes[max(i, 0)]
+
+def _abrir_texto(caminho):
+    if caminho.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(caminho), encoding='utf-8')
+    return open(caminho, encoding='utf-8', newline='')
+
+def _ler_arquivo(caminho):
+    """Itera (fonte, ts_ms, tensao) de um arquivo de gravação"""
+    nome = caminho[:-3] if caminho.endswith('.gz') else caminho
+    with _abrir_texto(caminho) as arquivo:
+        if nome.endswith('.csv'):
+            yield from _ler_csv(arquivo, caminho)
+        elif nome.endswith(('.ndjson', '.jsonl')):
+            for linha in arquivo:
+                if linha.strip():
+                    yield from _registros_json(json.loads(linha), caminho)
+        else:
+            yield from _registros_json(json.load(arquivo), caminho)
+
+def _ler_csv(arquivo, caminho):
+    leitor = csv.DictReader(arquivo)
+    colunas = set(leitor.fieldnames or ())
+    if {'Fonte', 'Estado', 'Tensão (V)', 'Data/Hora'} <= colunas:
+        # Exportação de eventos: data/hora local com resolução de segundos
+        for linha in leitor:
+            if linha['Estado'] == 'manual' or linha['Tensão (V)'] in ('', 'N/A'):
+                continue
+            ts = datetime.strptime(linha['Data/Hora'], '%Y-%m-%d %H:%M:%S').timestamp()
+            yield linha['Fonte'], int(ts * 1000), float(linha['Tensão (V)'])
+    elif {'ts', 'fonte', 'tensao'} <= colunas:
+        for linha in leitor:
+            yield linha['fonte'], int(float(linha['ts'])), float(linha['tensao'])
+    else:
+        raise ErroGravacao(f"{caminho}: CSV sem as colunas de /exportar nem ts,fonte,tensao")
+
+def _registros_json(documento, caminho):
+    if isinstance(documento, list):
+        for item in documento:
+            yield from _registros_json(item, caminho)
+    elif isinstance(documento, dict) and 'eventos' in documento:
+        for evento in documento['eventos']:
+            yield from _registros_json(evento, caminho)
+    elif isinstance(documento, dict) and isinstance(documento.get('ts'), list):
+        # Captura de /leituras: uma fonte, ts e tensao em colunas
+        fonte = documento['fonte']
+        for ts_ms, tensao in zip(documento['ts'], documento['tensao']):
+            yield fonte, int(ts_ms), float(tensao)
+    elif isinstance(documento, dict) and 'fonte' in documento and 'ts' in documento:
+        # Evento de /exportar (json ou ndjson)
+        if documento.get('estado', documento.get('tipo')) != 'manual' and documento.get('tensao') is not None:
+            yield documento['fonte'], int(documento['ts']), float(documento['tensao'])
+    else:
+        raise ErroGravacao(f"{caminho}: formato JSON desconhecido")
+
+def main():
+    parser = argparse.ArgumentParser(description='Reproduz uma gravação pelo pipeline de aquisição')
+    parser.add_argument('arquivos', nargs='+', help='Exportações de /exportar, capturas de /leituras ou CSV ts,fonte,tensao')
+    parser.add_argument('--velocidade', default='max', help="Fator sobre o tempo real (1, 100...) ou 'max'")
+    parser.add_argument('--periodo', type=float, default=0,
+                        help='Segundos virtuais entre ciclos (padrão: menor intervalo da gravação)')
+    parser.add_argument('--banco', help='Banco SQLite da reprodução (padrão: DATABASE_PATH)')
+    parser.add_argument('--semente', type=int,
+                        help=f'Semente do simulador das fontes ausentes da gravação '
+                             f'(padrão: SIMULACAO_SEMENTE ou {SEMENTE_PADRAO})')
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    try:
+        velocidade_reproducao(args.velocidade)
+    except ValueError as e:
+        sys.exit(f"--velocidade: {e}")
+
+    # run lê a configuração ao ser importado: definir o ambiente antes
+    os.environ.update(REPRODUCAO_ARQUIVOS=os.pathsep.join(os.path.abspath(a) for a in args.arquivos),
+                      REPRODUCAO_VELOCIDADE=args.velocidade, REPRODUCAO_PERIODO=str(args.periodo))
+    if args.banco:
+        os.environ['DATABASE_PATH'] = args.banco
+    if args.semente is not None:
+        os.environ['SIMULACAO_SEMENTE'] = str(args.semente)
+    else:
+        os.environ.setdefault('SIMULACAO_SEMENTE', str(SEMENTE_PADRAO))
+    import run
+
+    gravacao = run.gravacao_reproducao
+    relogio = run.motor_aquisicao.relogio
+
+    # Hub WebSocket no seu event loop, como no servidor; em velocidade
+    # máxima o relógio espera as publicações pendentes
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="reproducao-hub", daemon=True).start()
+    # Cada contador tem um só escritor (thread do motor / event loop)
+    agendados = [0]
+    publicados = [0]
+
+    def publicar(inst):
+        run.hub_ws.publicar(inst.dados, inst.seq, inst.ts_ms, inst.mensagem)
+        publicados[0] += 1
+
+    def agendar(inst):
+        agendados[0] += 1
+        loop.call_soon_threadsafe(publicar, inst)
+
+    run.motor_aquisicao.assinar(agendar)
+    relogio.aguardar.append(lambda: agendados[0] - publicados[0] > 1000)
+
+    periodo = run.motor_aquisicao.metricas()['periodo_s']
+    print(f"Reproduzindo {gravacao.total()} amostras de {', '.join(sorted(gravacao.fontes))} "
+          f"({(gravacao.fim_ms - gravacao.inicio_ms) / 1000:.0f}s gravados), período {periodo:g}s, "
+          f"velocidade {args.velocidade}")
+    inicio = time.perf_counter()
+    run.iniciar_servicos()
+    try:
+        relogio.concluido.wait()
+    except KeyboardInterrupt:
+        pass
+    decorrido = time.perf_counter() - inicio
+    while publicados[0] < agendados[0]:
+        time.sleep(0.01)
+    run.encerrar_servicos()
+    loop.call_soon_threadsafe(loop.stop)
+
+    ciclos = run.motor_aquisicao.ciclos
+    ultimo = run.motor_aquisicao.instantaneo()
+    eventos = run.escritor_eventos.metricas()
+    resultado = {
+        'amostras_gravadas': gravacao.total(),
+        'fontes': sorted(gravacao.fontes),
+        'periodo_s': periodo,
+        'velocidade': args.velocidade,
+        'ciclos': ciclos,
+        'segundos': round(decorrido, 3),
+        'ciclos_por_s': round(ciclos / decorrido, 1),
+        'leituras_por_s': round(ciclos * len(run.FONTES_CONFIG) / decorrido, 1),
+        'aceleracao': round((ultimo.ts_ms - relogio.inicio_ms) / 1000 / decorrido, 1) if ultimo else None,
+        'eventos_gravados': eventos['gravados'],
+        'eventos_descartados': eventos['descartados'],
+        'quadros_ws_serializados': run.hub_ws.serializacoes
+    }
+    print(f"{ciclos} ciclos em {decorrido:.2f}s: {resultado['ciclos_por_s']} ciclos/s, "
+          f"{resultado['leituras_por_s']} leituras/s, {resultado['aceleracao']}x o tempo real; "
+          f"{eventos['gravados']} eventos gravados, {eventos['descartados']} descartados")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Agregados pré-calculados (rollups) por fonte em 1 minuto, 1 hora e 1 dia.
+
+O AgregadorRollups acumula em memória o minuto corrente de cada fonte
+(contagem, mínimo, máximo, soma, soma dos quadrados e segundos em cada
+estado). Quando o minuto fecha, o delta é enviado ao escritor em lote, que
+faz um UPSERT somando-o nas três tabelas. Como as tabelas de 1h e 1d recebem
+o delta de cada minuto, reiniciar o processo no meio de uma hora não perde
+nada.
+
+consultar_agregado() decompõe a janela em dias inteiros, horas das bordas e
+minutos das bordas, lendo no máximo algumas centenas de linhas para 30 dias.
+"""
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+ESTADOS = ('ATIVA', 'INSTAVEL', 'FALHA', 'ERRO')
+
+# resolução em segundos -> tabela
+TABELAS = {60: 'rollup_1m', 3600: 'rollup_1h', 86400: 'rollup_1d'}
+
+_COLUNAS_ESTADO = ('seg_ativa', 'seg_instavel', 'seg_falha', 'seg_erro')
+
+def sql_criar_tabelas():
+    comandos = []
+    for tabela in TABELAS.values():
+        comandos.append(f"""
+            CREATE TABLE IF NOT EXISTS {tabela} (
+                fonte TEXT NOT NULL,
+                inicio INTEGER NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                tensao_min REAL,
+                tensao_max REAL,
+                soma REAL NOT NULL DEFAULT 0,
+                soma_quadrados REAL NOT NULL DEFAULT 0,
+                seg_ativa REAL NOT NULL DEFAULT 0,
+                seg_instavel REAL NOT NULL DEFAULT 0,
+                seg_falha REAL NOT NULL DEFAULT 0,
+                seg_erro REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (fonte, inicio)
+            ) WITHOUT ROWID
+        """)
+    return comandos
+
+def sql_somar(tabela):
+    """
+    UPSERT que soma uma linha (fonte, inicio, n, min, max, soma, soma_quadrados,
+    seg_ativa, seg_instavel, seg_falha, seg_erro) à linha existente do período
+    """
+    return f"""
+        INSERT INTO {tabela} (fonte, inicio, n, tensao_min, tensao_max, soma, soma_quadrados,
+                              seg_ativa, seg_instavel, seg_falha, seg_erro)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(fonte, inicio) DO UPDATE SET
+            n = n + excluded.n,
+            tensao_min = COALESCE(MIN(tensao_min, excluded.tensao_min), tensao_min, excluded.tensao_min),
+            tensao_max = COALESCE(MAX(tensao_max, excluded.tensao_max), tensao_max, excluded.tensao_max),
+            soma = soma + excluded.soma,
+            soma_quadrados = soma_quadrados + excluded.soma_quadrados,
+            seg_ativa = seg_ativa + excluded.seg_ativa,
+            seg_instavel = seg_instavel + excluded.seg_instavel,
+            seg_falha = seg_falha + excluded.seg_falha,
+            seg_erro = seg_erro + excluded.seg_erro
+    """
+
+def _novo_balde(inicio):
+    # [inicio, n, min, max, soma, soma_quadrados, seg_ativa, seg_instavel, seg_falha, seg_erro]
+    return [inicio, 0, None, None, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+
+_INDICE_ESTADO = {estado: 6 + i for i, estado in enumerate(ESTADOS)}
+
+class AgregadorRollups:
+    """
+    Mantém o minuto corrente de cada fonte e publica os minutos fechados.
+
+    max_dt limita o tempo atribuído ao estado anterior entre duas amostras:
+    lacunas maiores (processo parado, travamento) não contam como tempo em
+    nenhum estado. Deve ser <= 60 para que uma lacuna cruze no máximo uma
+    fronteira de minuto.
+    """
+
+    def __init__(self, escritor, max_dt=60.0):
+        self.escritor = escritor
+        self.max_dt = min(max_dt, 60.0)
+        self._baldes = {}
+        self._ultimo = {}
+        self._lock = threading.Lock()
+
+    def adicionar(self, fonte, ts, tensao, estado):
+        """Registra uma amostra (ts em segundos epoch)"""
+        inicio_minuto = int(ts // 60) * 60
+        with self._lock:
+            balde = self._baldes.get(fonte)
+            anterior = self._ultimo.get(fonte)
+
+            if balde is None:
+                balde = self._baldes[fonte] = _novo_balde(inicio_minuto)
+
+            # Tempo desde a amostra anterior pertence ao estado anterior
+            if anterior is not None:
+                ts_ant, estado_ant = anterior
+                dt = ts - ts_ant
+                indice = _INDICE_ESTADO.get(estado_ant)
+                if 0 < dt <= self.max_dt and indice is not None:
+                    if inicio_minuto > balde[0]:
+                        # Parte até a fronteira fica no minuto que está fechando
+                        balde[indice] += max(0.0, min(dt, inicio_minuto - ts_ant))
+                    else:
+                        balde[indice] += dt
+
+            if inicio_minuto > balde[0]:
+                self.escritor.enfileirar((fonte,) + tuple(balde))
+                novo = _novo_balde(inicio_minuto)
+                if anterior is not None:
+                    ts_ant, estado_ant = anterior
+                    dt = ts - ts_ant
+                    indice = _INDICE_ESTADO.get(estado_ant)
+                    if 0 < dt <= self.max_dt and indice is not None:
+                        novo[indice] += min(dt, ts - inicio_minuto)
+                balde = self._baldes[fonte] = novo
+
+            if tensao is not None:
+                balde[1] += 1
+                balde[2] = tensao if balde[2] is None else min(balde[2], tensao)
+                balde[3] = tensao if balde[3] is None else max(balde[3], tensao)
+                balde[4] += tensao
+                balde[5] += tensao * tensao
+
+            self._ultimo[fonte] = (ts, estado)
+
+    def balde_aberto(self, fonte):
+        """Cópia do minuto corrente (ainda não gravado) de uma fonte"""
+        with self._lock:
+            balde = self._baldes.get(fonte)
+            return list(balde) if balde else None
+
+    def selar_todos(self):
+        """Envia os minutos abertos ao escritor (encerramento)"""
+        with self._lock:
+            for fonte, balde in self._baldes.items():
+                self.escritor.enfileirar((fonte,) + tuple(balde))
+            self._baldes.clear()
+
+class ArmazemRollups:
+    """Gravação dos minutos fechados nas três resoluções (thread do escritor)"""
+
+    def __init__(self, retencao_1m_dias=35, intervalo_purga=3600.0):
+        self.retencao_1m = int(retencao_1m_dias * 86400)
+        self.intervalo_purga = intervalo_purga
+        self._ultima_purga = 0.0
+
+    def gravar_lote(self, conn, baldes):
+        for resolucao, tabela in TABELAS.items():
+            linhas = [
+                (fonte, inicio - inicio % resolucao) + tuple(resto)
+                for fonte, inicio, *resto in baldes
+            ]
+            conn.executemany(sql_somar(tabela), linhas)
+
+        agora = time.time()
+        if self.retencao_1m > 0 and agora - self._ultima_purga >= self.intervalo_purga:
+            self._ultima_purga = agora
+            conn.execute("DELETE FROM rollup_1m WHERE inicio < ?", (int(agora) - self.retencao_1m,))
+
+def decompor_janela(inicio, fim):
+    """
+    Divide [inicio, fim) em faixas (resolucao, a, b) alinhadas: minutos nas
+    bordas, depois horas, e dias inteiros no meio. As bordas são arredondadas
+    para o minuto.
+    """
+    lo = int(inicio // 60) * 60
+    hi = int(math.ceil(fim / 60)) * 60
+    faixas = []
+    for fina, grossa in ((60, 3600), (3600, 86400)):
+        lo_g = int(math.ceil(lo / grossa)) * grossa
+        hi_g = (hi // grossa) * grossa
+        if lo_g >= hi_g:
+            faixas.append((fina, lo, hi))
+            return faixas
+        faixas.append((fina, lo, lo_g))
+        faixas.append((fina, hi_g, hi))
+        lo, hi = lo_g, hi_g
+    faixas.append((86400, lo, hi))
+    return faixas
+
+def consultar_agregado(conn, fonte, inicio, fim, balde_aberto=None):
+    """
+    Agrega n/min/max/média/desvio e segundos por estado de uma fonte em
+    [inicio, fim) (segundos epoch) a partir dos rollups, incluindo o minuto
+    ainda em memória quando informado.
+    """
+    partes = []
+    params = []
+    for resolucao, a, b in decompor_janela(inicio, fim):
+        if a >= b:
+            continue
+        partes.append(f"""
+            SELECT n, tensao_min, tensao_max, soma, soma_quadrados,
+                   seg_ativa, seg_instavel, seg_falha, seg_erro
+            FROM {TABELAS[resolucao]} WHERE fonte = ? AND inicio >= ? AND inicio < ?
+        """)
+        params.extend((fonte, a, b))
+
+    total = [0, None, None, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    linhas = []
+    if partes:
+        linhas = conn.execute(f"""
+            SELECT COALESCE(SUM(n), 0), MIN(tensao_min), MAX(tensao_max),
+                   COALESCE(SUM(soma), 0), COALESCE(SUM(soma_quadrados), 0),
+                   COALESCE(SUM(seg_ativa), 0), COALESCE(SUM(seg_instavel), 0),
+                   COALESCE(SUM(seg_falha), 0), COALESCE(SUM(seg_erro), 0)
+            FROM ({' UNION ALL '.join(partes)})
+        """, params).fetchall()
+
+    if balde_aberto and inicio - 60 < balde_aberto[0] < fim:
+        linhas = list(linhas) + [tuple(balde_aberto[1:])]
+
+    for linha in linhas:
+        n, t_min, t_max, soma, soma_q, *segundos = linha
+        total[0] += n
+        if t_min is not None:
+            total[1] = t_min if total[1] is None else min(total[1], t_min)
+        if t_max is not None:
+            total[2] = t_max if total[2] is None else max(total[2], t_max)
+        total[3] += soma
+        total[4] += soma_q
+        for i, seg in enumerate(segundos):
+            total[5 + i] += seg
+
+    n, t_min, t_max, soma, soma_q = total[:5]
+    media = soma / n if n else None
+    desvio = math.sqrt(max(0.0, soma_q / n - media * media)) if n else None
+    return {
+        'n': n,
+        'tensao_min': t_min,
+        'tensao_max': t_max,
+        'tensao_media': media,
+        'desvio_padrao': desvio,
+        'segundos_estado': dict(zip(ESTADOS, total[5:]))
+    }
@@ -1,12 +1,14 @@
 import asyncio
+import atexit
+import copy
 import threading
 import json
 import logging
 import os
-import random
 import time
 from contextlib import contextmanager
-from flask import Flask, jsonify, request, send_from_directory
+from urllib.parse import urlsplit
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 import websockets
 import sqlite3
@@ -16,12 +18,31 @@ try:
     import busio
     import adafruit_ads1x15.ads1115 as ADS
     from adafruit_ads1x15.analog_in import AnalogIn
+    from adafruit_ads1x15.ads1x15 import Mode
     HARDWARE_AVAILABLE = True
 except ImportError:
     HARDWARE_AVAILABLE = False
     print("AVISO: Hardware não disponível. Executando em modo simulação.")
 
 from config import *
+from banco import PoolConexoes
+from escritor import EscritorEmLote
+from cache_respostas import CacheRespostas
+from hub_ws import HubTransmissao
+import leituras
+import rollups
+import intervalos
+import apagoes
+import migracoes
+import exportacao
+import agregacao_eventos
+import protocolo_ws
+import aquisicao
+import aquisicao_ads
+import anel_compartilhado
+import simulacao
+import reproducao
+from exportacao import formatar_ts
 
 # Configuração de logging
 logging.basicConfig(
@@ -41,21 +62,57 @@ STATIC_DIR = os.path.join(BASE_DIR, 'static')
 app = Flask(__name__, static_folder=STATIC_DIR, static_url_path='/static')
 CORS(app)
 
+# Cache de respostas dos endpoints consultados periodicamente pelo dashboard
+cache_respostas = CacheRespostas(
+    max_entradas=CACHE_RESPOSTAS_MAX_ENTRADAS,
+    ativo=CACHE_RESPOSTAS_ATIVO
+)
+
+# Worker de API da implantação multiprocesso (servidor_multiprocesso.py):
+# hardware, máquina de estados e rastreadores ficam no processo de
+# aquisição, que publica cada ciclo no anel compartilhado
+anel_aquisicao = None
+if PAPEL_PROCESSO == 'api':
+    anel_aquisicao = anel_compartilhado.AnelInstantaneos.abrir(ANEL_NOME)
+    HARDWARE_AVAILABLE = anel_aquisicao.hardware
+
+# Reprodução de uma gravação (reproducao.py): as tensões gravadas tomam o
+# lugar do hardware e o motor de aquisição roda no relógio virtual
+gravacao_reproducao = None
+if REPRODUCAO_ARQUIVOS and PAPEL_PROCESSO != 'api':
+    gravacao_reproducao = reproducao.Gravacao.carregar(REPRODUCAO_ARQUIVOS.split(os.pathsep))
+    HARDWARE_AVAILABLE = False
+
 # Inicialização do hardware (se disponível)
-if HARDWARE_AVAILABLE:
+leitor_ads = None
+if ADS_RAJADA_ESTADO not in aquisicao_ads.REDUCOES:
+    logger.warning(f"ADS_RAJADA_ESTADO inválido: {ADS_RAJADA_ESTADO}; usando 'media'")
+    ADS_RAJADA_ESTADO = 'media'
+if HARDWARE_AVAILABLE and PAPEL_PROCESSO != 'api':
     try:
         i2c = busio.I2C(board.SCL, board.SDA)
-        ads = ADS.ADS1115(i2c, gain=ADS_GAIN, data_rate=ADS_DATA_RATE)
-        
         fontes = {}
-        for nome, config in FONTES_CONFIG.items():
-            fontes[nome] = AnalogIn(ads, getattr(ADS, f'P{config["canal"]}'))
+        if ADS_MODO_RAJADA:
+            # A thread leitora é a única dona do ADC; ninguém mais lê os canais
+            ads = ADS.ADS1115(i2c, gain=ADS_GAIN, data_rate=ADS_RAJADA_TAXA, mode=Mode.CONTINUOUS)
+            leitor_ads = aquisicao_ads.LeitorRajadas(
+                ads,
+                {nome: getattr(ADS, f'P{config["canal"]}') for nome, config in FONTES_CONFIG.items()},
+                escala=aquisicao_ads.escala_volts(ADS_GAIN),
+                taxa=ADS_RAJADA_TAXA,
+                amostras_por_rajada=ADS_RAJADA_AMOSTRAS
+            )
+        else:
+            ads = ADS.ADS1115(i2c, gain=ADS_GAIN, data_rate=ADS_DATA_RATE)
+            for nome, config in FONTES_CONFIG.items():
+                fontes[nome] = AnalogIn(ads, getattr(ADS, f'P{config["canal"]}'))
         
         logger.info("Hardware inicializado com sucesso")
     except Exception as e:
         logger.error(f"Erro ao inicializar hardware: {e}")
         HARDWARE_AVAILABLE = False
         fontes = {}
+        leitor_ads = None
 else:
     fontes = {}
 
@@ -64,29 +121,41 @@ LIMIAR = LIMIAR_TENSAO
 
 # Variáveis para simulação avançada
 simulacao_iniciada = datetime.now()
-cenarios_simulacao = {
-    'rede': {'ultimo_evento': datetime.now(), 'estado_forcado': None, 'duracao_evento': 0},
-    'solar': {'ultimo_evento': datetime.now(), 'estado_forcado': None, 'duracao_evento': 0},
-    'gerador': {'ultimo_evento': datetime.now(), 'estado_forcado': None, 'duracao_evento': 0},
-    'ups': {'ultimo_evento': datetime.now(), 'estado_forcado': None, 'duracao_evento': 0}
-}
+if anel_aquisicao is not None:
+    # Uptime do sistema é o do processo de aquisição, igual em todos os workers
+    simulacao_iniciada = datetime.fromtimestamp(anel_aquisicao.inicio_ms / 1000.0)
+if gravacao_reproducao is not None:
+    # Fontes ausentes da gravação continuam simuladas: semente fixa e início
+    # na gravação (descarga da UPS) para a reprodução ser repetível
+    simulador = simulacao.Simulador(
+        FONTES_CONFIG.keys(), inicio_ts=gravacao_reproducao.inicio_ms / 1000.0,
+        semente=SIMULACAO_SEMENTE if SIMULACAO_SEMENTE is not None else reproducao.SEMENTE_PADRAO
+    )
+else:
+    simulador = simulacao.Simulador(
+        FONTES_CONFIG.keys(), inicio_ts=simulacao_iniciada.timestamp(), semente=SIMULACAO_SEMENTE
+    )
+
+# Pools de conexões persistentes com SQLite (escrita e somente leitura)
+pool_escrita = PoolConexoes(
+    DATABASE_PATH, tamanho=DB_POOL_ESCRITA,
+    mmap_bytes=DB_MMAP_BYTES, cache_kb=DB_CACHE_KB
+)
+pool_leitura = PoolConexoes(
+    DATABASE_PATH, tamanho=DB_POOL_LEITURA, somente_leitura=True,
+    mmap_bytes=DB_MMAP_BYTES, cache_kb=DB_CACHE_KB
+)
 
 # Contexto manager para conexão segura com SQLite
 @contextmanager
-def get_db_connection():
-    conn = None
+def get_db_connection(somente_leitura=False):
+    pool = pool_leitura if somente_leitura else pool_escrita
     try:
-        conn = sqlite3.connect(DATABASE_PATH, timeout=10.0)
-        conn.row_factory = sqlite3.Row
-        yield conn
+        with pool.conexao() as conn:
+            yield conn
     except sqlite3.Error as e:
         logger.error(f"Erro no banco de dados: {e}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
 def determinar_estado_fonte(fonte, tensao):
     """Determina o estado de uma fonte baseado na tensão e tipo"""
@@ -115,17 +184,8 @@ def get_db():
 def init_database():
     try:
         with get_db_connection() as conn:
-            # Tabela de eventos
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS eventos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fonte TEXT NOT NULL,
-                    tipo TEXT NOT NULL,
-                    tensao REAL,
-                    data_hora TEXT NOT NULL,
-                    UNIQUE(fonte, tipo, data_hora)
-                )
-            """)
+            # Tabela de eventos (timestamps epoch ms); migra bancos antigos
+            migracoes.garantir_esquema(conn)
             
             # Tabela de configurações persistentes
             conn.execute("""
@@ -139,21 +199,37 @@ def init_database():
                 )
             """)
             
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_eventos_data_hora 
-                ON eventos(data_hora DESC)
-            """)
-            
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_configuracoes_chave 
                 ON configuracoes(chave)
             """)
             
+            # Blocos de leituras brutas de tensão
+            conn.execute(leituras.SQL_CRIAR_TABELA)
+            conn.execute(leituras.SQL_CRIAR_INDICE)
+            
+            # Agregados pré-calculados (1 min / 1 h / 1 dia)
+            for comando in rollups.sql_criar_tabelas():
+                conn.execute(comando)
+            
+            # Intervalos de estado por fonte (disponibilidade ponderada por tempo)
+            conn.execute(intervalos.SQL_CRIAR_TABELA)
+            conn.execute(intervalos.SQL_CRIAR_INDICE)
+            
+            # Períodos de apagão total
+            conn.execute(apagoes.SQL_CRIAR_TABELA)
+            
             conn.commit()
             logger.info("Banco de dados inicializado")
             
+            # Retomar os intervalos de estado da execução anterior
+            rastreador_intervalos.carregar(conn)
+            rastreador_apagoes.carregar(conn)
+            
             # Inicializar configurações padrão se não existirem
             init_default_configurations(conn)
+        
+        carregar_cache_configuracoes()
             
     except Exception as e:
         logger.error(f"Erro ao inicializar banco: {e}")
@@ -188,43 +264,96 @@ def init_default_configurations(conn):
     except Exception as e:
         logger.error(f"Erro ao inicializar configurações padrão: {e}")
 
-def get_config_value(chave, default=None):
-    """Obtém valor de configuração do banco de dados"""
+# Cache de configurações em memória (write-through a partir de set_config_value)
+_config_cache = {}
+_config_cache_carregado = False
+_config_lock = threading.Lock()
+config_versao = 0
+
+def _converter_valor_config(valor, tipo):
+    """Converte o valor armazenado como texto para o tipo declarado"""
+    if tipo == 'float':
+        return float(valor)
+    elif tipo == 'int':
+        return int(valor)
+    elif tipo == 'boolean':
+        return valor.lower() in ('true', '1', 'yes')
+    elif tipo == 'json':
+        return json.loads(valor)
+    else:
+        return valor
+
+def aplicar_thresholds(thresholds):
+    """
+    Copia os limiares salvos (thresholds_fontes) para FONTES_CONFIG, que é o
+    que determinar_estado_fonte consulta. Na implantação multiprocesso o POST
+    /configuracao chega a um worker; o processo de aquisição só recebe os
+    novos limiares por aqui, ao recarregar o cache.
+    """
+    if not isinstance(thresholds, dict):
+        return
+    for fonte, valor in thresholds.items():
+        if fonte in FONTES_CONFIG:
+            try:
+                FONTES_CONFIG[fonte]['threshold'] = float(valor)
+            except (TypeError, ValueError):
+                logger.error(f"Threshold inválido para {fonte} ignorado: {valor!r}")
+
+def carregar_cache_configuracoes():
+    """Carrega todas as configurações do banco para o cache em memória"""
+    global _config_cache, _config_cache_carregado, config_versao
     try:
-        with get_db_connection() as conn:
-            cursor = conn.execute(
-                "SELECT valor, tipo FROM configuracoes WHERE chave = ?",
-                (chave,)
-            )
-            row = cursor.fetchone()
-            
-            if row:
-                valor, tipo = row
-                
-                # Converter para o tipo apropriado
-                if tipo == 'float':
-                    return float(valor)
-                elif tipo == 'int':
-                    return int(valor)
-                elif tipo == 'boolean':
-                    return valor.lower() in ('true', '1', 'yes')
-                elif tipo == 'json':
-                    import json
-                    return json.loads(valor)
-                else:
-                    return valor
-            
-            return default
-            
+        with get_db_connection(somente_leitura=True) as conn:
+            rows = conn.execute("SELECT chave, valor, tipo FROM configuracoes").fetchall()
+        
+        novo_cache = {}
+        for chave, valor, tipo in rows:
+            try:
+                novo_cache[chave] = _converter_valor_config(valor, tipo)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Configuração {chave} com valor inválido ignorada: {e}")
+        
+        with _config_lock:
+            _config_cache = novo_cache
+            _config_cache_carregado = True
+            config_versao += 1
+        aplicar_thresholds(novo_cache.get('thresholds_fontes'))
+        cache_respostas.invalidar()
+        logger.info(f"Cache de configurações carregado ({len(novo_cache)} chaves)")
+        
     except Exception as e:
-        logger.error(f"Erro ao obter configuração {chave}: {e}")
-        return default
+        logger.error(f"Erro ao carregar cache de configurações: {e}")
+
+def anunciar_versao(contador):
+    """
+    Nova versão de dados (CONTADOR_DADOS) ou de configuração (CONTADOR_CONFIG):
+    invalida o cache deste processo e, na implantação multiprocesso, avisa
+    os demais pelo anel compartilhado
+    """
+    cache_respostas.invalidar()
+    if anel_aquisicao is not None:
+        anel_aquisicao.incrementar(contador, PROCESSO_INDICE)
+
+def get_config_versao():
+    """Versão atual do cache; muda a cada alteração de configuração"""
+    return config_versao
+
+def get_config_value(chave, default=None):
+    """Obtém valor de configuração a partir do cache em memória"""
+    if not _config_cache_carregado:
+        carregar_cache_configuracoes()
+    
+    valor = _config_cache.get(chave, default)
+    
+    # Evitar que o chamador altere o valor compartilhado do cache
+    if isinstance(valor, (dict, list)):
+        return copy.deepcopy(valor)
+    return valor
 
 def set_config_value(chave, valor, tipo='string', usuario='web'):
-    """Define valor de configuração no banco de dados"""
+    """Define valor de configuração no banco de dados e atualiza o cache"""
+    global config_versao
     try:
-        import json
-        
         # Converter valor para string conforme o tipo
         if tipo == 'json':
             valor_str = json.dumps(valor)
@@ -238,6 +367,12 @@ def set_config_value(chave, valor, tipo='string', usuario='web'):
             """, (chave, valor_str, tipo, datetime.now().isoformat(), usuario))
             
             conn.commit()
+        
+        # Write-through: o cache reflete exatamente o que foi gravado
+        with _config_lock:
+            _config_cache[chave] = _converter_valor_config(valor_str, tipo)
+            config_versao += 1
+        anunciar_versao(anel_compartilhado.CONTADOR_CONFIG)
             
         logger.info(f"Configuração {chave} atualizada para {valor} por {usuario}")
         return True
@@ -246,180 +381,291 @@ def set_config_value(chave, valor, tipo='string', usuario='web'):
         logger.error(f"Erro ao definir configuração {chave}: {e}")
         return False
 
-def registrar_evento(fonte, tipo, tensao=None):
+def _gravar_lote_eventos(conn, eventos):
+    """Grava um lote de eventos em uma única transação (thread do escritor)"""
+    conn.executemany(
+        "INSERT INTO eventos (fonte, tipo, tensao, ts) VALUES (?, ?, ?, ?)",
+        eventos
+    )
+    for fonte, tipo, tensao, ts_ms in eventos:
+        logger.info(f"[{formatar_ts(ts_ms)}] {fonte.upper()} - {tipo} - {tensao}V")
+
+escritor_eventos = EscritorEmLote(
+    'eventos',
+    get_db_connection,
+    _gravar_lote_eventos,
+    tamanho_fila=EVENTOS_FILA_MAX,
+    janela_flush=EVENTOS_JANELA_FLUSH,
+    tamanho_lote=EVENTOS_LOTE_MAX,
+    # Eventos novos mudam /eventos e /estatisticas: nova versão de dados
+    apos_gravar=lambda eventos: anunciar_versao(anel_compartilhado.CONTADOR_DADOS)
+)
+
+# A retenção compara com o relógio de parede: reproduzindo uma gravação mais
+# antiga que ela, apagaria o que acabou de gravar. Desligada na reprodução.
+_retencao_ativa = gravacao_reproducao is None
+
+# Leituras brutas: um bloco compactado por fonte por LEITURAS_BLOCO_SEGUNDOS
+armazem_leituras = leituras.ArmazemLeituras(
+    retencao_dias=LEITURAS_RETENCAO_DIAS if _retencao_ativa else 0
+)
+escritor_leituras = EscritorEmLote(
+    'leituras',
+    get_db_connection,
+    armazem_leituras.gravar_lote,
+    tamanho_fila=1000,
+    janela_flush=2.0,
+    tamanho_lote=100
+)
+buffer_leituras = leituras.BufferLeituras(escritor_leituras, duracao_bloco=LEITURAS_BLOCO_SEGUNDOS)
+
+# Rollups por fonte, atualizados incrementalmente a cada amostra
+armazem_rollups = rollups.ArmazemRollups(
+    retencao_1m_dias=ROLLUP_1M_RETENCAO_DIAS if _retencao_ativa else 0
+)
+escritor_rollups = EscritorEmLote(
+    'rollups',
+    get_db_connection,
+    armazem_rollups.gravar_lote,
+    tamanho_fila=1000,
+    janela_flush=2.0,
+    tamanho_lote=200
+)
+agregador_rollups = rollups.AgregadorRollups(escritor_rollups)
+
+# Intervalos de estado e apagões totais, alimentados pela máquina de estados
+def _gravar_lote_estados(conn, itens):
+    """Aplica em ordem os itens da máquina de estados (thread do escritor)"""
+    for item in itens:
+        if item[0].startswith('apagao'):
+            rastreador_apagoes.gravar_item(conn, item)
+        else:
+            rastreador_intervalos.gravar_item(conn, item)
+
+def _apos_gravar_estados(itens):
+    """
+    Abertura/fechamento de intervalo e apagões mudam /estatisticas. Os
+    checkpoints periódicos de cada fonte só avançam o intervalo em aberto,
+    que /estatisticas já estende até agora (e cuja resposta expira pelo
+    TTL): não invalidam o cache nem avisam os workers.
+    """
+    if any(item[0] != 'checkpoint' for item in itens):
+        anunciar_versao(anel_compartilhado.CONTADOR_DADOS)
+
+escritor_estados = EscritorEmLote(
+    'estados',
+    get_db_connection,
+    _gravar_lote_estados,
+    tamanho_fila=EVENTOS_FILA_MAX,
+    janela_flush=EVENTOS_JANELA_FLUSH,
+    tamanho_lote=EVENTOS_LOTE_MAX,
+    apos_gravar=_apos_gravar_estados
+)
+rastreador_intervalos = intervalos.RastreadorIntervalos(
+    escritor_estados, intervalo_checkpoint=INTERVALOS_CHECKPOINT_SEGUNDOS
+)
+rastreador_apagoes = apagoes.RastreadorApagoes(escritor_estados, FONTES_CONFIG.keys())
+
+def registrar_evento(fonte, tipo, tensao=None, ts_ms=None):
+    """Enfileira o evento para gravação em lote; nunca espera pelo disco"""
     try:
-        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with get_db_connection() as conn:
-            conn.execute(
-                "INSERT OR IGNORE INTO eventos (fonte, tipo, tensao, data_hora) VALUES (?, ?, ?, ?)", 
-                (fonte, tipo, tensao, agora)
-            )
-            conn.commit()
-        logger.info(f"[{agora}] {fonte.upper()} - {tipo} - {tensao}V")
+        if ts_ms is None:
+            ts_ms = int(time.time() * 1000)
+        return escritor_eventos.enfileirar((fonte, tipo, tensao, ts_ms))
     except Exception as e:
         logger.error(f"Erro ao registrar evento: {e}")
+        return False
 
-def simular_leitura_avancada(nome):
+def simular_leitura_avancada(nome, ts=None):
     """
     Simulação avançada com cenários realistas de quedas de energia,
-    flutuações e comportamentos dinâmicos baseados no tipo de fonte.
+    flutuações e comportamentos dinâmicos baseados no tipo de fonte
+    (modelos por fonte em simulacao.MODELOS). ts: instante da leitura em
+    epoch s, o do ciclo de aquisição; agora por padrão.
     """
-    global cenarios_simulacao
-    
-    agora = datetime.now()
-    cenario = cenarios_simulacao[nome]
-    
-    # Configurações específicas por fonte
-    configs = {
-        'rede': {
-            'tensao_nominal': 220.0,
-            'variacao_normal': 8.0,  # ±8V variação normal
-            'prob_queda': 0.003,     # 0.3% chance de queda por leitura
-            'duracao_queda_min': 5,  # 5 segundos mínimo
-            'duracao_queda_max': 120, # 2 minutos máximo
-            'tensao_queda': lambda: random.uniform(0, 50),  # Tensão durante queda
-            'recuperacao_gradual': True
-        },
-        'solar': {
-            'tensao_nominal': 180.0,
-            'variacao_normal': 25.0,  # ±25V (dependente do sol)
-            'prob_queda': 0.008,      # 0.8% chance de "nuvem" ou problema
-            'duracao_queda_min': 10,
-            'duracao_queda_max': 300, # 5 minutos
-            'tensao_queda': lambda: random.uniform(20, 80),  # Redução parcial
-            'recuperacao_gradual': True,
-            'comportamento_hora': True  # Varia conforme hora do dia
-        },
-        'gerador': {
-            'tensao_nominal': 240.0,
-            'variacao_normal': 12.0,
-            'prob_queda': 0.005,      # 0.5% chance de falha
-            'duracao_queda_min': 3,
-            'duracao_queda_max': 60,
-            'tensao_queda': lambda: random.uniform(0, 30),  # Falha mais severa
-            'recuperacao_gradual': False  # Liga/desliga mais abrupto
-        },
-        'ups': {
-            'tensao_nominal': 12.6,   # Bateria 12V nominal
-            'variacao_normal': 0.8,   # ±0.8V
-            'prob_queda': 0.001,      # 0.1% chance de falha
-            'duracao_queda_min': 2,
-            'duracao_queda_max': 30,
-            'tensao_queda': lambda: random.uniform(9.5, 11.0),  # Bateria baixa
-            'recuperacao_gradual': True,
-            'descarga_gradual': True  # Simula descarga da bateria
-        }
-    }
-    
-    config = configs[nome]
-    
-    # Verificar se há evento forçado em andamento
-    if cenario['estado_forcado'] is not None:
-        tempo_evento = (agora - cenario['ultimo_evento']).total_seconds()
-        
-        if tempo_evento >= cenario['duracao_evento']:
-            # Finalizar evento
-            cenario['estado_forcado'] = None
-            logger.info(f"[SIMULAÇÃO] {nome}: Evento finalizado após {tempo_evento:.1f}s")
-        else:
-            # Continuar evento
-            if cenario['estado_forcado'] == 'FALHA':
-                tensao = config['tensao_queda']()
-                # Adicionar variação pequena durante a falha
-                tensao += random.uniform(-5, 5)
-                return max(0, tensao)
-    
-    # Verificar se deve iniciar novo evento
-    if cenario['estado_forcado'] is None and random.random() < config['prob_queda']:
-        # Iniciar evento de queda
-        cenario['estado_forcado'] = 'FALHA'
-        cenario['ultimo_evento'] = agora
-        cenario['duracao_evento'] = random.randint(
-            config['duracao_queda_min'], 
-            config['duracao_queda_max']
-        )
-        
-        tensao = config['tensao_queda']()
-        logger.warning(f"[SIMULAÇÃO] {nome}: Iniciando falha - {tensao:.1f}V por {cenario['duracao_evento']}s")
-        return tensao
-    
-    # Operação normal - calcular tensão baseada no tipo de fonte
-    tensao_base = config['tensao_nominal']
-    
-    # Comportamentos especiais
-    if nome == 'solar' and config.get('comportamento_hora', False):
-        # Simular variação solar baseada na hora
-        hora = agora.hour
-        if 6 <= hora <= 18:  # Período diurno
-            fator_sol = 0.3 + 0.7 * (1 - abs(hora - 12) / 6)  # Pico ao meio-dia
-            tensao_base *= fator_sol
-        else:  # Período noturno
-            tensao_base *= 0.1  # Solar quase zero à noite
-    
-    elif nome == 'ups' and config.get('descarga_gradual', False):
-        # Simular descarga gradual da bateria (muito lenta)
-        tempo_desde_inicio = (agora - simulacao_iniciada).total_seconds()
-        fator_descarga = max(0.85, 1 - (tempo_desde_inicio / 86400))  # 15% em 24h
-        tensao_base *= fator_descarga
-    
-    # Adicionar variação normal
-    variacao = random.uniform(-config['variacao_normal'], config['variacao_normal'])
-    tensao_final = tensao_base + variacao
-    
-    # Garantir valores mínimos realistas
-    tensao_final = max(0, tensao_final)
-    
-    return tensao_final
+    return simulador.ler(nome, ts)
 
-def simular_leitura(nome):
+def simular_leitura(nome, ts=None):
     """Wrapper para compatibilidade - usa simulação avançada"""
-    return simular_leitura_avancada(nome)
+    return simular_leitura_avancada(nome, ts)
+
+# O hub guarda os clientes WebSocket (v1 e v2) e o último ciclo publicado
+hub_ws = HubTransmissao(
+    FONTES_CONFIG.keys(),
+    fila_max=WEBSOCKET_FILA_MAX,
+    buffer_max=WEBSOCKET_BUFFER_MAX,
+    atraso_max=WEBSOCKET_ATRASO_MAX
+)
+
+def amostrar_fontes(ts_ms):
+    """
+    Lê todas as fontes uma única vez e aplica a máquina de estados.
+    É chamada apenas pelo motor de aquisição, único dono do hardware e de estado_anterior.
+    """
+    dados = {}
+    rajadas = leitor_ads.coletar() if leitor_ads is not None else {}
+    agora_ts = ts_ms / 1000.0
+    timestamp = datetime.fromtimestamp(agora_ts).isoformat()
+    for nome in FONTES_CONFIG.keys():
+        try:
+            reducao = rajadas.get(nome)
+            if leitor_ads is not None:
+                if reducao is None:
+                    raise RuntimeError("nenhuma rajada lida do canal")
+                tensao = reducao['media']
+                tensao_estado = reducao[ADS_RAJADA_ESTADO]
+            elif HARDWARE_AVAILABLE and nome in fontes:
+                tensao = tensao_estado = fontes[nome].voltage
+            elif gravacao_reproducao is not None and nome in gravacao_reproducao.fontes:
+                tensao = tensao_estado = gravacao_reproducao.ler(nome, agora_ts)
+            else:
+                tensao = tensao_estado = simular_leitura(nome, agora_ts)
+            
+            if LEITURAS_ATIVAS:
+                buffer_leituras.adicionar(nome, ts_ms, tensao)
+            
+            estado = determinar_estado_fonte(nome, tensao_estado)
+            agregador_rollups.adicionar(nome, agora_ts, tensao, estado)
+            rastreador_intervalos.observar(nome, estado, ts_ms)
+            rastreador_apagoes.observar(nome, estado, ts_ms)
+
+            if estado != estado_anterior[nome]:
+                registrar_evento(nome, estado, tensao, ts_ms)
+                estado_anterior[nome] = estado
+
+            dados[nome] = {
+                "tensao": round(tensao, 2), 
+                "estado": estado,
+                "timestamp": timestamp
+            }
+            if reducao is not None:
+                # Extremos e RMS das rajadas do ciclo: quedas mais curtas que o ciclo
+                dados[nome]["tensao_min"] = round(reducao['min'], 3)
+                dados[nome]["tensao_max"] = round(reducao['max'], 3)
+                dados[nome]["tensao_rms"] = round(reducao['rms'], 3)
+                dados[nome]["amostras"] = reducao['amostras']
+        except Exception as e:
+            logger.error(f"Erro ao ler {nome}: {e}")
+            rastreador_intervalos.observar(nome, "ERRO", ts_ms)
+            rastreador_apagoes.observar(nome, "ERRO", ts_ms)
+            dados[nome] = {
+                "tensao": 0.0, 
+                "estado": "ERRO",
+                "timestamp": timestamp
+            }
+    return dados
+
+# Thread de aquisição: lê o hardware (ou o simulador) no período configurado
+# e publica o instantâneo lido por /status e distribuído pelo hub WebSocket.
+# Na reprodução de uma gravação o período é fixo e o relógio é virtual.
+# Nos workers de API o lugar do motor é do leitor do anel compartilhado, e
+# o apagão em curso e os minutos abertos dos rollups vêm com cada ciclo.
+if PAPEL_PROCESSO == 'api':
+    motor_aquisicao = anel_compartilhado.LeitorAnel(
+        anel_aquisicao,
+        intervalo=ANEL_INTERVALO_POLL,
+        ao_mudar_dados=cache_respostas.invalidar,
+        ao_mudar_config=carregar_cache_configuracoes
+    )
+    rastreador_apagoes = anel_compartilhado.ApagoesRemotos(motor_aquisicao)
+    agregador_rollups = anel_compartilhado.RollupsRemotos(motor_aquisicao)
+elif gravacao_reproducao is not None:
+    # Período fixo: os ciclos caem nos mesmos instantes a cada reprodução
+    relogio_reproducao = reproducao.RelogioVirtual(
+        gravacao_reproducao.inicio_ms,
+        velocidade=reproducao.velocidade_reproducao(REPRODUCAO_VELOCIDADE),
+        fim_ms=gravacao_reproducao.fim_ms
+    )
+    relogio_reproducao.aguardar.append(lambda: any(
+        escritor.pendentes() > escritor.tamanho_fila // 2
+        for escritor in (escritor_eventos, escritor_leituras, escritor_rollups, escritor_estados)
+    ))
+    motor_aquisicao = aquisicao.MotorAquisicao(
+        amostrar_fontes,
+        periodo=REPRODUCAO_PERIODO or gravacao_reproducao.menor_intervalo(INTERVALO_LEITURA),
+        relogio=relogio_reproducao
+    )
+else:
+    motor_aquisicao = aquisicao.MotorAquisicao(
+        amostrar_fontes,
+        periodo=lambda: get_config_value('intervalo_leitura', INTERVALO_LEITURA)
+    )
+
+async def sessao_v2(websocket, path):
+    """Protocolo v2: a assinatura inicial vem na URL e pode ser trocada por mensagens"""
+    try:
+        hub_ws.assinar_v2(websocket, protocolo_ws.assinatura_da_url(path))
+    except protocolo_ws.ErroAssinatura as e:
+        await websocket.send(protocolo_ws.quadro_controle('erro', erro=str(e)))
+        await websocket.close(code=1008, reason="Assinatura inválida")
+        return
+    
+    async for mensagem in websocket:
+        try:
+            hub_ws.assinar_v2(websocket, json.loads(mensagem))
+        except (ValueError, TypeError) as e:
+            hub_ws.enviar_controle(websocket, protocolo_ws.quadro_controle('erro', erro=str(e)))
+
+def total_conexoes_websocket():
+    return hub_ws.total_conexoes()
 
 async def enviar_dados(websocket, path):
-    logger.info(f"Nova conexão WebSocket: {websocket.remote_address}")
+    logger.info(f"Nova conexão WebSocket: {websocket.remote_address} ({path})")
     try:
-        while True:
-            dados = {}
-            for nome in FONTES_CONFIG.keys():
-                try:
-                    if HARDWARE_AVAILABLE and nome in fontes:
-                        tensao = fontes[nome].voltage
-                    else:
-                        tensao = simular_leitura(nome)
-                    
-                    estado = determinar_estado_fonte(nome, tensao)
-
-                    if estado != estado_anterior[nome]:
-                        registrar_evento(nome, estado, tensao)
-                        estado_anterior[nome] = estado
-
-                    dados[nome] = {
-                        "tensao": round(tensao, 2), 
-                        "estado": estado,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                except Exception as e:
-                    logger.error(f"Erro ao ler {nome}: {e}")
-                    dados[nome] = {
-                        "tensao": 0.0, 
-                        "estado": "ERRO",
-                        "timestamp": datetime.now().isoformat()
-                    }
-
-            await websocket.send(json.dumps(dados))
-            await asyncio.sleep(INTERVALO_LEITURA)
+        if urlsplit(path).path.rstrip('/').endswith('/v2'):
+            await sessao_v2(websocket, path)
+        else:
+            # v1: o hub envia o último quadro imediatamente e depois um por ciclo
+            hub_ws.registrar_v1(websocket)
+            await websocket.wait_closed()
+        logger.info("Conexão WebSocket fechada")
     except websockets.exceptions.ConnectionClosed:
         logger.info("Conexão WebSocket fechada")
     except Exception as e:
         logger.error(f"Erro no WebSocket: {e}")
+    finally:
+        hub_ws.remover(websocket)
+
+def publicar_no_loop(loop):
+    """O hub só é tocado pelo event loop: a thread de aquisição agenda a publicação nele"""
+    motor_aquisicao.assinar(lambda inst: loop.call_soon_threadsafe(
+        hub_ws.publicar, inst.dados, inst.seq, inst.ts_ms, inst.mensagem
+    ))
+
+def publicar_no_anel(anel):
+    """
+    Processo de aquisição da implantação multiprocesso: publica cada ciclo no
+    anel com o estado que os workers não têm, e recarrega a configuração
+    quando um worker a altera (limiares, intervalo de leitura)
+    """
+    global anel_aquisicao
+    anel_aquisicao = anel
+    versao_config = [anel.versao(anel_compartilhado.CONTADOR_CONFIG)]
+
+    def publicar(inst):
+        extras = {
+            'apagao': rastreador_apagoes.situacao(),
+            'baldes': {fonte: agregador_rollups.balde_aberto(fonte) for fonte in FONTES_CONFIG}
+        }
+        anel.publicar(inst.seq, inst.ts_ms, inst.monotonico,
+                      json.dumps(inst.dados).encode('utf-8'), json.dumps(extras).encode('utf-8'))
+        versao = anel.versao(anel_compartilhado.CONTADOR_CONFIG)
+        if versao != versao_config[0]:
+            versao_config[0] = versao
+            carregar_cache_configuracoes()
+
+    motor_aquisicao.assinar(publicar)
 
 def iniciar_websocket():
     try:
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        start_server = websockets.serve(enviar_dados, WEBSOCKET_HOST, WEBSOCKET_PORT)
+        # Sem permessage-deflate: o hub escreve o mesmo frame já montado em
+        # todas as conexões, o que a compressão por conexão impediria
+        start_server = websockets.serve(enviar_dados, WEBSOCKET_HOST, WEBSOCKET_PORT, compression=None)
         logger.info(f"WebSocket servidor iniciado em {WEBSOCKET_HOST}:{WEBSOCKET_PORT}")
         loop.run_until_complete(start_server)
+        publicar_no_loop(loop)
         loop.run_forever()
     except Exception as e:
         logger.error(f"Erro ao iniciar WebSocket: {e}")
@@ -434,61 +680,65 @@ def test_notifications():
 
 @app.route("/status", methods=["GET"])
 def status():
+    """
+    Último instantâneo publicado pelo motor de aquisição, sem leitura de
+    hardware nem avanço do simulador por requisição. idade_ms é o tempo
+    desde a aquisição; desatualizado indica mais de três períodos sem ciclo.
+    """
     try:
-        logger.info("=== INÍCIO /status ===")
-        logger.info(f"FONTES_CONFIG.keys(): {list(FONTES_CONFIG.keys())}")
-        logger.info(f"HARDWARE_AVAILABLE: {HARDWARE_AVAILABLE}")
+        instantaneo = motor_aquisicao.instantaneo()
+        if instantaneo is None:
+            return jsonify({
+                "status": "aguardando",
+                "hardware_disponivel": HARDWARE_AVAILABLE,
+                "fontes": {nome: {"tensao": 0.0, "estado": "ERRO", "config": config}
+                           for nome, config in FONTES_CONFIG.items()},
+                "seq": 0,
+                "idade_ms": None,
+                "desatualizado": True,
+                "timestamp": None
+            })
         
         dados = {}
-        for nome in FONTES_CONFIG.keys():
-            logger.info(f"Processando fonte: {nome}")
-            
-            if HARDWARE_AVAILABLE and nome in fontes:
-                tensao = fontes[nome].voltage
-                logger.info(f"  Hardware - {nome}: {tensao}V")
-            else:
-                tensao = simular_leitura(nome)
-                logger.info(f"  Simulação - {nome}: {tensao}V")
-            
-            estado = determinar_estado_fonte(nome, tensao)
-            logger.info(f"  Estado - {nome}: {estado}")
-            
+        for nome, config in FONTES_CONFIG.items():
+            lido = instantaneo.dados.get(nome, {"tensao": 0.0, "estado": "ERRO"})
             dados[nome] = {
-                "tensao": round(tensao, 2),
-                "estado": estado,
-                "config": FONTES_CONFIG[nome]
+                "tensao": lido["tensao"],
+                "estado": lido["estado"],
+                "config": config
             }
         
-        logger.info(f"Dados finais: {dados}")
-        
-        result = {
+        idade = motor_aquisicao.idade(instantaneo)
+        periodo = get_config_value('intervalo_leitura', INTERVALO_LEITURA)
+        return jsonify({
             "status": "ok",
             "hardware_disponivel": HARDWARE_AVAILABLE,
             "fontes": dados,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        logger.info("=== FIM /status ===")
-        return jsonify(result)
+            "seq": instantaneo.seq,
+            "idade_ms": round(idade * 1000, 1),
+            "desatualizado": idade > 3 * periodo,
+            "timestamp": datetime.fromtimestamp(instantaneo.ts_ms / 1000.0).isoformat()
+        })
     except Exception as e:
         logger.error(f"Erro ao obter status: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/eventos", methods=["GET"])
+@cache_respostas.em_cache()
 def listar_eventos():
     try:
         limite = request.args.get('limite', 100, type=int)
         fonte_filtro = request.args.get('fonte')
         
-        with get_db_connection() as conn:
-            query = "SELECT * FROM eventos"
+        with get_db_connection(somente_leitura=True) as conn:
+            query = "SELECT id, fonte, tipo, tensao, ts FROM eventos"
             params = []
             
             if fonte_filtro:
                 query += " WHERE fonte = ?"
                 params.append(fonte_filtro)
             
-            query += " ORDER BY data_hora DESC LIMIT ?"
+            query += " ORDER BY ts DESC LIMIT ?"
             params.append(limite)
             
             cursor = conn.execute(query, params)
@@ -500,7 +750,8 @@ def listar_eventos():
                 "fonte": evento["fonte"],
                 "tipo": evento["tipo"],
                 "tensao": evento["tensao"],
-                "data_hora": evento["data_hora"]
+                "data_hora": formatar_ts(evento["ts"]),
+                "ts": evento["ts"]
             }
             for evento in eventos
         ])
@@ -525,36 +776,55 @@ def criar_evento():
         if fonte not in FONTES_CONFIG:
             return jsonify({"error": f"Fonte inválida. Opções: {list(FONTES_CONFIG.keys())}"}), 400
         
-        registrar_evento(fonte, tipo, tensao)
+        if not registrar_evento(fonte, tipo, tensao):
+            return jsonify({"error": "Fila de eventos cheia, tente novamente"}), 503
         return jsonify({"status": "ok", "mensagem": "Evento criado com sucesso"})
     except Exception as e:
         logger.error(f"Erro ao criar evento: {e}")
         return jsonify({"error": str(e)}), 500
 
-def calculate_uptime_stats(fonte_filtro, eventos):
+@app.route("/leituras", methods=["GET"])
+def listar_leituras():
+    """Retorna a série bruta de tensões de uma fonte"""
+    try:
+        fonte = request.args.get('fonte')
+        minutos = request.args.get('minutos', 10, type=float)
+        limite = min(request.args.get('limite', 10000, type=int), 100000)
+        
+        if fonte not in FONTES_CONFIG:
+            return jsonify({"error": f"Fonte inválida. Opções: {list(FONTES_CONFIG.keys())}"}), 400
+        
+        fim_ms = int(time.time() * 1000)
+        inicio_ms = fim_ms - int(minutos * 60 * 1000)
+        
+        with get_db_connection(somente_leitura=True) as conn:
+            amostras = list(leituras.ler_leituras(conn, fonte, inicio_ms, fim_ms, limite))
+        
+        return jsonify({
+            "fonte": fonte,
+            "inicio_ms": inicio_ms,
+            "fim_ms": fim_ms,
+            "total": len(amostras),
+            "ts": [ts for ts, _ in amostras],
+            "tensao": [round(tensao, 3) for _, tensao in amostras]
+        })
+    except Exception as e:
+        logger.error(f"Erro ao listar leituras: {e}")
+        return jsonify({"error": str(e)}), 500
+
+def calculate_uptime_stats(fonte_filtro, last_failure_ms):
     """
-    Calculate uptime statistics based on filter and events.
+    Calculate uptime statistics based on filter.
+    last_failure_ms is the most recent FALHA event of the filtered source in
+    the window (epoch ms), already reduced by the statistics kernel.
     Returns uptime since last failure for filtered source or all sources.
     """
     now = datetime.now()
     
     if fonte_filtro:
         # Calculate uptime for specific source (time since last failure)
-        failure_events = [e for e in eventos if e[0] == fonte_filtro and e[1] == 'FALHA']
-        if failure_events:
-            # Get the most recent failure
-            last_failure = max(failure_events, key=lambda x: x[3])
-            try:
-                # Try different date formats
-                last_failure_time = datetime.strptime(last_failure[3], '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                try:
-                    last_failure_time = datetime.fromisoformat(last_failure[3].replace('Z', '+00:00'))
-                except ValueError:
-                    # Fallback to system uptime if date parsing fails
-                    last_failure_time = simulacao_iniciada
-            
-            uptime_seconds = (now - last_failure_time).total_seconds()
+        if last_failure_ms is not None:
+            uptime_seconds = max(0.0, now.timestamp() - last_failure_ms / 1000.0)
         else:
             # No failures found, use system uptime
             uptime_seconds = (now - simulacao_iniciada).total_seconds()
@@ -563,11 +833,11 @@ def calculate_uptime_stats(fonte_filtro, eventos):
             'uptime_seconds': uptime_seconds,
             'uptime_type': 'source',
             'source_name': fonte_filtro,
-            'last_failure': last_failure[3] if failure_events else None
+            'last_failure': formatar_ts(last_failure_ms) if last_failure_ms is not None else None
         }
     else:
         # Calculate uptime for all sources (time since ALL sources were down simultaneously)
-        uptime_seconds, last_total_blackout = calculate_time_since_total_blackout(eventos)
+        uptime_seconds, last_total_blackout = calculate_time_since_total_blackout()
         
         return {
             'uptime_seconds': uptime_seconds,
@@ -576,99 +846,36 @@ def calculate_uptime_stats(fonte_filtro, eventos):
             'last_failure': None
         }
 
-def calculate_time_since_total_blackout(eventos):
+def calculate_time_since_total_blackout():
     """
     Calculate time since the last total blackout event.
     A total blackout is when ALL sources are simultaneously in FALHA state.
+    Blackout periods are tracked incrementally by rastreador_apagoes in the
+    acquisition loop, so this is an O(1) lookup that survives restarts.
     Returns uptime since the system recovered from the last total blackout.
     """
     now = datetime.now()
-    all_sources = list(FONTES_CONFIG.keys())
+    em_apagao, inicio_ms, fim_ms = rastreador_apagoes.situacao()
     
-    if not all_sources:
-        # No sources configured, return system uptime
+    if inicio_ms is None:
+        # No total blackout recorded, use system uptime
         uptime_since_start = (now - simulacao_iniciada).total_seconds()
-        logger.debug("No sources configured, returning system uptime")
+        logger.debug(f"No total blackout found, using system uptime: {uptime_since_start}s")
         return uptime_since_start, None
     
-    # Parse and sort events chronologically (oldest first)
-    parsed_events = []
-    
-    for evento in eventos:
-        fonte, tipo, tensao, data_hora = evento
-        try:
-            # Try different date formats
-            event_time = datetime.strptime(data_hora, '%Y-%m-%d %H:%M:%S')
-        except ValueError:
-            try:
-                event_time = datetime.fromisoformat(data_hora.replace('Z', '+00:00'))
-            except ValueError:
-                continue
-        
-        parsed_events.append((event_time, fonte, tipo))
-    
-    # Sort events by time (oldest first)
-    parsed_events.sort(key=lambda x: x[0])
-    
-    # Track state transitions and find blackout periods
-    source_states = {source: 'ATIVA' for source in all_sources}  # Start with all active
-    blackout_periods = []
-    current_blackout_start = None
-    
-    # Process events chronologically to identify blackout periods
-    for event_time, fonte, tipo in parsed_events:
-        if fonte in source_states:
-            old_state = source_states[fonte]
-            source_states[fonte] = tipo
-            
-            # Check if we just entered a total blackout
-            all_failed = all(state == 'FALHA' for state in source_states.values())
-            was_all_failed = all_failed and old_state != 'FALHA'  # This event caused total blackout
-            
-            if all_failed and current_blackout_start is None:
-                # Start of a new blackout period
-                current_blackout_start = event_time
-                logger.debug(f"Total blackout started at {event_time} due to {fonte} failure")
-            elif not all_failed and current_blackout_start is not None:
-                # End of current blackout period
-                blackout_periods.append((current_blackout_start, event_time))
-                logger.debug(f"Total blackout ended at {event_time} due to {fonte} recovery")
-                current_blackout_start = None
-    
-    # Check if we're currently in a blackout
-    currently_in_blackout = all(state == 'FALHA' for state in source_states.values())
-    
-    logger.debug(f"Current source states: {source_states}")
-    logger.debug(f"Currently in blackout: {currently_in_blackout}")
-    logger.debug(f"Blackout periods found: {len(blackout_periods)}")
+    inicio_str = datetime.fromtimestamp(inicio_ms / 1000.0).strftime('%Y-%m-%d %H:%M:%S')
     
-    if current_blackout_start is not None and currently_in_blackout:
-        # We're still in a blackout that started at current_blackout_start
-        uptime_since_blackout = 0  # No uptime during blackout
-        logger.debug(f"Currently in ongoing blackout that started at {current_blackout_start}")
-        return uptime_since_blackout, current_blackout_start.strftime('%Y-%m-%d %H:%M:%S')
+    if em_apagao:
+        # We're still in a blackout - no uptime
+        logger.debug(f"Currently in ongoing blackout that started at {inicio_str}")
+        return 0, inicio_str
     
-    # Find the most recent completed blackout period
-    if blackout_periods:
-        last_blackout_start, last_blackout_end = blackout_periods[-1]
-        
-        # Calculate uptime since the last blackout ended
-        uptime_since_blackout = (now - last_blackout_end).total_seconds()
-        logger.debug(f"Last blackout: {last_blackout_start} to {last_blackout_end}, uptime since: {uptime_since_blackout}s")
-        return uptime_since_blackout, last_blackout_start.strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Check if there's an ongoing blackout that started but hasn't ended
-    if current_blackout_start is not None:
-        # We're in a blackout - no uptime
-        logger.debug(f"In ongoing blackout that started at {current_blackout_start}")
-        return 0, current_blackout_start.strftime('%Y-%m-%d %H:%M:%S')
-    
-    # No total blackout found in the event history, use system uptime
-    uptime_since_start = (now - simulacao_iniciada).total_seconds()
-    logger.debug(f"No total blackout found, using system uptime: {uptime_since_start}s")
-    return uptime_since_start, None
+    uptime_since_blackout = max(0.0, now.timestamp() - fim_ms / 1000.0)
+    logger.debug(f"Last blackout started at {inicio_str}, uptime since: {uptime_since_blackout}s")
+    return uptime_since_blackout, inicio_str
 
 @app.route("/estatisticas", methods=["GET"])
+@cache_respostas.em_cache(ttl=CACHE_ESTATISTICAS_TTL)
 def estatisticas():
     """Retorna estatísticas agregadas do sistema"""
     try:
@@ -682,70 +889,102 @@ def estatisticas():
             '30d': 24 * 30
         }.get(periodo, 24)
         
+        fim_ts = time.time()
+        inicio_ts = fim_ts - horas_periodo * 3600
+        
         # Buscar eventos do período
-        with get_db_connection() as conn:
+        with get_db_connection(somente_leitura=True) as conn:
             cursor = conn.cursor()
             
             # Build query with optional source filter
             if fonte_filtro:
                 cursor.execute("""
-                    SELECT fonte, tipo, tensao, data_hora 
+                    SELECT fonte, tipo, tensao, ts 
                     FROM eventos 
-                    WHERE data_hora >= datetime('now', '-{} hours')
-                    AND fonte = ?
-                    ORDER BY data_hora DESC
-                """.format(horas_periodo), (fonte_filtro,))
+                    WHERE fonte = ? AND ts >= ?
+                """, (fonte_filtro, int(inicio_ts * 1000)))
             else:
                 cursor.execute("""
-                    SELECT fonte, tipo, tensao, data_hora 
+                    SELECT fonte, tipo, tensao, ts 
                     FROM eventos 
-                    WHERE data_hora >= datetime('now', '-{} hours')
-                    ORDER BY data_hora DESC
-                """.format(horas_periodo))
+                    WHERE ts >= ?
+                """, (int(inicio_ts * 1000),))
             
-            eventos = cursor.fetchall()
+            # Determine which sources to process
+            sources_to_process = [fonte_filtro] if fonte_filtro and fonte_filtro in FONTES_CONFIG else list(FONTES_CONFIG.keys())
+            
+            # Carregar a janela uma única vez em colunas tipadas e reduzir por fonte
+            janela = agregacao_eventos.carregar_janela(
+                exportacao.ler_lotes(cursor, ESTATISTICAS_LOTE), sources_to_process
+            )
+            estatisticas_eventos = agregacao_eventos.estatisticas_por_fonte(janela)
+            
+            # Agregar as leituras do período a partir dos rollups
+            agregados_leituras = {
+                fonte_key: rollups.consultar_agregado(
+                    conn, fonte_key, inicio_ts, fim_ts,
+                    agregador_rollups.balde_aberto(fonte_key)
+                )
+                for fonte_key in sources_to_process
+            }
+            
+            # Tempo em cada estado a partir dos intervalos (inclui o estado
+            # herdado de antes do início da janela)
+            segundos_por_fonte = {
+                fonte_key: intervalos.segundos_em_estado(
+                    conn, fonte_key, int(inicio_ts * 1000), int(fim_ts * 1000)
+                )
+                for fonte_key in sources_to_process
+            }
         
         # Calcular estatísticas por fonte
         stats = {}
         
-        # Determine which sources to process
-        sources_to_process = [fonte_filtro] if fonte_filtro and fonte_filtro in FONTES_CONFIG else FONTES_CONFIG.keys()
-        
         for fonte_key in sources_to_process:
             if fonte_key not in FONTES_CONFIG:
                 continue
                 
             fonte_config = FONTES_CONFIG[fonte_key]
-            eventos_fonte = [e for e in eventos if e[0] == fonte_key]
-            
-            total_eventos = len(eventos_fonte)
-            eventos_ativa = len([e for e in eventos_fonte if e[1] == 'ATIVA'])
-            eventos_falha = len([e for e in eventos_fonte if e[1] == 'FALHA'])
+            resumo = estatisticas_eventos[fonte_key]
             
-            # Calcular disponibilidade (% tempo ativo)
-            if total_eventos > 0:
-                disponibilidade = (eventos_ativa / total_eventos) * 100
-            else:
+            # Calcular disponibilidade (% do tempo conhecido em ATIVA)
+            segundos_estado = segundos_por_fonte.get(fonte_key, {})
+            disponibilidade = intervalos.disponibilidade(segundos_estado) if segundos_estado else None
+            if disponibilidade is None:
                 disponibilidade = 100.0
             
-            # Calcular tensões
-            tensoes = [float(e[2]) for e in eventos_fonte if e[2]]
-            if tensoes:
-                tensao_media = sum(tensoes) / len(tensoes)
-                tensao_min = min(tensoes)
-                tensao_max = max(tensoes)
+            # Calcular tensões a partir do sinal real (leituras brutas) quando houver
+            agregado = agregados_leituras.get(fonte_key)
+            if agregado and agregado['n'] > 0:
+                tensao_media = agregado['tensao_media']
+                tensao_min = agregado['tensao_min']
+                tensao_max = agregado['tensao_max']
+            elif resumo['leituras_tensao']:
+                tensao_media = resumo['tensao_media']
+                tensao_min = resumo['tensao_min']
+                tensao_max = resumo['tensao_max']
             else:
                 tensao_media = tensao_min = tensao_max = 0.0
             
             stats[fonte_key] = {
                 'nome': fonte_config['nome'],
                 'disponibilidade': round(disponibilidade, 1),
-                'total_eventos': total_eventos,
-                'eventos_ativa': eventos_ativa,
-                'eventos_falha': eventos_falha,
+                'total_eventos': resumo['total_eventos'],
+                'eventos_ativa': resumo['eventos_estado']['ATIVA'],
+                'eventos_falha': resumo['eventos_estado']['FALHA'],
                 'tensao_media': round(tensao_media, 2),
                 'tensao_min': round(tensao_min, 2),
-                'tensao_max': round(tensao_max, 2)
+                'tensao_max': round(tensao_max, 2),
+                'total_leituras': agregado['n'] if agregado else 0,
+                'tensao_desvio': round(agregado['desvio_padrao'], 2) if agregado and agregado['n'] else 0.0,
+                'tensao_percentis_eventos': {
+                    f'p{p}': round(valor, 2)
+                    for p, valor in resumo['percentis_tensao'].items()
+                },
+                'segundos_estado': {
+                    estado: round(segundos, 1)
+                    for estado, segundos in segundos_estado.items()
+                }
             }
         
         # Adicionar métricas de sistema
@@ -753,7 +992,8 @@ def estatisticas():
         data_fim = datetime.now()
         
         # Calculate uptime based on filter
-        uptime_info = calculate_uptime_stats(fonte_filtro, eventos)
+        ultima_falha_ms = estatisticas_eventos[fonte_filtro]['ultima_falha_ms'] if fonte_filtro in estatisticas_eventos else None
+        uptime_info = calculate_uptime_stats(fonte_filtro, ultima_falha_ms)
         
         # Debug logging for uptime calculation
         logger.debug(f"Uptime calculation - Filter: {fonte_filtro}, Type: {uptime_info.get('uptime_type')}, Seconds: {uptime_info.get('uptime_seconds')}")
@@ -769,9 +1009,9 @@ def estatisticas():
             'eventos_por_hora': sum(s['total_eventos'] for s in stats.values()) / max(horas_periodo, 1),
             'disponibilidade_sistema': sum(s['disponibilidade'] for s in stats.values()) / len(stats) if stats else 0,
             'modo_hardware': HARDWARE_AVAILABLE,
-            'conexoes_websocket_ativas': len(getattr(enviar_dados, '__clients__', [])),
+            'conexoes_websocket_ativas': total_conexoes_websocket(),
             'versao': '2.0',
-            'banco_eventos': len(eventos) if eventos else 0,
+            'banco_eventos': len(janela),
             'fonte_filtro': fonte_filtro,  # Include filter info in response
             'uptime_stats': uptime_info  # Add uptime statistics
         }
@@ -793,7 +1033,46 @@ def estatisticas():
         logger.error(f"Erro ao calcular estatísticas: {e}")
         return jsonify({"error": str(e)}), 500
 
+def uso_recursos():
+    """CPU consumida (s) e memória residente do processo (Linux: /proc)"""
+    tempos = os.times()
+    rss_kb = None
+    try:
+        with open('/proc/self/statm') as arquivo:
+            rss_kb = int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return {
+        'cpu_s': round(tempos.user + tempos.system, 3),
+        'rss_kb': rss_kb,
+        'threads': threading.active_count()
+    }
+
+@app.route("/metricas", methods=["GET"])
+def metricas():
+    """Retorna métricas internas dos componentes do servidor"""
+    try:
+        return jsonify({
+            'timestamp': datetime.now().isoformat(),
+            'escritor_eventos': escritor_eventos.metricas(),
+            'escritor_leituras': escritor_leituras.metricas(),
+            'escritor_rollups': escritor_rollups.metricas(),
+            'escritor_estados': escritor_estados.metricas(),
+            'pool_escrita': pool_escrita.metricas(),
+            'pool_leitura': pool_leitura.metricas(),
+            'cache_respostas': cache_respostas.metricas(),
+            'websocket': hub_ws.metricas(),
+            'aquisicao': motor_aquisicao.metricas(),
+            'processo': {'papel': PAPEL_PROCESSO, 'indice': PROCESSO_INDICE, 'pid': os.getpid(),
+                         **uso_recursos()},
+            'leitor_ads': leitor_ads.metricas() if leitor_ads is not None else None
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter métricas: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/configuracao", methods=["GET"])
+@cache_respostas.em_cache()
 def get_configuracao():
     """Retorna configuração atual do sistema"""
     try:
@@ -991,21 +1270,43 @@ def set_configuracao():
 
 @app.route("/exportar", methods=["GET"])
 def exportar_dados():
-    """Exporta dados em formato CSV"""
+    """Exporta eventos em streaming (CSV, JSON, NDJSON, Parquet, Arrow IPC ou .npz)"""
     try:
         formato = request.args.get('formato', 'csv')
         data_inicio = request.args.get('data_inicio')
         data_fim = request.args.get('data_fim')
         fontes_filtro = request.args.get('fontes', '').split(',') if request.args.get('fontes') else []
+        compactar = request.args.get('compactar')
         
         # Validar formato
-        if formato not in ['csv', 'json']:
+        if formato not in ['csv', 'json', 'ndjson', 'parquet', 'arrow', 'npz']:
             return jsonify({
                 "error": "Formato não suportado",
-                "details": "Formatos válidos: csv, json",
+                "details": "Formatos válidos: csv, json, ndjson, parquet, arrow, npz",
                 "formato_solicitado": formato
             }), 400
         
+        if not exportacao.formato_disponivel(formato):
+            return jsonify({
+                "error": "Formato indisponível neste servidor",
+                "details": "Instale pyarrow (parquet, arrow) ou numpy (npz)",
+                "formato_solicitado": formato
+            }), 501
+        
+        if compactar not in (None, '', 'gzip'):
+            return jsonify({
+                "error": "Compactação não suportada",
+                "details": "Valores válidos: gzip",
+                "compactar_solicitado": compactar
+            }), 400
+        
+        if compactar and formato in exportacao.FORMATOS_COLUNARES:
+            return jsonify({
+                "error": "Compactação não suportada",
+                "details": "Os formatos parquet, arrow e npz já são binários e compactados",
+                "compactar_solicitado": compactar
+            }), 400
+        
         # Validar datas
         erros_validacao = []
         if data_inicio:
@@ -1031,12 +1332,13 @@ def exportar_dados():
         params = []
         
         if data_inicio:
-            where_clauses.append("data_hora >= ?")
-            params.append(data_inicio + " 00:00:00")
+            where_clauses.append("ts >= ?")
+            params.append(int(datetime.strptime(data_inicio, '%Y-%m-%d').timestamp() * 1000))
             
         if data_fim:
-            where_clauses.append("data_hora <= ?")
-            params.append(data_fim + " 23:59:59")
+            where_clauses.append("ts < ?")
+            fim_dia = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)
+            params.append(int(fim_dia.timestamp() * 1000))
             
         # Validar fontes
         if fontes_filtro and fontes_filtro[0]:
@@ -1061,20 +1363,24 @@ def exportar_dados():
         
         where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
         
-        # Buscar dados
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"""
-                SELECT id, fonte, tipo, tensao, data_hora 
-                FROM eventos 
-                {where_sql}
-                ORDER BY data_hora DESC
-                LIMIT 50000
-            """, params)
-            
-            eventos = cursor.fetchall()
+        # Verificar se há dados antes de iniciar o streaming (permite responder 404).
+        # O JSON traz total_eventos no cabeçalho: contar agora e limitar a
+        # consulta ao maior id contado, para o total bater com os eventos
+        total_eventos = None
+        with get_db_connection(somente_leitura=True) as conn:
+            if formato == 'json':
+                total_eventos, maior_id = conn.execute(
+                    f"SELECT COUNT(*), MAX(id) FROM eventos {where_sql}", params
+                ).fetchone()
+                existe = total_eventos > 0
+            else:
+                existe = conn.execute(f"SELECT 1 FROM eventos {where_sql} LIMIT 1", params).fetchone()
+        
+        if existe and total_eventos is not None:
+            where_sql += (" AND " if where_sql else "WHERE ") + "id <= ?"
+            params.append(maior_id)
         
-        if not eventos:
+        if not existe:
             return jsonify({
                 "error": "Nenhum evento encontrado",
                 "details": "Verifique os filtros aplicados",
@@ -1085,102 +1391,77 @@ def exportar_dados():
                 }
             }), 404
         
-        logger.info(f"Exportando {len(eventos)} eventos em formato {formato}")
+        logger.info(f"Exportando eventos em formato {formato} (compactação: {compactar or 'nenhuma'})")
         
-        if formato == 'csv':
-            import io
-            import csv
-            
-            try:
-                output = io.StringIO()
-                writer = csv.writer(output)
-                
-                # Cabeçalho
-                writer.writerow(['ID', 'Fonte', 'Nome da Fonte', 'Estado', 'Tensão (V)', 'Data/Hora'])
-                
-                # Dados
-                for evento in eventos:
-                    fonte_nome = FONTES_CONFIG.get(evento[1], {}).get('nome', evento[1])
-                    writer.writerow([
-                        evento[0],
-                        evento[1],
-                        fonte_nome,
-                        evento[2],
-                        f"{evento[3]:.2f}" if evento[3] else "N/A",
-                        evento[4]
-                    ])
-                
-                csv_data = output.getvalue()
-                output.close()
-                
-                from flask import Response
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                filename = f"poweredge_eventos_{timestamp}.csv"
-                
-                return Response(
-                    csv_data,
-                    mimetype='text/csv',
-                    headers={
-                        'Content-Disposition': f'attachment; filename={filename}',
-                        'Content-Length': str(len(csv_data))
-                    }
-                )
-                
-            except Exception as e:
-                logger.error(f"Erro ao gerar CSV: {e}")
-                return jsonify({
-                    "error": "Erro ao gerar arquivo CSV",
-                    "details": str(e)
-                }), 500
+        nomes_fontes = {chave: config['nome'] for chave, config in FONTES_CONFIG.items()}
+        cabecalho = {
+            'timestamp': datetime.now().isoformat(),
+            'total_eventos': total_eventos,
+            'filtros': {
+                'data_inicio': data_inicio,
+                'data_fim': data_fim,
+                'fontes': fontes_filtro
+            }
+        }
         
-        elif formato == 'json':
-            try:
-                dados_json = []
-                for evento in eventos:
-                    fonte_nome = FONTES_CONFIG.get(evento[1], {}).get('nome', evento[1])
-                    dados_json.append({
-                        'id': evento[0],
-                        'fonte': evento[1],
-                        'nome_fonte': fonte_nome,
-                        'estado': evento[2],
-                        'tensao': round(evento[3], 2) if evento[3] else None,
-                        'data_hora': evento[4]
-                    })
-                
-                from flask import Response
-                import json
-                
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                filename = f"poweredge_eventos_{timestamp}.json"
+        def gerar():
+            # Conexão própria durante todo o download: um cliente lento não
+            # pode segurar uma vaga do pool de leitura de /eventos e afins
+            with pool_leitura.conexao_avulsa() as conn:
+                cursor = conn.execute(f"""
+                    SELECT id, fonte, tipo, tensao, ts 
+                    FROM eventos 
+                    {where_sql}
+                    ORDER BY ts DESC
+                """, params)
+                lotes = exportacao.ler_lotes(cursor, EXPORTAR_LOTE)
                 
-                json_data = json.dumps({
-                    'exportacao': {
-                        'timestamp': datetime.now().isoformat(),
-                        'total_eventos': len(dados_json),
-                        'filtros': {
-                            'data_inicio': data_inicio,
-                            'data_fim': data_fim,
-                            'fontes': fontes_filtro
-                        }
-                    },
-                    'eventos': dados_json
-                }, indent=2, ensure_ascii=False)
+                # Formatos colunares já produzem bytes
+                if formato == 'parquet':
+                    yield from exportacao.serializar_parquet(lotes, nomes_fontes)
+                    return
+                if formato == 'arrow':
+                    yield from exportacao.serializar_arrow(lotes, nomes_fontes)
+                    return
+                if formato == 'npz':
+                    yield from exportacao.serializar_npz(lotes, nomes_fontes)
+                    return
                 
-                return Response(
-                    json_data,
-                    mimetype='application/json',
-                    headers={
-                        'Content-Disposition': f'attachment; filename={filename}',
-                        'Content-Length': str(len(json_data))
-                    }
-                )
+                if formato == 'csv':
+                    partes = exportacao.serializar_csv(lotes, nomes_fontes)
+                elif formato == 'ndjson':
+                    partes = exportacao.serializar_ndjson(lotes, nomes_fontes)
+                else:
+                    partes = exportacao.serializar_json(lotes, nomes_fontes, cabecalho)
                 
-            except Exception as e:
-                logger.error(f"Erro ao gerar JSON: {e}")
-                return jsonify({
-                    "error": "Erro ao gerar arquivo JSON",
-                    "details": str(e)
-                }), 500
+                if compactar == 'gzip':
+                    yield from exportacao.compactar_gzip(partes)
+                else:
+                    yield from exportacao.codificar_utf8(partes)
+        
+        mimetype, extensao = {
+            'csv': ('text/csv', 'csv'),
+            'json': ('application/json', 'json'),
+            'ndjson': ('application/x-ndjson', 'ndjson'),
+            'parquet': ('application/vnd.apache.parquet', 'parquet'),
+            'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+            'npz': ('application/octet-stream', 'npz')
+        }[formato]
+        if compactar == 'gzip':
+            mimetype = 'application/gzip'
+            extensao += '.gz'
+        
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        filename = f"poweredge_eventos_{timestamp}.{extensao}"
+        
+        return Response(
+            gerar(),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Accel-Buffering': 'no'
+            }
+        )
             
     except Exception as e:
         logger.error(f"Erro ao exportar dados: {e}")
@@ -1189,6 +1470,45 @@ def exportar_dados():
             "details": str(e)
         }), 500
 
+def iniciar_servicos():
+    """
+    Inicializa o banco e inicia as threads de gravação e de aquisição.
+    Usado pelo servidor de desenvolvimento e pelo servidor ASGI.
+    """
+    if PAPEL_PROCESSO == 'api':
+        # O processo de aquisição já criou o banco e é o único que grava
+        # leituras, rollups e estados; o worker só grava eventos manuais
+        carregar_cache_configuracoes()
+        escritor_eventos.iniciar()
+        motor_aquisicao.iniciar()
+        return
+    init_database()
+    escritor_eventos.iniciar()
+    escritor_leituras.iniciar()
+    escritor_estados.iniciar()
+    escritor_rollups.iniciar()
+    if leitor_ads is not None:
+        leitor_ads.iniciar()
+    motor_aquisicao.iniciar()
+
+def encerrar_servicos():
+    """
+    Para a aquisição, sela os blocos em memória e drena as filas dos
+    escritores antes de fechar os pools
+    """
+    motor_aquisicao.parar()
+    if PAPEL_PROCESSO != 'api':
+        if leitor_ads is not None:
+            leitor_ads.parar()
+        agregador_rollups.selar_todos()
+        escritor_rollups.parar()
+        escritor_estados.parar()
+        buffer_leituras.selar_todos()
+        escritor_leituras.parar()
+    escritor_eventos.parar()
+    pool_leitura.fechar()
+    pool_escrita.fechar()
+
 if __name__ == "__main__":
     print("Iniciando PowerEdge v2.0...")
     print("="*50)
@@ -1200,8 +1520,9 @@ if __name__ == "__main__":
     print("="*50)
     
     try:
-        # Inicializar banco de dados
-        init_database()
+        # Banco, escritores e aquisição; as filas são drenadas ao sair
+        iniciar_servicos()
+        atexit.register(encerrar_servicos)
         
         # Iniciar thread do WebSocket em background
         websocket_thread = threading.Thread(target=iniciar_websocket, daemon=True)
@@ -0,0 +1,273 @@
+"""
+Servidor de produção: API REST e WebSocket na mesma porta, via ASGI.
+
+    python app/servidor_asgi.py            (ou: cd app && uvicorn servidor_asgi:app --port 8000)
+
+O servidor de desenvolvimento (python app/run.py) usa o servidor do Flask
+com uma thread por requisição e um segundo event loop para o WebSocket na
+porta 8765. Aqui um único event loop do uvicorn atende:
+
+- /ws e /ws/v2: o hub WebSocket (protocolos v1 e v2, ver protocolo_ws),
+  alimentado pelo motor de aquisição como no servidor de desenvolvimento;
+- todo o resto: a aplicação Flask, executada em um pool fixo de
+  ASGI_THREADS threads. Todas as threads leem o mesmo instantâneo do motor
+  de aquisição, que roda uma única vez neste processo.
+
+A ponte WSGI é própria em vez de asgiref.wsgi.WsgiToAsgi: aquela executa
+todas as requisições em uma única thread (thread_sensitive) e faz uma ida e
+volta ao event loop por pedaço do corpo. Aqui a resposta é acumulada na
+thread e enviada de uma vez; só respostas em streaming (/exportar) passam
+ao event loop em pedaços de PEDACO_STREAM bytes.
+
+O ciclo de vida (lifespan) inicia os serviços de run.py e, no desligamento,
+para a aquisição e drena os escritores antes de fechar o banco.
+"""
+import asyncio
+import io
+import json
+import logging
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import uvicorn
+    UVICORN_DISPONIVEL = True
+except ImportError:
+    UVICORN_DISPONIVEL = False
+
+import run
+import protocolo_ws
+from config import ASGI_HOST, ASGI_PORT, ASGI_THREADS
+
+logger = logging.getLogger(__name__)
+
+PEDACO_STREAM = 64 * 1024
+
+class CanalASGI:
+    """
+    Canal do hub para uma conexão WebSocket ASGI. escrever() só enfileira a
+    mensagem; uma tarefa da conexão a entrega ao servidor. pendente() (bytes
+    na fila) cresce quando o cliente não acompanha e aciona a backpressure
+    do hub como o buffer do transporte no servidor websockets.
+    """
+    __slots__ = ('_send', 'endereco', 'aberto', '_fila', '_pendente', '_sinal', '_tarefa')
+
+    def __init__(self, send, endereco):
+        self._send = send
+        self.endereco = str(endereco)
+        self.aberto = True
+        self._fila = deque()
+        self._pendente = 0
+        self._sinal = asyncio.Event()
+        self._tarefa = asyncio.ensure_future(self._escoar())
+
+    def pendente(self):
+        return self._pendente
+
+    def escrever(self, quadro):
+        mensagem = quadro.mensagem
+        self._fila.append(mensagem)
+        self._pendente += len(mensagem)
+        self._sinal.set()
+        return len(mensagem)
+
+    async def _escoar(self):
+        fila = self._fila
+        while self.aberto:
+            await self._sinal.wait()
+            self._sinal.clear()
+            while fila:
+                mensagem = fila.popleft()
+                if isinstance(mensagem, str):
+                    await self._send({'type': 'websocket.send', 'text': mensagem})
+                else:
+                    await self._send({'type': 'websocket.send', 'bytes': bytes(mensagem)})
+                self._pendente -= len(mensagem)
+
+    def abortar(self):
+        """Desconexão por atraso: descarta a fila e fecha sem esperar a entrega"""
+        self.fechar()
+        asyncio.ensure_future(self._send({'type': 'websocket.close', 'code': 1013}))
+
+    def fechar(self):
+        self.aberto = False
+        self._fila.clear()
+        self._tarefa.cancel()
+
+def _rota_ws(path):
+    """Protocolo da rota WebSocket: 'v1', 'v2' ou None"""
+    caminho = path.rstrip('/')
+    if caminho == '/ws':
+        return 'v1'
+    if caminho == '/ws/v2':
+        return 'v2'
+    return None
+
+async def _websocket(scope, receive, send):
+    mensagem = await receive()
+    if mensagem['type'] != 'websocket.connect':
+        return
+    protocolo = _rota_ws(scope['path'])
+    if protocolo is None:
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    await send({'type': 'websocket.accept'})
+
+    hub = run.hub_ws
+    canal = CanalASGI(send, scope.get('client'))
+    logger.info(f"Nova conexão WebSocket: {canal.endereco} ({scope['path']})")
+    try:
+        if protocolo == 'v2':
+            url = scope['path'] + '?' + scope.get('query_string', b'').decode('latin-1')
+            try:
+                hub.assinar_v2(canal, protocolo_ws.assinatura_da_url(url))
+            except protocolo_ws.ErroAssinatura as e:
+                await send({'type': 'websocket.send', 'text': protocolo_ws.quadro_controle('erro', erro=str(e))})
+                await send({'type': 'websocket.close', 'code': 1008})
+                return
+        else:
+            hub.registrar_v1(canal)
+
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'websocket.disconnect':
+                break
+            if protocolo != 'v2':
+                continue
+            try:
+                hub.assinar_v2(canal, json.loads(mensagem.get('text') or mensagem.get('bytes') or ''))
+            except (ValueError, TypeError) as e:
+                hub.enviar_controle(canal, protocolo_ws.quadro_controle('erro', erro=str(e)))
+    finally:
+        hub.remover(canal)
+        canal.fechar()
+        logger.info("Conexão WebSocket fechada")
+
+class PonteWSGI:
+    """Executa uma aplicação WSGI em um pool fixo de threads sob ASGI"""
+
+    def __init__(self, aplicacao, threads):
+        self.aplicacao = aplicacao
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        corpo = bytearray()
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                return
+            corpo += mensagem.get('body', b'')
+            if not mensagem.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        inicio, resto = await loop.run_in_executor(
+            self.executor, self._executar, self._environ(scope, bytes(corpo)), loop, send
+        )
+        if inicio is not None:
+            await send(inicio)
+        await send({'type': 'http.response.body', 'body': resto})
+
+    def _environ(self, scope, corpo):
+        servidor = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': servidor[0],
+            'SERVER_PORT': str(servidor[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(corpo),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': run.PAPEL_PROCESSO == 'api',
+            'wsgi.run_once': False,
+        }
+        for nome, valor in scope.get('headers', []):
+            nome = nome.decode('latin-1').upper().replace('-', '_')
+            if nome not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                nome = 'HTTP_' + nome
+            valor = valor.decode('latin-1')
+            environ[nome] = f"{environ[nome]},{valor}" if nome in environ else valor
+        return environ
+
+    def _executar(self, environ, loop, send):
+        """
+        Roda na thread do pool. Retorna (início ainda não enviado, restante do
+        corpo); respostas maiores que PEDACO_STREAM já saem em pedaços.
+        """
+        inicio = {}
+
+        def start_response(status, cabecalhos, exc_info=None):
+            inicio['mensagem'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                            for nome, valor in cabecalhos]
+            }
+
+        def enviar(mensagem):
+            asyncio.run_coroutine_threadsafe(send(mensagem), loop).result()
+
+        resultado = self.aplicacao(environ, start_response)
+        partes = []
+        tamanho = 0
+        iniciado = False
+        try:
+            for parte in resultado:
+                if not parte:
+                    continue
+                partes.append(parte)
+                tamanho += len(parte)
+                if tamanho >= PEDACO_STREAM:
+                    if not iniciado:
+                        enviar(inicio['mensagem'])
+                        iniciado = True
+                    enviar({'type': 'http.response.body', 'body': b''.join(partes), 'more_body': True})
+                    partes = []
+                    tamanho = 0
+        finally:
+            if hasattr(resultado, 'close'):
+                resultado.close()
+        return (None if iniciado else inicio['mensagem']), b''.join(partes)
+
+_ponte = PonteWSGI(run.app, ASGI_THREADS)
+
+async def _lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            try:
+                run.iniciar_servicos()
+                run.publicar_no_loop(asyncio.get_running_loop())
+            except Exception as e:
+                logger.error(f"Erro ao iniciar serviços: {e}")
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            run.encerrar_servicos()
+            _ponte.executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http':
+        await _ponte(scope, receive, send)
+    elif scope['type'] == 'websocket':
+        await _websocket(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+
+if __name__ == "__main__":
+    if not UVICORN_DISPONIVEL:
+        sys.exit("uvicorn não está instalado: pip install uvicorn")
+    print(f"PowerEdge (ASGI) em http://{ASGI_HOST}:{ASGI_PORT}, WebSocket em /ws e /ws/v2")
+    # O próprio módulo, não uma string de importação: run.py já foi carregado
+    uvicorn.run(app, host=ASGI_HOST, port=ASGI_PORT, lifespan='on',
+                ws_per_message_deflate=False, log_level='warning')
@@ -0,0 +1,116 @@
+"""
+Implantação multiprocesso: um processo de aquisição e N workers de API.
+
+    python app/servidor_multiprocesso.py          (ASGI_WORKERS workers, padrão 4)
+
+O servidor ASGI (servidor_asgi.py) atende tudo em um processo: o GIL limita
+a vazão das rotas Flask a um núcleo. Aqui o processo principal é o único
+dono do hardware, da máquina de estados, dos rastreadores e das gravações
+de leituras/rollups/estados (run.iniciar_servicos, como no servidor ASGI),
+mas não atende HTTP: publica cada ciclo no anel de memória compartilhada
+(anel_compartilhado) e supervisiona os workers.
+
+Cada worker é um processo servidor_asgi com POWEREDGE_PAPEL=api: não abre o
+barramento I2C nem roda o motor de aquisição; /status, /estatisticas e o hub
+WebSocket leem o último ciclo do anel. Todos aceitam conexões do mesmo
+socket, aberto aqui antes de criá-los, e o kernel distribui as conexões
+entre eles. Há uma única fonte de verdade para as transições de estado,
+mesmo com a vazão HTTP crescendo com os núcleos.
+
+Workers que morrem são recriados com o mesmo índice. SIGTERM ou Ctrl+C
+encerra os workers, depois drena os escritores e remove o anel.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+
+# config/run são importados dentro das funções: nos workers as variáveis
+# POWEREDGE_* precisam estar definidas antes de config.py ser lido
+
+logger = logging.getLogger(__name__)
+
+def _executar_worker(sock, indice, nome_anel):
+    """Alvo do processo worker (contexto spawn)"""
+    os.environ.update(POWEREDGE_PAPEL='api', POWEREDGE_INDICE=str(indice), POWEREDGE_ANEL=nome_anel)
+    import uvicorn
+    import servidor_asgi
+    configuracao = uvicorn.Config(servidor_asgi.app, lifespan='on',
+                                  ws_per_message_deflate=False, log_level='warning')
+    uvicorn.Server(configuracao).run(sockets=[sock])
+
+def _abrir_socket(host, porta):
+    # proto explícito: o asyncio só liga TCP_NODELAY nas conexões aceitas
+    # quando o socket declara IPPROTO_TCP
+    familia = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def main():
+    import run
+    import servidor_asgi
+    from config import ASGI_HOST, ASGI_PORT, ASGI_WORKERS, ANEL_SLOTS, ANEL_TAMANHO_SLOT
+
+    if not servidor_asgi.UVICORN_DISPONIVEL:
+        sys.exit("uvicorn não está instalado: pip install uvicorn")
+    workers_total = max(1, min(ASGI_WORKERS, run.anel_compartilhado.MAX_PROCESSOS - 1))
+
+    anel = run.anel_compartilhado.AnelInstantaneos.criar(
+        f"poweredge_{os.getpid()}",
+        slots=ANEL_SLOTS,
+        tamanho_slot=ANEL_TAMANHO_SLOT,
+        inicio_ms=int(run.simulacao_iniciada.timestamp() * 1000),
+        hardware=run.HARDWARE_AVAILABLE
+    )
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+
+    contexto = multiprocessing.get_context('spawn')
+    workers = {}
+    sock = None
+    try:
+        # O anel já tem o primeiro ciclo quando o primeiro worker sobe
+        run.publicar_no_anel(anel)
+        run.iniciar_servicos()
+        sock = _abrir_socket(ASGI_HOST, ASGI_PORT)
+
+        def iniciar_worker(indice):
+            processo = contexto.Process(target=_executar_worker, args=(sock, indice, anel.nome),
+                                        name=f"poweredge-api-{indice}")
+            processo.start()
+            workers[indice] = processo
+
+        for indice in range(1, workers_total + 1):
+            iniciar_worker(indice)
+        print(f"PowerEdge em http://{ASGI_HOST}:{ASGI_PORT}: 1 processo de aquisição "
+              f"(pid {os.getpid()}) e {workers_total} workers de API")
+
+        while not parar.wait(1.0):
+            for indice, processo in list(workers.items()):
+                if not processo.is_alive():
+                    logger.warning(f"Worker {indice} (pid {processo.pid}) terminou "
+                                   f"com código {processo.exitcode}; recriando")
+                    iniciar_worker(indice)
+    finally:
+        for processo in workers.values():
+            if processo.is_alive():
+                processo.terminate()
+        for processo in workers.values():
+            processo.join(30)
+            if processo.is_alive():
+                processo.kill()
+        if sock is not None:
+            sock.close()
+        run.encerrar_servicos()
+        anel.destruir()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Simulação das fontes de energia (modo sem hardware e geração de carga).
+
+Cada fonte tem um ModeloFonte imutável, montado uma única vez: tensão
+nominal, variação normal, probabilidade de queda por leitura, duração e
+faixa de tensão das quedas, e os comportamentos especiais (curva solar por
+hora do dia, descarga lenta da UPS). O estado de cada fonte entre leituras
+é só o evento de queda em andamento (início e fim).
+
+Dois caminhos compartilham os modelos:
+
+- Simulador: uma leitura por fonte e por ciclo, para o motor de aquisição.
+  O instante vem do ciclo (ts), não de datetime.now(), então um relógio
+  virtual acelera a simulação sem mudar o resultado.
+- GeradorLotes: todas as fontes de uma faixa de ciclos de uma vez (uma hora,
+  por exemplo) com um gerador NumPy semeado: ruído, curva solar e descarga
+  vetorizados, e as quedas sorteadas como intervalos geométricos entre
+  eventos em vez de um sorteio por ciclo. Anos de dados saem em segundos,
+  reprodutíveis pela semente. Sem numpy, o mesmo gerador repete o
+  Simulador ciclo a ciclo.
+
+Os dois seguem a mesma distribuição, mas não a mesma sequência de números:
+a mesma semente reproduz cada caminho separadamente.
+"""
+import logging
+import random
+import time
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+try:
+    import numpy as np
+    NUMPY_DISPONIVEL = True
+except ImportError:
+    NUMPY_DISPONIVEL = False
+
+logger = logging.getLogger(__name__)
+
+ModeloFonte = namedtuple('ModeloFonte', (
+    'tensao_nominal',     # V
+    'variacao_normal',    # ± V em operação normal
+    'prob_queda',         # chance de iniciar uma queda a cada leitura
+    'duracao_queda_min',  # s
+    'duracao_queda_max',  # s
+    'queda_min',          # faixa de tensão durante a queda (V)
+    'queda_max',
+    'curva_solar',        # tensão segue a hora do dia
+    'descarga'            # bateria descarrega lentamente desde o início
+))
+
+MODELOS = {
+    'rede': ModeloFonte(220.0, 8.0, 0.003, 5, 120, 0.0, 50.0, False, False),
+    # ±25 V dependente do sol; quedas são nuvens ou problemas (redução parcial)
+    'solar': ModeloFonte(180.0, 25.0, 0.008, 10, 300, 20.0, 80.0, True, False),
+    # Falhas mais severas e curtas
+    'gerador': ModeloFonte(240.0, 12.0, 0.005, 3, 60, 0.0, 30.0, False, False),
+    # Bateria 12 V; queda = bateria baixa
+    'ups': ModeloFonte(12.6, 0.8, 0.001, 2, 30, 9.5, 11.0, False, True),
+}
+
+RUIDO_QUEDA = 5.0  # ± V somados à tensão durante uma queda em andamento
+
+# Fator da tensão solar por hora local: pico ao meio-dia, quase zero à noite
+FATOR_SOLAR_HORA = tuple(
+    0.3 + 0.7 * (1 - abs(hora - 12) / 6) if 6 <= hora <= 18 else 0.1
+    for hora in range(24)
+)
+
+DESCARGA_MINIMO = 0.85         # fração da tensão nominal após a descarga
+DESCARGA_SEGUNDOS = 86400.0    # 15% em 24 h
+
+def fator_descarga(segundos_desde_inicio):
+    return max(DESCARGA_MINIMO, 1 - segundos_desde_inicio / DESCARGA_SEGUNDOS)
+
+class Simulador:
+    """
+    Leituras ciclo a ciclo. fontes: nomes com modelo em `modelos`;
+    inicio_ts: início da simulação (epoch s), base da descarga da UPS;
+    registrar: logar o início e o fim de cada queda.
+    """
+
+    def __init__(self, fontes, inicio_ts=None, semente=None, modelos=MODELOS, registrar=True):
+        self.modelos = {nome: modelos[nome] for nome in fontes if nome in modelos}
+        self.inicio_ts = time.time() if inicio_ts is None else inicio_ts
+        self.registrar = registrar
+        self._rng = random.Random(semente)
+        # Queda em andamento por fonte: (início, fim) em epoch s
+        self._quedas = {nome: None for nome in self.modelos}
+
+    def tensao_base(self, modelo, ts):
+        tensao = modelo.tensao_nominal
+        if modelo.curva_solar:
+            tensao *= FATOR_SOLAR_HORA[time.localtime(ts).tm_hour]
+        elif modelo.descarga:
+            tensao *= fator_descarga(ts - self.inicio_ts)
+        return tensao
+
+    def ler(self, nome, ts=None):
+        """Tensão simulada da fonte no instante ts (epoch s; agora por padrão)"""
+        if ts is None:
+            ts = time.time()
+        modelo = self.modelos[nome]
+        rng = self._rng
+
+        queda = self._quedas[nome]
+        if queda is not None:
+            if ts < queda[1]:
+                tensao = rng.uniform(modelo.queda_min, modelo.queda_max)
+                return max(0.0, tensao + rng.uniform(-RUIDO_QUEDA, RUIDO_QUEDA))
+            self._quedas[nome] = None
+            if self.registrar:
+                logger.info(f"[SIMULAÇÃO] {nome}: Evento finalizado após {ts - queda[0]:.1f}s")
+
+        if rng.random() < modelo.prob_queda:
+            duracao = rng.randint(modelo.duracao_queda_min, modelo.duracao_queda_max)
+            self._quedas[nome] = (ts, ts + duracao)
+            tensao = rng.uniform(modelo.queda_min, modelo.queda_max)
+            if self.registrar:
+                logger.warning(f"[SIMULAÇÃO] {nome}: Iniciando falha - {tensao:.1f}V por {duracao}s")
+            return tensao
+
+        variacao = modelo.variacao_normal
+        return max(0.0, self.tensao_base(modelo, ts) + rng.uniform(-variacao, variacao))
+
+    def ler_todas(self, ts=None):
+        """{fonte: tensão} de todas as fontes no mesmo instante"""
+        if ts is None:
+            ts = time.time()
+        return {nome: self.ler(nome, ts) for nome in self.modelos}
+
+# ts: instantes dos ciclos (epoch s); tensoes: {fonte: tensões na ordem de ts}.
+# Com numpy são ndarrays float64; sem numpy, array('d').
+Lote = namedtuple('Lote', ('ts', 'tensoes'))
+
+class GeradorLotes:
+    """
+    Gera ciclos consecutivos a partir de inicio_ts, `passo` segundos entre
+    ciclos. Quedas que atravessam o fim de um lote continuam no seguinte.
+    """
+
+    def __init__(self, fontes, inicio_ts, passo=1.0, semente=None, modelos=MODELOS):
+        self.modelos = {nome: modelos[nome] for nome in fontes if nome in modelos}
+        self.inicio_ts = inicio_ts
+        self.passo = float(passo)
+        self.proximo = 0  # índice do próximo ciclo
+        if NUMPY_DISPONIVEL:
+            self._rng = np.random.default_rng(semente)
+            # Ciclos restantes da queda em andamento no fim do último lote
+            self._queda_restante = {nome: 0 for nome in self.modelos}
+        else:
+            self._simulador = Simulador(self.modelos, inicio_ts, semente, modelos, registrar=False)
+
+    def gerar(self, n):
+        """Próximos n ciclos de todas as fontes"""
+        primeiro = self.proximo
+        self.proximo += n
+        if not NUMPY_DISPONIVEL:
+            return self._gerar_python(primeiro, n)
+
+        ts = self.inicio_ts + (primeiro + np.arange(n, dtype=np.float64)) * self.passo
+        return Lote(ts, {nome: self._gerar_fonte(nome, modelo, ts) for nome, modelo in self.modelos.items()})
+
+    def lotes(self, fim_ts, tamanho=3600):
+        """Itera lotes de até `tamanho` ciclos até fim_ts (exclusivo)"""
+        while True:
+            restantes = int((fim_ts - self.inicio_ts) / self.passo) - self.proximo
+            if restantes <= 0:
+                return
+            yield self.gerar(min(tamanho, restantes))
+
+    def _gerar_fonte(self, nome, modelo, ts):
+        rng = self._rng
+        n = len(ts)
+        tensao = np.full(n, modelo.tensao_nominal)
+        if modelo.curva_solar:
+            # Deslocamento do fuso no início do lote (horário de verão muda entre lotes)
+            deslocamento = datetime.fromtimestamp(float(ts[0])).astimezone().utcoffset().total_seconds()
+            horas = ((ts + deslocamento) // 3600 % 24).astype(np.intp)
+            tensao *= np.asarray(FATOR_SOLAR_HORA)[horas]
+        elif modelo.descarga:
+            tensao *= np.maximum(DESCARGA_MINIMO, 1 - (ts - self.inicio_ts) / DESCARGA_SEGUNDOS)
+        tensao += rng.uniform(-modelo.variacao_normal, modelo.variacao_normal, n)
+
+        # Quedas: ciclos entre o fim de uma e o início da próxima ~ geométrica(p),
+        # sorteados em blocos; o laço só percorre os eventos, não os ciclos
+        inicios = []
+        fins = []
+        novas = []
+        i = min(self._queda_restante[nome], n)
+        self._queda_restante[nome] -= i
+        if i:
+            inicios.append(0)
+            fins.append(i)
+        bloco = max(16, int(n * modelo.prob_queda * 1.5))
+        while i < n:
+            intervalos = rng.geometric(modelo.prob_queda, bloco).tolist()
+            duracoes = np.ceil(rng.integers(modelo.duracao_queda_min, modelo.duracao_queda_max + 1, bloco)
+                               / self.passo).astype(np.int64).tolist()
+            for intervalo, duracao in zip(intervalos, duracoes):
+                inicio = i + intervalo - 1
+                if inicio >= n:
+                    i = n
+                    break
+                i = inicio + max(duracao, 1)
+                inicios.append(inicio)
+                fins.append(min(i, n))
+                novas.append(inicio)
+                if i >= n:
+                    # A queda continua no próximo lote
+                    self._queda_restante[nome] = i - n
+                    break
+
+        em_queda = np.cumsum(np.bincount(inicios, minlength=n + 1)[:n]
+                             - np.bincount(fins, minlength=n + 1)[:n]) > 0
+        quedas = int(em_queda.sum())
+        if quedas:
+            tensao[em_queda] = (rng.uniform(modelo.queda_min, modelo.queda_max, quedas)
+                                + rng.uniform(-RUIDO_QUEDA, RUIDO_QUEDA, quedas))
+            # O ciclo que inicia a queda não leva o ruído extra (como no Simulador)
+            tensao[novas] = rng.uniform(modelo.queda_min, modelo.queda_max, len(novas))
+        return np.maximum(tensao, 0.0, out=tensao)
+
+    def _gerar_python(self, primeiro, n):
+        ts = array('d', (self.inicio_ts + (primeiro + k) * self.passo for k in range(n)))
+        tensoes = {nome: array('d') for nome in self.modelos}
+        simulador = self._simulador
+        for instante in ts:
+            for nome, tensao in simulador.ler_todas(instante).items():
+                tensoes[nome].append(tensao)
+        return Lote(ts, tensoes)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark do esquema da tabela eventos: data_hora TEXT (legado) vs ts epoch ms.
+
+Cria um banco temporário no esquema legado, mede as consultas usadas por
+/eventos, /estatisticas e /exportar, executa a migração online e repete as
+mesmas consultas no esquema novo, mostrando o EXPLAIN QUERY PLAN de cada uma.
+
+    python benchmarks/bench_esquema_eventos.py --eventos 500000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import migracoes
+
+FONTES = ['rede', 'solar', 'gerador', 'ups']
+ESTADOS = ['ATIVA', 'INSTAVEL', 'FALHA']
+
+def criar_banco_legado(caminho, total, dias):
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fonte TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            tensao REAL,
+            data_hora TEXT NOT NULL,
+            UNIQUE(fonte, tipo, data_hora)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_eventos_data_hora ON eventos(data_hora DESC)")
+
+    rng = random.Random(42)
+    fim = datetime.now()
+    inicio = fim - timedelta(days=dias)
+    passo = (fim - inicio).total_seconds() / total
+    linhas = []
+    for i in range(total):
+        data_hora = (inicio + timedelta(seconds=i * passo)).strftime('%Y-%m-%d %H:%M:%S')
+        linhas.append((rng.choice(FONTES), rng.choice(ESTADOS), rng.uniform(0, 250), data_hora))
+        if len(linhas) >= 50000:
+            conn.executemany("INSERT OR IGNORE INTO eventos (fonte, tipo, tensao, data_hora) VALUES (?, ?, ?, ?)", linhas)
+            linhas = []
+    conn.executemany("INSERT OR IGNORE INTO eventos (fonte, tipo, tensao, data_hora) VALUES (?, ?, ?, ?)", linhas)
+    conn.commit()
+    conn.execute("ANALYZE")
+    return conn
+
+def consultas_legado():
+    agora = datetime.now()
+    h24 = (agora - timedelta(hours=24)).strftime('%Y-%m-%d %H:%M:%S')
+    d30 = (agora - timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'eventos_fonte_limite_100': (
+            "SELECT * FROM eventos WHERE fonte = ? ORDER BY data_hora DESC LIMIT 100", ('rede',)),
+        'eventos_limite_100': (
+            "SELECT * FROM eventos ORDER BY data_hora DESC LIMIT 100", ()),
+        'estatisticas_fonte_24h': (
+            "SELECT fonte, tipo, tensao, data_hora FROM eventos WHERE data_hora >= ? AND fonte = ? "
+            "ORDER BY data_hora DESC", (h24, 'rede')),
+        'estatisticas_fonte_30d': (
+            "SELECT fonte, tipo, tensao, data_hora FROM eventos WHERE data_hora >= ? AND fonte = ? "
+            "ORDER BY data_hora DESC", (d30, 'rede')),
+        'estatisticas_24h': (
+            "SELECT fonte, tipo, tensao, data_hora FROM eventos WHERE data_hora >= ? "
+            "ORDER BY data_hora DESC", (h24,)),
+    }
+
+def consultas_epoch():
+    agora_ms = int(time.time() * 1000)
+    h24 = agora_ms - 24 * 3600 * 1000
+    d30 = agora_ms - 30 * 86400 * 1000
+    return {
+        'eventos_fonte_limite_100': (
+            "SELECT id, fonte, tipo, tensao, ts FROM eventos WHERE fonte = ? ORDER BY ts DESC LIMIT 100",
+            ('rede',)),
+        'eventos_limite_100': (
+            "SELECT id, fonte, tipo, tensao, ts FROM eventos ORDER BY ts DESC LIMIT 100", ()),
+        'estatisticas_fonte_24h': (
+            "SELECT fonte, tipo, tensao, ts FROM eventos WHERE fonte = ? AND ts >= ? ORDER BY ts DESC",
+            ('rede', h24)),
+        'estatisticas_fonte_30d': (
+            "SELECT fonte, tipo, tensao, ts FROM eventos WHERE fonte = ? AND ts >= ? ORDER BY ts DESC",
+            ('rede', d30)),
+        'estatisticas_24h': (
+            "SELECT fonte, tipo, tensao, ts FROM eventos WHERE ts >= ? ORDER BY ts DESC", (h24,)),
+    }
+
+def medir(conn, consultas, repeticoes):
+    resultado = {}
+    for nome, (sql, params) in consultas.items():
+        plano = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        tempos = []
+        linhas = 0
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            linhas = len(conn.execute(sql, params).fetchall())
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        resultado[nome] = {
+            'plano': plano,
+            'linhas': linhas,
+            'mediana_ms': round(statistics.median(tempos), 3)
+        }
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do esquema de eventos')
+    parser.add_argument('--eventos', type=int, default=200000, help='Total de eventos sintéticos')
+    parser.add_argument('--dias', type=int, default=90, help='Período coberto pelos eventos')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'bench.db')
+        print(f"Gerando {args.eventos} eventos no esquema legado...")
+        conn = criar_banco_legado(caminho, args.eventos, args.dias)
+
+        antes = medir(conn, consultas_legado(), args.repeticoes)
+
+        inicio = time.perf_counter()
+        migracoes.migrar_eventos_para_epoch(conn)
+        tempo_migracao = time.perf_counter() - inicio
+        conn.execute("ANALYZE")
+
+        depois = medir(conn, consultas_epoch(), args.repeticoes)
+        conn.close()
+
+    print(f"\nMigração: {tempo_migracao:.2f}s\n")
+    for nome in antes:
+        a, d = antes[nome], depois[nome]
+        ganho = a['mediana_ms'] / d['mediana_ms'] if d['mediana_ms'] else float('inf')
+        print(f"== {nome}")
+        print(f"   antes : {a['mediana_ms']:>9.3f} ms  {a['linhas']:>7} linhas  | {' / '.join(a['plano'])}")
+        print(f"   depois: {d['mediana_ms']:>9.3f} ms  {d['linhas']:>7} linhas  | {' / '.join(d['plano'])}")
+        print(f"   ganho : {ganho:.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump({
+                'eventos': args.eventos,
+                'migracao_s': round(tempo_migracao, 3),
+                'antes': antes,
+                'depois': depois
+            }, arquivo, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
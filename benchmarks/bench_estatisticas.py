@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cálculo de estatísticas de eventos de /estatisticas.
+
+Compara a implementação original (uma list comprehension por fonte e por
+métrica sobre a lista de eventos) com o núcleo de agregacao_eventos.py, com
+numpy e no fallback Python puro. As linhas (fonte, tipo, tensao, ts) são
+geradas em memória, então o tempo medido é só o do cálculo, incluindo a
+carga das colunas tipadas. 10M eventos exigem alguns GB de RAM para a lista
+de tuplas usada pela implementação original.
+
+    python benchmarks/bench_estatisticas.py --tamanhos 10000 1000000 10000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import agregacao_eventos
+
+FONTES = ['gerador', 'rede', 'solar', 'ups']
+ESTADOS = ['ATIVA', 'ATIVA', 'ATIVA', 'INSTAVEL', 'FALHA']
+LOTE = 50000
+
+def gerar_eventos(total):
+    rng = random.Random(42)
+    inicio_ms = int(time.time() * 1000) - 24 * 3600 * 1000
+    eventos = []
+    for i in range(total):
+        estado = rng.choice(ESTADOS)
+        tensao = 0.0 if estado == 'FALHA' else round(rng.uniform(180, 240), 2)
+        eventos.append((rng.choice(FONTES), estado, tensao, inicio_ms + i))
+    return eventos
+
+def original(eventos):
+    """Cálculo de /estatisticas antes do núcleo vetorizado"""
+    resultado = {}
+    for fonte_key in FONTES:
+        eventos_fonte = [e for e in eventos if e[0] == fonte_key]
+        total_eventos = len(eventos_fonte)
+        eventos_ativa = len([e for e in eventos_fonte if e[1] == 'ATIVA'])
+        eventos_falha = len([e for e in eventos_fonte if e[1] == 'FALHA'])
+        tensoes = [float(e[2]) for e in eventos_fonte if e[2]]
+        if tensoes:
+            tensao_media = sum(tensoes) / len(tensoes)
+            tensao_min = min(tensoes)
+            tensao_max = max(tensoes)
+        else:
+            tensao_media = tensao_min = tensao_max = 0.0
+        falhas = [e[3] for e in eventos_fonte if e[1] == 'FALHA']
+        resultado[fonte_key] = (total_eventos, eventos_ativa, eventos_falha,
+                                round(tensao_media, 2), round(tensao_min, 2), round(tensao_max, 2),
+                                max(falhas) if falhas else None)
+    return resultado
+
+def nucleo(eventos):
+    lotes = (eventos[i:i + LOTE] for i in range(0, len(eventos), LOTE))
+    janela = agregacao_eventos.carregar_janela(lotes, FONTES)
+    resumo = agregacao_eventos.estatisticas_por_fonte(janela)
+    return {
+        fonte: (r['total_eventos'], r['eventos_estado']['ATIVA'], r['eventos_estado']['FALHA'],
+                round(r['tensao_media'] or 0.0, 2), round(r['tensao_min'] or 0.0, 2),
+                round(r['tensao_max'] or 0.0, 2), r['ultima_falha_ms'])
+        for fonte, r in resumo.items()
+    }
+
+def nucleo_python(eventos):
+    numpy_disponivel = agregacao_eventos.NUMPY_DISPONIVEL
+    agregacao_eventos.NUMPY_DISPONIVEL = False
+    try:
+        return nucleo(eventos)
+    finally:
+        agregacao_eventos.NUMPY_DISPONIVEL = numpy_disponivel
+
+def medir(funcao, eventos, repeticoes):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(eventos)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), resultado
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das estatísticas de eventos')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    implementacoes = {'original': original, 'python': nucleo_python}
+    if agregacao_eventos.NUMPY_DISPONIVEL:
+        implementacoes['numpy'] = nucleo
+    else:
+        print("numpy não instalado: medindo apenas o fallback Python")
+
+    resultados = {}
+    for total in args.tamanhos:
+        print(f"\nGerando {total} eventos...")
+        eventos = gerar_eventos(total)
+        repeticoes = args.repeticoes if total <= 1000000 else 1
+        tempos = {}
+        referencia = None
+        for nome, funcao in implementacoes.items():
+            tempo, resultado = medir(funcao, eventos, repeticoes)
+            if referencia is None:
+                referencia = resultado
+            elif resultado != referencia:
+                print(f"   AVISO: {nome} divergiu da implementação original")
+            tempos[nome] = round(tempo, 4)
+            ganho = tempos['original'] / tempo if tempo else float('inf')
+            print(f"   {nome:<9} {tempo:>9.4f} s  {ganho:>6.1f}x")
+        resultados[total] = tempos
+        del eventos
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos formatos de /exportar: tempo de geração e tamanho do arquivo.
+
+Cria um banco temporário com eventos sintéticos e passa a mesma consulta de
+/exportar (ORDER BY ts DESC, lotes de fetchmany) por cada serializador de
+exportacao.py, comparando com o CSV. Formatos cujas dependências opcionais
+(pyarrow, numpy) não estão instaladas são ignorados.
+
+    python benchmarks/bench_exportacao.py --eventos 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import exportacao
+import migracoes
+
+FONTES = {'rede': 'Rede Elétrica', 'solar': 'Energia Solar', 'gerador': 'Gerador', 'ups': 'UPS'}
+ESTADOS = ['ATIVA', 'INSTAVEL', 'FALHA']
+
+SQL_EXPORTAR = "SELECT id, fonte, tipo, tensao, ts FROM eventos ORDER BY ts DESC"
+
+def criar_banco(caminho, total, dias):
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    migracoes.garantir_esquema(conn)
+
+    rng = random.Random(42)
+    fim_ms = int(time.time() * 1000)
+    passo = dias * 86400000 / total
+    inicio_ms = fim_ms - dias * 86400000
+    fontes = list(FONTES)
+    linhas = []
+    for i in range(total):
+        linhas.append((rng.choice(fontes), rng.choice(ESTADOS), rng.uniform(0, 250),
+                       int(inicio_ms + i * passo)))
+        if len(linhas) >= 50000:
+            conn.executemany("INSERT INTO eventos (fonte, tipo, tensao, ts) VALUES (?, ?, ?, ?)", linhas)
+            linhas = []
+    conn.executemany("INSERT INTO eventos (fonte, tipo, tensao, ts) VALUES (?, ?, ?, ?)", linhas)
+    conn.commit()
+    return conn
+
+def variantes():
+    cabecalho = {'timestamp': 'benchmark', 'filtros': {}}
+    texto = {
+        'csv': lambda lotes: exportacao.serializar_csv(lotes, FONTES),
+        'json': lambda lotes: exportacao.serializar_json(lotes, FONTES, cabecalho),
+        'ndjson': lambda lotes: exportacao.serializar_ndjson(lotes, FONTES),
+    }
+    resultado = {}
+    for nome, serializar in texto.items():
+        resultado[nome] = lambda lotes, s=serializar: exportacao.codificar_utf8(s(lotes))
+        resultado[nome + '.gz'] = lambda lotes, s=serializar: exportacao.compactar_gzip(s(lotes))
+    if exportacao.formato_disponivel('parquet'):
+        resultado['parquet'] = lambda lotes: exportacao.serializar_parquet(lotes, FONTES)
+        resultado['arrow'] = lambda lotes: exportacao.serializar_arrow(lotes, FONTES)
+    if exportacao.formato_disponivel('npz'):
+        resultado['npz'] = lambda lotes: exportacao.serializar_npz(lotes, FONTES)
+    return resultado
+
+def medir(conn, gerar, tamanho_lote, repeticoes):
+    tempos = []
+    tamanho = 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        lotes = exportacao.ler_lotes(conn.execute(SQL_EXPORTAR), tamanho_lote)
+        tamanho = sum(len(parte) for parte in gerar(lotes))
+        tempos.append(time.perf_counter() - inicio)
+    return {'mediana_s': round(statistics.median(tempos), 3), 'bytes': tamanho}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos formatos de exportação')
+    parser.add_argument('--eventos', type=int, default=200000, help='Total de eventos sintéticos')
+    parser.add_argument('--dias', type=int, default=90, help='Período coberto pelos eventos')
+    parser.add_argument('--lote', type=int, default=5000, help='Linhas por fetchmany')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"Gerando {args.eventos} eventos...")
+        conn = criar_banco(os.path.join(diretorio, 'bench.db'), args.eventos, args.dias)
+        resultados = {nome: medir(conn, gerar, args.lote, args.repeticoes)
+                      for nome, gerar in variantes().items()}
+        conn.close()
+
+    base = resultados['csv']
+    print(f"\n{'formato':<10} {'tempo (s)':>10} {'vs csv':>8} {'tamanho (MB)':>13} {'vs csv':>8}")
+    for nome, r in resultados.items():
+        print(f"{nome:<10} {r['mediana_s']:>10.3f} {r['mediana_s'] / base['mediana_s']:>7.2f}x "
+              f"{r['bytes'] / 1e6:>13.2f} {r['bytes'] / base['bytes']:>7.2f}x")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump({'eventos': args.eventos, 'lote': args.lote, 'formatos': resultados},
+                      arquivo, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark do hub WebSocket com 1000 clientes simulados em um único núcleo.
+
+Os clientes são conexões falsas cujo transporte só contabiliza bytes, então o
+tempo medido é o custo do servidor por ciclo de aquisição: serialização,
+montagem dos frames, fan-out e backpressure. Compara o hub (uma serialização
+por variante) com o envio ingênuo (json.dumps e frame montado por cliente) e
+inclui clientes lentos, cujo buffer nunca esvazia, para mostrar a fila
+limitada e a desconexão por atraso.
+
+    python benchmarks/bench_hub_ws.py --clientes 1000 --v2 0.3 --lentos 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from websockets.protocol import State
+
+import hub_ws
+
+FONTES = ['gerador', 'rede', 'solar', 'ups']
+ASSINATURAS_V2 = [
+    {'tipo': 'assinar'},
+    {'tipo': 'assinar', 'banda_morta': 2.0, 'codificacao': 'struct'},
+    {'tipo': 'assinar', 'fontes': ['rede'], 'lote': 5},
+]
+
+class TransporteFalso:
+    def __init__(self, lento):
+        self.lento = lento
+        self.buffer = 0
+        self.bytes = 0
+        self.abortado = False
+
+    def get_write_buffer_size(self):
+        return self.buffer
+
+    def write(self, dados):
+        self.bytes += len(dados)
+        if self.lento:
+            self.buffer += len(dados)
+
+    def abort(self):
+        self.abortado = True
+
+class WebSocketFalso:
+    def __init__(self, i, lento):
+        self.remote_address = ('10.0.0.%d' % (i % 250), 40000 + i)
+        self.transport = TransporteFalso(lento)
+        self.state = State.OPEN
+
+def gerar_dados(rng, seq):
+    dados = {}
+    for fonte in FONTES:
+        tensao = round(rng.uniform(210, 230), 2)
+        dados[fonte] = {'tensao': tensao, 'estado': 'ATIVA' if tensao > 212 else 'INSTAVEL',
+                        'timestamp': f'2024-01-01T00:00:{seq % 60:02d}.000000'}
+    return dados
+
+def envio_ingenuo(clientes, dados):
+    """Referência: cada cliente serializa e monta o próprio frame"""
+    for ws in clientes:
+        ws.transport.write(hub_ws.montar_frame(json.dumps(dados)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do hub WebSocket')
+    parser.add_argument('--clientes', type=int, default=1000)
+    parser.add_argument('--v2', type=float, default=0.3, help='Fração de clientes no protocolo v2')
+    parser.add_argument('--lentos', type=int, default=20, help='Clientes cujo buffer nunca esvazia')
+    parser.add_argument('--ciclos', type=int, default=200)
+    parser.add_argument('--periodo', type=float, default=1.0, help='Período de aquisição (s) para o uso de CPU')
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    rng = random.Random(42)
+    # atraso_max curto: os ciclos do benchmark não esperam o período real
+    hub = hub_ws.HubTransmissao(FONTES, fila_max=32, buffer_max=64 * 1024, atraso_max=0.05)
+    clientes = []
+    for i in range(args.clientes):
+        ws = WebSocketFalso(i, lento=i < args.lentos)
+        if rng.random() < args.v2:
+            hub.assinar_v2(ws, ASSINATURAS_V2[i % len(ASSINATURAS_V2)])
+        else:
+            hub.registrar_v1(ws)
+        clientes.append(ws)
+    # Os lentos começam com o buffer acima do limite
+    for ws in clientes[:args.lentos]:
+        ws.transport.buffer = 10 ** 6
+
+    tempos_hub = []
+    tempos_ingenuo = []
+    for seq in range(1, args.ciclos + 1):
+        dados = gerar_dados(rng, seq)
+        ts_ms = int(time.time() * 1000)
+
+        inicio = time.perf_counter()
+        hub.publicar(dados, seq, ts_ms)
+        tempos_hub.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        envio_ingenuo(clientes, dados)
+        tempos_ingenuo.append((time.perf_counter() - inicio) * 1000)
+
+    metricas = hub.metricas(max_clientes=0)
+    resultado = {
+        'clientes': args.clientes,
+        'ciclos': args.ciclos,
+        'hub_ms_mediana': round(statistics.median(tempos_hub), 3),
+        'hub_ms_p99': round(sorted(tempos_hub)[int(len(tempos_hub) * 0.99) - 1], 3),
+        'ingenuo_ms_mediana': round(statistics.median(tempos_ingenuo), 3),
+        'serializacoes_por_ciclo': round(metricas['serializacoes'] / args.ciclos, 2),
+        'variantes_v2': metricas['variantes_v2'],
+        'descartados': metricas['descartados'],
+        'desconectados_por_atraso': metricas['desconectados_por_atraso'],
+        'conexoes_restantes': metricas['conexoes'],
+    }
+    resultado['cpu_hub_percentual'] = round(resultado['hub_ms_mediana'] / (args.periodo * 10), 2)
+
+    print(f"{args.clientes} clientes ({args.v2:.0%} v2, {args.lentos} lentos), {args.ciclos} ciclos")
+    print(f"  hub     : {resultado['hub_ms_mediana']:.3f} ms/ciclo (p99 {resultado['hub_ms_p99']:.3f}), "
+          f"{resultado['serializacoes_por_ciclo']} serializações/ciclo, "
+          f"{resultado['cpu_hub_percentual']}% de um núcleo a {args.periodo}s/ciclo")
+    print(f"  ingênuo : {resultado['ingenuo_ms_mediana']:.3f} ms/ciclo ({args.clientes} serializações/ciclo)")
+    print(f"  lentos  : {resultado['descartados']} quadros descartados, "
+          f"{resultado['desconectados_por_atraso']} desconectados, {resultado['conexoes_restantes']} conexões restantes")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks das funções quentes de app/run.py, com comparação contra
+uma linha de base.
+
+Para cada tamanho de histórico (--dias), gera um banco temporário com o
+backfill (simulação semeada, sem rede nem hardware) e mede, num processo
+filho com DATABASE_PATH apontando para esse banco:
+
+- determinar_estado_fonte, get_config_value, registrar_evento (com o
+  escritor de eventos rodando) e simular_leitura_avancada;
+- calculate_uptime_stats (geral e por fonte) e
+  calculate_time_since_total_blackout;
+- /estatisticas (24h, 7d, 30d e com filtro de fonte), com o cache de
+  respostas desligado para que cada chamada recalcule;
+- /exportar em cada formato disponível, consumindo o streaming inteiro.
+
+Cada caso roda em --rodadas rodadas de pelo menos --tempo-rodada segundos;
+o resultado é a mediana do tempo por chamada. Com --baseline, compara com
+um resultado --json anterior e termina com código 1 se algum caso ficar
+mais de --limite % mais lento.
+
+    python benchmarks/bench_micro.py --dias 1,7,30 --json base.json
+    python benchmarks/bench_micro.py --dias 1,7,30 --baseline base.json --limite 15
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'app'))
+
+TABELAS = ('eventos', 'leituras_blocos', 'rollup_1m', 'rollup_1h', 'rollup_1d', 'intervalos_estado', 'apagoes')
+
+def cronometrar(funcao, rodadas, tempo_rodada):
+    """Mediana e mínimo do tempo por chamada (us); calibra as iterações por rodada"""
+    iteracoes = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            funcao()
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= tempo_rodada or iteracoes >= 1 << 20:
+            break
+        iteracoes = max(iteracoes * 2, int(iteracoes * tempo_rodada / max(decorrido, 1e-9)))
+    tempos = [decorrido / iteracoes]
+    for _ in range(rodadas - 1):
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / iteracoes)
+    return {
+        'mediana_us': round(statistics.median(tempos) * 1e6, 3),
+        'min_us': round(min(tempos) * 1e6, 3),
+        'iteracoes': iteracoes,
+    }
+
+def casos(run):
+    """(nome, função) de cada caso medido; run já importado com o banco do tamanho"""
+    fontes = list(run.FONTES_CONFIG.keys())
+    fonte = fontes[0]
+    limiar = run.FONTES_CONFIG[fonte].get('threshold', 100.0)
+    tensoes = (limiar * 1.1, limiar * 0.8, limiar * 0.2)
+    ts = [time.time()]
+
+    def estado():
+        for tensao in tensoes:
+            run.determinar_estado_fonte(fonte, tensao)
+
+    def simular():
+        ts[0] += 1
+        for nome in fontes:
+            run.simular_leitura_avancada(nome, ts[0])
+
+    cliente = run.app.test_client()
+
+    def rota(caminho):
+        def chamar():
+            resposta = cliente.get(caminho)
+            resposta.get_data()
+            if resposta.status_code != 200:
+                raise RuntimeError(f"{caminho}: HTTP {resposta.status_code}")
+        return chamar
+
+    ultima_falha_ms = int(time.time() * 1000) - 3600 * 1000
+    lista = [
+        ('determinar_estado_fonte[x3]', estado),
+        ('get_config_value', lambda: run.get_config_value('percentual_instabilidade', 70)),
+        (f'simular_leitura_avancada[x{len(fontes)}]', simular),
+        ('calculate_uptime_stats[sistema]', lambda: run.calculate_uptime_stats('', None)),
+        ('calculate_uptime_stats[fonte]', lambda: run.calculate_uptime_stats(fonte, ultima_falha_ms)),
+        ('calculate_time_since_total_blackout', run.calculate_time_since_total_blackout),
+    ]
+    for periodo in ('24h', '7d', '30d'):
+        lista.append((f'estatisticas[{periodo}]', rota(f'/estatisticas?periodo={periodo}')))
+    lista.append((f'estatisticas[30d,{fonte}]', rota(f'/estatisticas?periodo=30d&fonte={fonte}')))
+    for formato in ('csv', 'json', 'ndjson', 'parquet', 'arrow', 'npz'):
+        if run.exportacao.formato_disponivel(formato):
+            lista.append((f'exportar[{formato}]', rota(f'/exportar?formato={formato}')))
+    lista.append(('exportar[csv,gzip]', rota('/exportar?formato=csv&compactar=gzip')))
+    # Por último: os eventos gravados mudariam o tamanho medido nos casos acima
+    lista.append(('registrar_evento', lambda: run.registrar_evento(fonte, 'ATIVA', limiar)))
+    return lista
+
+def medir(rodadas, tempo_rodada, filtro):
+    """Processo filho: mede todos os casos contra o banco de DATABASE_PATH"""
+    import run
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        if type(handler) is logging.StreamHandler:
+            raiz.removeHandler(handler)
+    # O escritor de eventos consome a fila, como no serviço; sem ele
+    # registrar_evento mediria só descartes de fila cheia
+    run.init_database()
+    run.escritor_eventos.iniciar()
+
+    resultado = {}
+    try:
+        for nome, funcao in casos(run):
+            if filtro and not any(parte in nome for parte in filtro):
+                continue
+            funcao()  # aquecimento (pool, cache de configurações, páginas do banco)
+            resultado[nome] = cronometrar(funcao, rodadas, tempo_rodada)
+    finally:
+        run.escritor_eventos.parar()
+    return resultado
+
+def contar_linhas(banco):
+    conn = sqlite3.connect(banco)
+    try:
+        return {tabela: conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0] for tabela in TABELAS}
+    finally:
+        conn.close()
+
+def medir_tamanho(dias, args):
+    """Gera o histórico de `dias` num diretório temporário e mede num processo filho"""
+    temp = tempfile.mkdtemp(prefix='bench_micro_')
+    try:
+        banco = os.path.join(temp, 'energia.db')
+        ambiente = dict(os.environ,
+                        DATABASE_PATH=banco,
+                        LOG_FILE=os.path.join(temp, 'energia.log'),
+                        CACHE_RESPOSTAS_ATIVO='false')
+        for variavel in ('POWEREDGE_PAPEL', 'REPRODUCAO_ARQUIVOS'):
+            ambiente.pop(variavel, None)
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(RAIZ, 'app', 'backfill.py'), '--banco', banco,
+                        '--dias', str(dias), '--passo', str(args.passo), '--semente', str(args.semente)],
+                       env=ambiente, check=True, stdout=subprocess.DEVNULL)
+        geracao = time.perf_counter() - inicio
+        linhas = contar_linhas(banco)
+
+        saida = os.path.join(temp, 'resultado.json')
+        comando = [sys.executable, os.path.abspath(__file__), '--_filho', saida,
+                   '--rodadas', str(args.rodadas), '--tempo-rodada', str(args.tempo_rodada)]
+        if args.casos:
+            comando += ['--casos', args.casos]
+        subprocess.run(comando, env=ambiente, check=True)
+        with open(saida) as arquivo:
+            casos_medidos = json.load(arquivo)
+        return {'linhas': linhas, 'geracao_s': round(geracao, 1), 'casos': casos_medidos}
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+def comparar(resultado, baseline, limite):
+    """Imprime a variação de cada caso presente nos dois; retorna as regressões"""
+    regressoes = []
+    if baseline.get('parametros') != resultado['parametros']:
+        print(f"Atenção: parâmetros diferentes da linha de base ({baseline.get('parametros')})")
+    print(f"Comparação com a linha de base (limite +{limite:g}%):")
+    for tamanho, medido in resultado['tamanhos'].items():
+        anterior = baseline.get('tamanhos', {}).get(tamanho)
+        if anterior is None:
+            print(f"  {tamanho}: ausente na linha de base")
+            continue
+        for nome, caso in medido['casos'].items():
+            base = anterior['casos'].get(nome)
+            if base is None:
+                continue
+            variacao = (caso['mediana_us'] / base['mediana_us'] - 1) * 100 if base['mediana_us'] else 0.0
+            marca = ''
+            if variacao > limite:
+                marca = '  << REGRESSÃO'
+                regressoes.append((tamanho, nome, variacao))
+            print(f"  {tamanho:>4} {nome:<40} {base['mediana_us']:>12,.2f} -> "
+                  f"{caso['mediana_us']:>12,.2f} us ({variacao:+6.1f}%){marca}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks das funções quentes de run.py')
+    parser.add_argument('--dias', default='1,7,30', help='Tamanhos do histórico em dias, separados por vírgula')
+    parser.add_argument('--passo', type=float, default=1.0, help='Segundos entre ciclos no histórico')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--rodadas', type=int, default=5, help='Rodadas por caso (mediana)')
+    parser.add_argument('--tempo-rodada', type=float, default=0.2, help='Duração mínima de cada rodada (s)')
+    parser.add_argument('--casos', help='Medir só os casos cujo nome contém um destes textos (vírgula)')
+    parser.add_argument('--baseline', help='Resultado --json anterior para comparar')
+    parser.add_argument('--limite', type=float, default=20.0, help='Regressão tolerada na mediana (%%)')
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo (nova linha de base)')
+    parser.add_argument('--_filho', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    filtro = [parte for parte in (args.casos or '').split(',') if parte]
+    if args._filho:
+        resultado = medir(args.rodadas, args.tempo_rodada, filtro)
+        with open(args._filho, 'w') as arquivo:
+            json.dump(resultado, arquivo)
+        return
+
+    import simulacao
+    if not simulacao.NUMPY_DISPONIVEL:
+        sys.exit("numpy não está instalado (necessário para o backfill): pip install numpy")
+
+    tamanhos = [float(parte) for parte in args.dias.split(',') if parte]
+    resultado = {
+        'parametros': {'passo': args.passo, 'semente': args.semente, 'rodadas': args.rodadas,
+                       'tempo_rodada': args.tempo_rodada},
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'sqlite': sqlite3.sqlite_version},
+        'tamanhos': {},
+    }
+    for dias in tamanhos:
+        rotulo = f'{dias:g}d'
+        medido = medir_tamanho(dias, args)
+        resultado['tamanhos'][rotulo] = medido
+        print(f"{rotulo}: {medido['linhas']['eventos']:,} eventos, "
+              f"{medido['linhas']['leituras_blocos']:,} blocos de leituras "
+              f"(gerado em {medido['geracao_s']} s)")
+        for nome, caso in medido['casos'].items():
+            print(f"   {nome:<40} {caso['mediana_us']:>12,.1f} us  (min {caso['min_us']:,.1f}, "
+                  f"{caso['iteracoes']} iterações/rodada)")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(resultado, baseline, args.limite)
+        if regressoes:
+            print(f"{len(regressoes)} caso(s) acima do limite de +{args.limite:g}%")
+            sys.exit(1)
+        print("Nenhuma regressão acima do limite")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: servidor de desenvolvimento (Flask threaded) x servidor ASGI
+x implantação multiprocesso (aquisição + N workers de API).
+
+Cada servidor sobe em um subprocesso, em modo simulação e com um banco
+temporário próprio. O gerador de carga usa conexões HTTP/1.1 keep-alive em
+asyncio, em malha fechada (cada conexão manda a próxima requisição ao
+receber a resposta), alternando entre os endpoints consultados pelo
+dashboard. Mede requisições por segundo e latências; com --ws também mantém
+clientes WebSocket conectados durante a carga.
+
+    python benchmarks/bench_servidor.py --conexoes 32 --duracao 15 --ws 50
+    python benchmarks/bench_servidor.py --modos asgi multiprocesso --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, 'app')
+
+ENDPOINTS = ['/status', '/eventos?per_page=50', '/configuracao', '/status']
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def iniciar_servidor(modo, diretorio, workers):
+    porta = porta_livre()
+    ambiente = dict(os.environ,
+                    DATABASE_PATH=os.path.join(diretorio, f'{modo}.db'),
+                    LOG_FILE=os.path.join(diretorio, f'{modo}.log'),
+                    LOG_LEVEL='WARNING')
+    if modo == 'desenvolvimento':
+        porta_ws = porta_livre()
+        ambiente.update(FLASK_PORT=str(porta), WEBSOCKET_PORT=str(porta_ws))
+        comando = [sys.executable, 'run.py']
+        url_ws = f"ws://127.0.0.1:{porta_ws}"
+    else:
+        ambiente.update(ASGI_PORT=str(porta), ASGI_HOST='127.0.0.1', ASGI_WORKERS=str(workers))
+        comando = [sys.executable, 'servidor_asgi.py' if modo == 'asgi' else 'servidor_multiprocesso.py']
+        url_ws = f"ws://127.0.0.1:{porta}/ws"
+    processo = subprocess.Popen(comando, cwd=APP, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=0.5):
+                return processo, porta, url_ws
+        except OSError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f"Servidor {modo} não respondeu na porta {porta}")
+
+async def requisitar(leitor, escritor, caminho):
+    escritor.write(f"GET {caminho} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho = None
+    fragmentado = False
+    fechar = False
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        nome = nome.strip().lower()
+        if nome == 'content-length':
+            tamanho = int(valor)
+        elif nome == 'transfer-encoding' and 'chunked' in valor:
+            fragmentado = True
+        elif nome == 'connection' and 'close' in valor.lower():
+            fechar = True
+    if fragmentado:
+        while True:
+            tamanho_pedaco = int((await leitor.readline()).strip(), 16)
+            await leitor.readexactly(tamanho_pedaco + 2)
+            if tamanho_pedaco == 0:
+                break
+    elif tamanho:
+        await leitor.readexactly(tamanho)
+    return status, fechar
+
+async def conexao_http(porta, fim, latencias, erros, deslocamento):
+    leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+    i = deslocamento
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            status, fechar = await asyncio.wait_for(
+                requisitar(leitor, escritor, ENDPOINTS[i % len(ENDPOINTS)]), timeout=10
+            )
+            if status != 200:
+                erros.append(status)
+            # O servidor de desenvolvimento fecha a conexão a cada resposta:
+            # a reconexão entra na latência, como para um cliente real
+            if fechar:
+                escritor.close()
+                leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            erros.append(str(e) or type(e).__name__)
+            escritor.close()
+            leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+        i += 1
+    escritor.close()
+
+async def cliente_ws(url, fim, quadros):
+    import websockets
+    try:
+        async with websockets.connect(url) as ws:
+            while time.perf_counter() < fim:
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=max(0.01, fim - time.perf_counter()))
+                    quadros.append(1)
+                except asyncio.TimeoutError:
+                    break
+    except Exception:
+        pass
+
+async def carga(porta, url_ws, conexoes, duracao, clientes_ws):
+    latencias = []
+    erros = []
+    quadros = []
+    fim = time.perf_counter() + duracao
+    tarefas = [conexao_http(porta, fim, latencias, erros, i) for i in range(conexoes)]
+    tarefas += [cliente_ws(url_ws, fim, quadros) for _ in range(clientes_ws)]
+    inicio = time.perf_counter()
+    await asyncio.gather(*tarefas)
+    return latencias, erros, len(quadros), time.perf_counter() - inicio
+
+def resumir(latencias, erros, quadros, decorrido):
+    ordenadas = sorted(latencias)
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * q / 100.0))], 2)
+    return {
+        'requisicoes': len(latencias),
+        'req_por_s': round(len(latencias) / decorrido, 1),
+        'erros': len(erros),
+        'latencia_ms': {'p50': p(50), 'p90': p(90), 'p99': p(99), 'max': round(ordenadas[-1], 2),
+                        'media': round(statistics.fmean(ordenadas), 2)} if ordenadas else None,
+        'quadros_ws': quadros
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga dos servidores HTTP/WebSocket')
+    parser.add_argument('--modos', nargs='+', default=['desenvolvimento', 'asgi'],
+                        choices=['desenvolvimento', 'asgi', 'multiprocesso'])
+    parser.add_argument('--conexoes', type=int, default=32, help='Conexões HTTP keep-alive simultâneas')
+    parser.add_argument('--duracao', type=float, default=15, help='Segundos de carga por servidor')
+    parser.add_argument('--ws', type=int, default=0, help='Clientes WebSocket conectados durante a carga')
+    parser.add_argument('--workers', type=int, default=4, help='Workers de API no modo multiprocesso')
+    parser.add_argument('--aquecimento', type=float, default=2, help='Segundos de carga descartados')
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    resultado = {'conexoes': args.conexoes, 'duracao': args.duracao, 'clientes_ws': args.ws,
+                 'workers': args.workers}
+    with tempfile.TemporaryDirectory(prefix='bench_servidor_') as diretorio:
+        for modo in args.modos:
+            processo, porta, url_ws = iniciar_servidor(modo, diretorio, args.workers)
+            try:
+                asyncio.run(carga(porta, url_ws, args.conexoes, args.aquecimento, 0))
+                resultado[modo] = resumir(*asyncio.run(
+                    carga(porta, url_ws, args.conexoes, args.duracao, args.ws)
+                ))
+            finally:
+                processo.terminate()
+                processo.wait(timeout=30)
+
+    print(f"{args.conexoes} conexões keep-alive, {args.duracao:g}s por servidor, {args.ws} clientes WebSocket")
+    for modo in args.modos:
+        r = resultado[modo]
+        lat = r['latencia_ms'] or {}
+        print(f"  {modo:16s}: {r['req_por_s']:8.1f} req/s, p50 {lat.get('p50')} ms, "
+              f"p99 {lat.get('p99')} ms, {r['erros']} erros, {r['quadros_ws']} quadros WS")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark do simulador de fontes.
+
+Caminho ao vivo: custo por leitura da simular_leitura_avancada original
+(dict de configurações e lambdas recriados a cada chamada, datetime.now())
+contra simulacao.Simulador. Lote: ciclos por segundo do GeradorLotes para
+todas as fontes, em lotes de uma hora, e a fração do tempo em queda por
+fonte nos dois caminhos (devem ficar próximas).
+
+    python benchmarks/bench_simulacao.py --leituras 200000 --dias 365
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import simulacao
+
+FONTES = ['gerador', 'rede', 'solar', 'ups']
+LIMIAR_QUEDA = {'gerador': 126.0, 'rede': 126.0, 'solar': 84.0, 'ups': 7.0}  # 70% do threshold
+
+simulacao_iniciada = datetime.now()
+cenarios_simulacao = {
+    nome: {'ultimo_evento': datetime.now(), 'estado_forcado': None, 'duracao_evento': 0}
+    for nome in FONTES
+}
+
+def original(nome):
+    """simular_leitura_avancada antes dos modelos pré-calculados (sem os logs)"""
+    agora = datetime.now()
+    cenario = cenarios_simulacao[nome]
+    configs = {
+        'rede': {'tensao_nominal': 220.0, 'variacao_normal': 8.0, 'prob_queda': 0.003,
+                 'duracao_queda_min': 5, 'duracao_queda_max': 120,
+                 'tensao_queda': lambda: random.uniform(0, 50), 'recuperacao_gradual': True},
+        'solar': {'tensao_nominal': 180.0, 'variacao_normal': 25.0, 'prob_queda': 0.008,
+                  'duracao_queda_min': 10, 'duracao_queda_max': 300,
+                  'tensao_queda': lambda: random.uniform(20, 80), 'recuperacao_gradual': True,
+                  'comportamento_hora': True},
+        'gerador': {'tensao_nominal': 240.0, 'variacao_normal': 12.0, 'prob_queda': 0.005,
+                    'duracao_queda_min': 3, 'duracao_queda_max': 60,
+                    'tensao_queda': lambda: random.uniform(0, 30), 'recuperacao_gradual': False},
+        'ups': {'tensao_nominal': 12.6, 'variacao_normal': 0.8, 'prob_queda': 0.001,
+                'duracao_queda_min': 2, 'duracao_queda_max': 30,
+                'tensao_queda': lambda: random.uniform(9.5, 11.0), 'recuperacao_gradual': True,
+                'descarga_gradual': True}
+    }
+    config = configs[nome]
+    if cenario['estado_forcado'] is not None:
+        tempo_evento = (agora - cenario['ultimo_evento']).total_seconds()
+        if tempo_evento >= cenario['duracao_evento']:
+            cenario['estado_forcado'] = None
+        elif cenario['estado_forcado'] == 'FALHA':
+            return max(0, config['tensao_queda']() + random.uniform(-5, 5))
+    if cenario['estado_forcado'] is None and random.random() < config['prob_queda']:
+        cenario['estado_forcado'] = 'FALHA'
+        cenario['ultimo_evento'] = agora
+        cenario['duracao_evento'] = random.randint(config['duracao_queda_min'], config['duracao_queda_max'])
+        return config['tensao_queda']()
+    tensao_base = config['tensao_nominal']
+    if nome == 'solar' and config.get('comportamento_hora', False):
+        hora = agora.hour
+        if 6 <= hora <= 18:
+            tensao_base *= 0.3 + 0.7 * (1 - abs(hora - 12) / 6)
+        else:
+            tensao_base *= 0.1
+    elif nome == 'ups' and config.get('descarga_gradual', False):
+        tensao_base *= max(0.85, 1 - ((agora - simulacao_iniciada).total_seconds() / 86400))
+    return max(0, tensao_base + random.uniform(-config['variacao_normal'], config['variacao_normal']))
+
+def medir_ao_vivo(leituras):
+    ciclos = leituras // len(FONTES)
+    inicio = time.perf_counter()
+    for _ in range(ciclos):
+        for nome in FONTES:
+            original(nome)
+    tempo_original = time.perf_counter() - inicio
+
+    simulador = simulacao.Simulador(FONTES, semente=1, registrar=False)
+    ts = time.time()
+    inicio = time.perf_counter()
+    for i in range(ciclos):
+        for nome in FONTES:
+            simulador.ler(nome, ts + i)
+    tempo_novo = time.perf_counter() - inicio
+    total = ciclos * len(FONTES)
+    return {
+        'original_us': round(tempo_original / total * 1e6, 3),
+        'simulador_us': round(tempo_novo / total * 1e6, 3),
+    }
+
+def medir_lotes(dias, passo, semente):
+    inicio_ts = time.time() - dias * 86400
+    gerador = simulacao.GeradorLotes(FONTES, inicio_ts, passo=passo, semente=semente)
+    ciclos = 0
+    em_queda = dict.fromkeys(FONTES, 0)
+    inicio = time.perf_counter()
+    for lote in gerador.lotes(inicio_ts + dias * 86400):
+        ciclos += len(lote.ts)
+        for nome, tensoes in lote.tensoes.items():
+            em_queda[nome] += int((tensoes < LIMIAR_QUEDA[nome]).sum()) if simulacao.NUMPY_DISPONIVEL \
+                else sum(1 for t in tensoes if t < LIMIAR_QUEDA[nome])
+    decorrido = time.perf_counter() - inicio
+    return {
+        'ciclos': ciclos,
+        'segundos': round(decorrido, 3),
+        'amostras_por_s': round(ciclos * len(FONTES) / decorrido),
+        'fracao_queda': {nome: round(em_queda[nome] / ciclos, 4) for nome in FONTES}
+    }
+
+def fracao_queda_simulador(ciclos, semente):
+    simulador = simulacao.Simulador(FONTES, inicio_ts=time.time() - ciclos, semente=semente, registrar=False)
+    em_queda = dict.fromkeys(FONTES, 0)
+    ts = simulador.inicio_ts
+    for i in range(ciclos):
+        for nome, tensao in simulador.ler_todas(ts + i).items():
+            em_queda[nome] += tensao < LIMIAR_QUEDA[nome]
+    return {nome: round(em_queda[nome] / ciclos, 4) for nome in FONTES}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do simulador de fontes')
+    parser.add_argument('--leituras', type=int, default=200000, help='Leituras no caminho ao vivo')
+    parser.add_argument('--dias', type=float, default=30, help='Dias gerados em lote')
+    parser.add_argument('--passo', type=float, default=1.0, help='Segundos entre ciclos no lote')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    if not simulacao.NUMPY_DISPONIVEL:
+        print("numpy não instalado: lote medido no fallback Python")
+
+    resultado = {'ao_vivo': medir_ao_vivo(args.leituras)}
+    r = resultado['ao_vivo']
+    print(f"Ao vivo ({args.leituras} leituras): original {r['original_us']} us/leitura, "
+          f"Simulador {r['simulador_us']} us/leitura "
+          f"({r['original_us'] / r['simulador_us']:.1f}x)")
+
+    resultado['lote'] = medir_lotes(args.dias, args.passo, args.semente)
+    r = resultado['lote']
+    print(f"Lote ({args.dias:g} dias, passo {args.passo:g}s): {r['ciclos']} ciclos em {r['segundos']} s, "
+          f"{r['amostras_por_s']:,} amostras/s")
+
+    resultado['fracao_queda_simulador'] = fracao_queda_simulador(min(r['ciclos'], 200000), args.semente)
+    print("Fração do tempo em queda (lote / Simulador):")
+    for nome in FONTES:
+        print(f"   {nome:<8} {r['fracao_queda'][nome]:.4f} / {resultado['fracao_queda_simulador'][nome]:.4f}")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência de /status.
+
+Sobe a aplicação em modo simulação com um banco temporário e o motor de
+aquisição rodando, e mede:
+
+1. o handler em processo (cliente de teste do Flask), comparado com a
+   versão anterior, que lia o simulador e registrava linhas de log para
+   cada fonte a cada requisição;
+2. HTTP real contra o servidor threaded do werkzeug, com conexões
+   keep-alive disparando em uma taxa agregada fixa (--taxa req/s).
+
+    python benchmarks/bench_status.py --taxa 500 --duracao 10 --conexoes 8
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+_TEMP = tempfile.mkdtemp(prefix='bench_status_')
+os.environ.setdefault('DATABASE_PATH', os.path.join(_TEMP, 'energia.db'))
+os.environ.setdefault('LOG_FILE', os.path.join(_TEMP, 'energia.log'))
+
+from werkzeug.serving import make_server
+
+import run
+
+def percentis(latencias_ms):
+    ordenadas = sorted(latencias_ms)
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * q / 100.0))], 3)
+    return {'p50': p(50), 'p90': p(90), 'p99': p(99), 'max': round(ordenadas[-1], 3),
+            'media': round(statistics.fmean(ordenadas), 3)}
+
+def status_anterior():
+    """/status antes do instantâneo: leitura e log por fonte a cada requisição"""
+    logger = run.logger
+    logger.info("=== INÍCIO /status ===")
+    logger.info(f"FONTES_CONFIG.keys(): {list(run.FONTES_CONFIG.keys())}")
+    logger.info(f"HARDWARE_AVAILABLE: {run.HARDWARE_AVAILABLE}")
+    dados = {}
+    for nome in run.FONTES_CONFIG.keys():
+        logger.info(f"Processando fonte: {nome}")
+        tensao = run.simular_leitura(nome)
+        logger.info(f"  Simulação - {nome}: {tensao}V")
+        estado = run.determinar_estado_fonte(nome, tensao)
+        logger.info(f"  Estado - {nome}: {estado}")
+        dados[nome] = {"tensao": round(tensao, 2), "estado": estado, "config": run.FONTES_CONFIG[nome]}
+    logger.info(f"Dados finais: {dados}")
+    return run.jsonify({"status": "ok", "hardware_disponivel": run.HARDWARE_AVAILABLE,
+                        "fontes": dados, "timestamp": run.datetime.now().isoformat()})
+
+def medir_em_processo(requisicoes):
+    cliente = run.app.test_client()
+    atual = []
+    for _ in range(requisicoes):
+        inicio = time.perf_counter()
+        resposta = cliente.get('/status')
+        atual.append((time.perf_counter() - inicio) * 1000)
+        assert resposta.status_code == 200
+
+    anterior = []
+    for _ in range(requisicoes):
+        inicio = time.perf_counter()
+        cliente.get('/status-anterior')
+        anterior.append((time.perf_counter() - inicio) * 1000)
+    return percentis(atual), percentis(anterior)
+
+def medir_http(porta, taxa, duracao, conexoes):
+    """Cada conexão dispara em sua fração da taxa agregada, com prazos absolutos"""
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+    periodo = conexoes / taxa
+    fim = time.perf_counter() + duracao
+
+    def cliente(deslocamento):
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+        locais = []
+        prazo = time.perf_counter() + deslocamento
+        while prazo < fim:
+            espera = prazo - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            inicio = time.perf_counter()
+            try:
+                conexao.request('GET', '/status')
+                resposta = conexao.getresponse()
+                resposta.read()
+                if resposta.status != 200:
+                    raise RuntimeError(resposta.status)
+                locais.append((time.perf_counter() - inicio) * 1000)
+            except Exception:
+                with lock:
+                    erros[0] += 1
+                conexao.close()
+                conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+            prazo += periodo
+        conexao.close()
+        with lock:
+            latencias.extend(locais)
+
+    threads = [threading.Thread(target=cliente, args=(i * periodo / conexoes,)) for i in range(conexoes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+    return latencias, erros[0], decorrido
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de latência de /status')
+    parser.add_argument('--requisicoes', type=int, default=5000, help='Requisições em processo')
+    parser.add_argument('--taxa', type=float, default=500, help='Requisições HTTP por segundo (agregado)')
+    parser.add_argument('--duracao', type=float, default=10, help='Duração da carga HTTP (s)')
+    parser.add_argument('--conexoes', type=int, default=8, help='Conexões keep-alive simultâneas')
+    parser.add_argument('--json', help='Salvar o resultado neste arquivo')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    # Só o arquivo de log (como num serviço sem terminal), sem ecoar no console
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        if type(handler) is logging.StreamHandler:
+            raiz.removeHandler(handler)
+    # A versão anterior roda dentro do mesmo ciclo de requisição do Flask
+    run.app.add_url_rule('/status-anterior', 'status_anterior', status_anterior)
+    run.init_database()
+    run.motor_aquisicao.iniciar()
+    while run.motor_aquisicao.instantaneo() is None:
+        time.sleep(0.01)
+
+    em_processo, anterior = medir_em_processo(args.requisicoes)
+
+    servidor = make_server('127.0.0.1', 0, run.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    latencias, erros, decorrido = medir_http(servidor.server_port, args.taxa, args.duracao, args.conexoes)
+    servidor.shutdown()
+    run.motor_aquisicao.parar()
+
+    resultado = {
+        'em_processo_ms': em_processo,
+        'anterior_em_processo_ms': anterior,
+        'http': {
+            'taxa_alvo': args.taxa,
+            'taxa_obtida': round(len(latencias) / decorrido, 1),
+            'conexoes': args.conexoes,
+            'requisicoes': len(latencias),
+            'erros': erros,
+            'latencia_ms': percentis(latencias) if latencias else None
+        }
+    }
+
+    print(f"Em processo ({args.requisicoes} requisições):")
+    print(f"  instantâneo : p50 {em_processo['p50']:.3f} ms, p99 {em_processo['p99']:.3f} ms")
+    print(f"  anterior    : p50 {anterior['p50']:.3f} ms, p99 {anterior['p99']:.3f} ms")
+    http_ = resultado['http']
+    print(f"HTTP keep-alive, {args.conexoes} conexões, alvo {args.taxa:g} req/s por {args.duracao:g}s:")
+    print(f"  obtido {http_['taxa_obtida']} req/s, {erros} erros")
+    if latencias:
+        lat = http_['latencia_ms']
+        print(f"  latência p50 {lat['p50']:.3f} ms, p90 {lat['p90']:.3f} ms, p99 {lat['p99']:.3f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+PowerEdge - Teste de carga ponta a ponta
+
+Extensão do demo.py (python demo.py --carga ...) para muitos clientes ao
+mesmo tempo contra um servidor já em execução: assinantes WebSocket e
+pollers REST que repetem o que cada aba do dashboard (static/script.js) faz:
+
+- ao abrir: GET /configuracao, /status, /estatisticas?periodo=24h e
+  /eventos?limite=10;
+- a cada intervalo_leitura (lido de /configuracao; 5 s se ausente, como no
+  script): /eventos?limite=10 na seção dashboard ou /eventos?limite=200 na
+  seção de eventos (--secao-eventos define a fração de clientes nela);
+- revalidação com If-None-Match, como o cache HTTP do navegador.
+
+Os assinantes WebSocket usam o protocolo v1 (o do dashboard) ou o v2 em JSON.
+O relatório traz vazão e latência p50/p95/p99 por endpoint, o atraso de
+cada quadro WebSocket (chegada menos o instante do ciclo de aquisição, no
+mesmo relógio quando o servidor é local) e CPU/RSS dos processos do
+servidor, lidos de /metricas durante a carga. Na implantação multiprocesso
+cada consulta abre uma conexão nova, então os workers aparecem um a um.
+
+    python carga.py --ws 2000 --pollers 500 --duracao 60 --json carga.json
+    python carga.py --port 8000 --ws-port 8000 --ws-path /ws --ws 1000 --comparar carga_anterior.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+
+ENDPOINTS_ABERTURA = ['/configuracao', '/status', '/estatisticas?periodo=24h', '/eventos?limite=10']
+ENDPOINT_DASHBOARD = '/eventos?limite=10'
+ENDPOINT_EVENTOS = '/eventos?limite=200'
+INTERVALO_PADRAO = 5.0  # script.js: intervalo_leitura || 5
+
+def percentis(valores):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * q / 100.0))], 2)
+    return {'n': len(ordenados), 'p50': p(50), 'p95': p(95), 'p99': p(99),
+            'max': round(ordenados[-1], 2), 'media': round(statistics.fmean(ordenados), 2)}
+
+def aumentar_limite_arquivos():
+    """
+    Milhares de conexões precisam de mais descritores que o limite padrão.
+    None onde não há limite por processo a ajustar (Windows, sem o módulo resource).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    suave, rigido = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if rigido == resource.RLIM_INFINITY or suave < rigido:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (rigido if rigido != resource.RLIM_INFINITY else 1 << 20, rigido))
+        except (ValueError, OSError):
+            pass
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+class ConexaoHTTP:
+    """Uma conexão HTTP/1.1 keep-alive, como a de uma aba do navegador"""
+
+    def __init__(self, host, porta):
+        self.host = host
+        self.porta = porta
+        self._leitor = None
+        self._escritor = None
+
+    async def _conectar(self):
+        self._leitor, self._escritor = await asyncio.open_connection(self.host, self.porta)
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+    async def get(self, caminho, etag=None, corpo=False):
+        """
+        (status, etag, tamanho do corpo), ou o corpo em bytes no lugar do
+        tamanho com corpo=True; reconecta se o servidor fechou a conexão
+        """
+        if self._escritor is None:
+            await self._conectar()
+        cabecalhos = f"GET {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+        if etag:
+            cabecalhos += f"If-None-Match: {etag}\r\n"
+        self._escritor.write((cabecalhos + "\r\n").encode('latin-1'))
+        await self._escritor.drain()
+
+        linha = await self._leitor.readline()
+        if not linha:
+            raise ConnectionResetError("conexão fechada pelo servidor")
+        status = int(linha.split()[1])
+        tamanho = None
+        fragmentado = False
+        fechar = False
+        etag_resposta = None
+        while True:
+            linha = await self._leitor.readline()
+            if linha in (b'\r\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            nome = nome.strip().lower()
+            valor = valor.strip()
+            if nome == 'content-length':
+                tamanho = int(valor)
+            elif nome == 'transfer-encoding' and 'chunked' in valor:
+                fragmentado = True
+            elif nome == 'connection' and 'close' in valor.lower():
+                fechar = True
+            elif nome == 'etag':
+                etag_resposta = valor
+        partes = []
+        if fragmentado:
+            while True:
+                tamanho_pedaco = int((await self._leitor.readline()).strip(), 16)
+                partes.append((await self._leitor.readexactly(tamanho_pedaco + 2))[:-2])
+                if tamanho_pedaco == 0:
+                    break
+        elif tamanho:
+            partes.append(await self._leitor.readexactly(tamanho))
+        if fechar:
+            self.fechar()
+        if corpo:
+            return status, etag_resposta, b''.join(partes)
+        return status, etag_resposta, sum(len(parte) for parte in partes)
+
+class GeradorCarga:
+    def __init__(self, host='localhost', port=5000, ws_port=8765, ws_path='', protocolo='v1',
+                 usar_etag=True):
+        self.host = host
+        self.port = port
+        self.ws_url = f"ws://{host}:{ws_port}{ws_path}" + ('/v2?codificacao=json' if protocolo == 'v2' else '')
+        self.protocolo = protocolo
+        self.usar_etag = usar_etag
+        self.ativo = True
+        self.intervalo = INTERVALO_PADRAO
+
+        # endpoint -> latências (ms); endpoint -> contadores
+        self.latencias = {}
+        self.contagem = {}
+        self.quadros = 0
+        self.atrasos_quadro = []
+        self.ws_conectados = 0
+        self.ws_falhas = []
+        self.ws_desconexoes = 0
+        # pid -> amostras (instante, cpu_s, rss_kb) lidas de /metricas
+        self.recursos = {}
+        self._instantes_iso = {}
+
+    def _registrar(self, endpoint, inicio, status=None, recebidos=0, erro=None):
+        contagem = self.contagem.setdefault(endpoint, {'requisicoes': 0, 'nao_modificado': 0,
+                                                       'erros': 0, 'bytes': 0})
+        if erro is not None or status not in (200, 304):
+            contagem['erros'] += 1
+            return
+        contagem['requisicoes'] += 1
+        contagem['bytes'] += recebidos
+        if status == 304:
+            contagem['nao_modificado'] += 1
+        self.latencias.setdefault(endpoint, []).append((time.perf_counter() - inicio) * 1000)
+
+    async def _requisitar(self, conexao, caminho, etags):
+        inicio = time.perf_counter()
+        try:
+            status, etag, recebidos = await asyncio.wait_for(
+                conexao.get(caminho, etags.get(caminho) if self.usar_etag else None), timeout=30
+            )
+            if etag:
+                etags[caminho] = etag
+            self._registrar(caminho, inicio, status, recebidos)
+            return status
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            conexao.fechar()
+            self._registrar(caminho, inicio, erro=e)
+            return None
+
+    async def obter_json(self, caminho):
+        """GET fora da medição, em uma conexão própria"""
+        conexao = ConexaoHTTP(self.host, self.port)
+        try:
+            _, _, corpo = await asyncio.wait_for(conexao.get(caminho, corpo=True), timeout=10)
+        finally:
+            conexao.fechar()
+        return json.loads(corpo)
+
+    async def poller(self, secao_eventos, fim, intervalo):
+        """Uma aba do dashboard: carga inicial e depois o setInterval de eventos"""
+        conexao = ConexaoHTTP(self.host, self.port)
+        etags = {}
+        for caminho in ENDPOINTS_ABERTURA:
+            await self._requisitar(conexao, caminho, etags)
+
+        caminho = ENDPOINT_EVENTOS if secao_eventos else ENDPOINT_DASHBOARD
+        proximo = time.perf_counter() + random.uniform(0, intervalo)
+        while self.ativo and time.perf_counter() < fim:
+            await asyncio.sleep(max(0.0, min(proximo, fim) - time.perf_counter()))
+            if not self.ativo or time.perf_counter() >= fim:
+                break
+            await self._requisitar(conexao, caminho, etags)
+            proximo += intervalo
+        conexao.fechar()
+
+    def _atraso_quadro(self, dados, chegada):
+        if self.protocolo == 'v2':
+            if dados.get('t') == 'l' and dados.get('itens'):
+                ts_ms = dados['itens'][-1]['ts']
+            else:
+                ts_ms = dados.get('ts')
+            return None if ts_ms is None else chegada - ts_ms / 1000.0
+        # v1: instante ISO (hora local) do ciclo em cada fonte
+        texto = next(iter(dados.values())).get('timestamp')
+        instante = self._instantes_iso.get(texto)
+        if instante is None:
+            if len(self._instantes_iso) > 1024:
+                self._instantes_iso.clear()
+            instante = self._instantes_iso[texto] = datetime.fromisoformat(texto).timestamp()
+        return chegada - instante
+
+    async def assinante(self, fim):
+        import websockets
+        try:
+            async with websockets.connect(self.ws_url, compression=None, open_timeout=30,
+                                          max_queue=None) as ws:
+                self.ws_conectados += 1
+                while self.ativo:
+                    restante = fim - time.perf_counter()
+                    if restante <= 0:
+                        break
+                    try:
+                        mensagem = await asyncio.wait_for(ws.recv(), timeout=restante)
+                    except asyncio.TimeoutError:
+                        break
+                    chegada = time.time()
+                    if not isinstance(mensagem, str):
+                        self.quadros += 1
+                        continue
+                    try:
+                        dados = json.loads(mensagem)
+                    except ValueError:
+                        dados = None
+                    # Quadros de controle (v2: "t" ok/erro; v1: "tipo") não são dados
+                    if isinstance(dados, dict) and (dados.get('t') in ('ok', 'erro') or 'tipo' in dados):
+                        continue
+                    self.quadros += 1
+                    try:
+                        atraso = self._atraso_quadro(dados, chegada)
+                    except (KeyError, StopIteration, AttributeError, TypeError, ValueError):
+                        atraso = None
+                    if atraso is not None:
+                        self.atrasos_quadro.append(atraso * 1000)
+        except websockets.exceptions.ConnectionClosed:
+            self.ws_desconexoes += 1
+        except Exception as e:
+            self.ws_falhas.append(type(e).__name__)
+
+    async def coletar_recursos(self, fim, intervalo):
+        """Lê CPU/RSS de /metricas; conexão nova a cada leitura para alcançar todos os workers"""
+        while self.ativo and time.perf_counter() < fim:
+            try:
+                processo = (await self.obter_json('/metricas')).get('processo') or {}
+                if processo.get('cpu_s') is not None:
+                    self.recursos.setdefault(processo['pid'], []).append(
+                        (time.perf_counter(), processo['cpu_s'], processo.get('rss_kb'), processo.get('papel'))
+                    )
+            except Exception:
+                pass
+            await asyncio.sleep(intervalo)
+
+    async def executar(self, ws, pollers, duracao, rampa, secao_eventos, intervalo_metricas):
+        # intervalo_leitura de /configuracao, como loadConfiguration() no script
+        try:
+            intervalo = float((await self.obter_json('/configuracao')).get('intervalo_leitura') or INTERVALO_PADRAO)
+        except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+            intervalo = INTERVALO_PADRAO
+        self.intervalo = intervalo
+
+        inicio = time.perf_counter()
+        fim = inicio + rampa + duracao
+        fim_rampa = inicio + rampa
+        tarefas = [asyncio.create_task(self.coletar_recursos(fim, intervalo_metricas))]
+
+        # Conexões espalhadas pela rampa, não todas no mesmo instante
+        clientes = [('ws', i) for i in range(ws)] + [('poller', i) for i in range(pollers)]
+        random.shuffle(clientes)
+        for n, (tipo, i) in enumerate(clientes):
+            alvo = inicio + rampa * n / max(1, len(clientes))
+            await asyncio.sleep(max(0.0, alvo - time.perf_counter()))
+            if tipo == 'ws':
+                tarefas.append(asyncio.create_task(self.assinante(fim)))
+            else:
+                tarefas.append(asyncio.create_task(self.poller(i < pollers * secao_eventos, fim, intervalo)))
+
+        # Medição só depois da rampa: descarta o que foi registrado durante ela
+        await asyncio.sleep(max(0.0, fim_rampa - time.perf_counter()))
+        self.latencias.clear()
+        self.contagem.clear()
+        self.quadros = 0
+        self.atrasos_quadro.clear()
+        inicio_medicao = time.perf_counter()
+        await asyncio.gather(*tarefas)
+        self.ativo = False
+        return time.perf_counter() - inicio_medicao
+
+    def relatorio(self, decorrido, parametros):
+        requisicoes = sum(c['requisicoes'] for c in self.contagem.values())
+        por_endpoint = {}
+        for endpoint in sorted(self.contagem):
+            contagem = self.contagem[endpoint]
+            por_endpoint[endpoint] = dict(contagem,
+                                          req_por_s=round(contagem['requisicoes'] / decorrido, 1),
+                                          latencia_ms=percentis(self.latencias.get(endpoint, [])))
+        processos = {}
+        for pid, amostras in sorted(self.recursos.items()):
+            primeiro, ultimo = amostras[0], amostras[-1]
+            cpu = None
+            if ultimo[0] > primeiro[0]:
+                cpu = round((ultimo[1] - primeiro[1]) / (ultimo[0] - primeiro[0]) * 100, 1)
+            processos[str(pid)] = {'papel': ultimo[3], 'cpu_pct': cpu,
+                                   'rss_mb': round(ultimo[2] / 1024, 1) if ultimo[2] else None,
+                                   'rss_mb_max': round(max(a[2] or 0 for a in amostras) / 1024, 1),
+                                   'amostras': len(amostras)}
+        return {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'parametros': dict(parametros, intervalo_polling=self.intervalo),
+            'duracao_s': round(decorrido, 2),
+            'http': {
+                'requisicoes': requisicoes,
+                'req_por_s': round(requisicoes / decorrido, 1),
+                'erros': sum(c['erros'] for c in self.contagem.values()),
+                'latencia_ms': percentis([l for lista in self.latencias.values() for l in lista]),
+                'endpoints': por_endpoint
+            },
+            'websocket': {
+                'conectados': self.ws_conectados,
+                'falhas_conexao': len(self.ws_falhas),
+                'desconexoes': self.ws_desconexoes,
+                'quadros': self.quadros,
+                'quadros_por_s': round(self.quadros / decorrido, 1),
+                'atraso_quadro_ms': percentis(self.atrasos_quadro)
+            },
+            'servidor': {
+                'processos': processos,
+                'cpu_pct': round(sum(p['cpu_pct'] or 0 for p in processos.values()), 1) if processos else None,
+                'rss_mb': round(sum(p['rss_mb'] or 0 for p in processos.values()), 1) if processos else None
+            }
+        }
+
+def _metricas_comparaveis(relatorio):
+    """Métricas principais achatadas (nome -> valor) para comparar relatórios"""
+    valores = {
+        'http.req_por_s': relatorio['http']['req_por_s'],
+        'http.erros': relatorio['http']['erros'],
+        'websocket.quadros_por_s': relatorio['websocket']['quadros_por_s'],
+        'websocket.falhas_conexao': relatorio['websocket']['falhas_conexao'],
+        'servidor.cpu_pct': relatorio['servidor']['cpu_pct'],
+        'servidor.rss_mb': relatorio['servidor']['rss_mb'],
+    }
+    for chave in ('p50', 'p99'):
+        valores[f'http.latencia_ms.{chave}'] = (relatorio['http']['latencia_ms'] or {}).get(chave)
+        valores[f'websocket.atraso_quadro_ms.{chave}'] = (relatorio['websocket']['atraso_quadro_ms'] or {}).get(chave)
+    for endpoint, dados in relatorio['http']['endpoints'].items():
+        valores[f'{endpoint}.p99'] = (dados['latencia_ms'] or {}).get('p99')
+    return valores
+
+def comparar(anterior, atual):
+    print(f"📈 Comparação com {anterior.get('gerado_em', 'relatório anterior')}:")
+    antes = _metricas_comparaveis(anterior)
+    depois = _metricas_comparaveis(atual)
+    for nome in sorted(set(antes) | set(depois)):
+        a, d = antes.get(nome), depois.get(nome)
+        if a is None or d is None:
+            print(f"   {nome:<40} {a!s:>10} -> {d!s:>10}")
+        else:
+            variacao = f"{(d - a) / a * 100:+.1f}%" if a else ""
+            print(f"   {nome:<40} {a:>10} -> {d:>10} {variacao}")
+
+def imprimir(relatorio):
+    http = relatorio['http']
+    ws = relatorio['websocket']
+    servidor = relatorio['servidor']
+    print(f"🌐 HTTP: {http['requisicoes']} requisições, {http['req_por_s']} req/s, {http['erros']} erros")
+    for endpoint, dados in http['endpoints'].items():
+        lat = dados['latencia_ms'] or {}
+        print(f"   {endpoint:<28} {dados['req_por_s']:>8} req/s  p50 {lat.get('p50')} ms  "
+              f"p95 {lat.get('p95')} ms  p99 {lat.get('p99')} ms  ({dados['nao_modificado']} 304, "
+              f"{dados['erros']} erros)")
+    atraso = ws['atraso_quadro_ms'] or {}
+    print(f"🔌 WebSocket: {ws['conectados']} conectados, {ws['falhas_conexao']} falhas, "
+          f"{ws['quadros_por_s']} quadros/s, atraso p50 {atraso.get('p50')} ms  p95 {atraso.get('p95')} ms  "
+          f"p99 {atraso.get('p99')} ms")
+    for pid, processo in servidor['processos'].items():
+        print(f"🖥️  pid {pid} ({processo['papel']}): CPU {processo['cpu_pct']}%, RSS {processo['rss_mb']} MB")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PowerEdge - Teste de carga ponta a ponta')
+    parser.add_argument('--host', default='localhost', help='Host do servidor')
+    parser.add_argument('--port', type=int, default=5000, help='Porta da API')
+    parser.add_argument('--ws-port', type=int, default=8765, help='Porta do WebSocket')
+    parser.add_argument('--ws-path', default='', help="Caminho do WebSocket ('/ws' no servidor ASGI)")
+    parser.add_argument('--ws', type=int, default=100, help='Assinantes WebSocket')
+    parser.add_argument('--pollers', type=int, default=100, help='Abas do dashboard fazendo polling REST')
+    parser.add_argument('--secao-eventos', type=float, default=0.2,
+                        help='Fração dos pollers na seção de eventos (limite=200)')
+    parser.add_argument('--protocolo', choices=['v1', 'v2'], default='v1', help='Protocolo dos assinantes WebSocket')
+    parser.add_argument('--sem-etag', action='store_true', help='Não revalidar com If-None-Match')
+    parser.add_argument('--duracao', type=float, default=30, help='Segundos de medição após a rampa')
+    parser.add_argument('--rampa', type=float, default=5, help='Segundos para abrir todas as conexões')
+    parser.add_argument('--intervalo-metricas', type=float, default=1.0, help='Segundos entre leituras de /metricas')
+    parser.add_argument('--json', help='Salvar o relatório neste arquivo')
+    parser.add_argument('--comparar', help='Relatório anterior (JSON) para comparar')
+    args = parser.parse_args(argv)
+
+    limite = aumentar_limite_arquivos()
+    if limite is not None and args.ws + args.pollers + 16 > limite:
+        print(f"⚠️  Limite de arquivos abertos ({limite}) menor que o número de conexões")
+
+    gerador = GeradorCarga(args.host, args.port, args.ws_port, args.ws_path, args.protocolo,
+                           usar_etag=not args.sem_etag)
+    print(f"🔋 PowerEdge - Teste de carga: {args.ws} assinantes WebSocket ({args.protocolo}), "
+          f"{args.pollers} pollers REST, {args.duracao:g}s após {args.rampa:g}s de rampa")
+    decorrido = asyncio.run(gerador.executar(args.ws, args.pollers, args.duracao, args.rampa,
+                                             args.secao_eventos, args.intervalo_metricas))
+    parametros = {chave: valor for chave, valor in vars(args).items() if chave not in ('json', 'comparar')}
+    relatorio = gerador.relatorio(decorrido, parametros)
+    imprimir(relatorio)
+
+    if args.comparar:
+        with open(args.comparar) as arquivo:
+            comparar(json.load(arquivo), relatorio)
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, sort_keys=True)
+
+if __name__ == "__main__":
+    main()
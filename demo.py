@@ -224,8 +224,17 @@ def main():
     parser.add_argument('--ws-port', type=int, default=8765, help='Porta do WebSocket')
     parser.add_argument('--api-only', action='store_true', help='Testar apenas API')
     parser.add_argument('--ws-only', action='store_true', help='Testar apenas WebSocket')
+    parser.add_argument('--carga', action='store_true',
+                        help='Teste de carga com muitos clientes (demais opções: python carga.py --help)')
     
-    args = parser.parse_args()
+    args, restantes = parser.parse_known_args()
+    
+    if args.carga:
+        import carga
+        carga.main(['--host', args.host, '--port', str(args.port), '--ws-port', str(args.ws_port)] + restantes)
+        return
+    if restantes:
+        parser.error(f"argumentos não reconhecidos: {' '.join(restantes)}")
     
     demo = PowerEdgeDemo(args.host, args.port, args.ws_port)
     
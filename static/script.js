@@ -1,8 +1,15 @@
 // Advanced PowerEdge Client - Modern JavaScript Application
 class PowerEdgeApp {
     constructor() {
-        this.wsUrl = `ws://${window.location.hostname}:8765`;
-        this.apiUrl = `http://${window.location.hostname}:5000`;
+        if (window.location.port === '5000' || window.location.protocol === 'file:') {
+            // Development server: Flask on 5000, WebSocket on 8765
+            this.wsUrl = `ws://${window.location.hostname}:8765`;
+            this.apiUrl = `http://${window.location.hostname}:5000`;
+        } else {
+            // ASGI server (app/servidor_asgi.py): API and WebSocket on the page's own port
+            this.wsUrl = `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${window.location.host}/ws`;
+            this.apiUrl = window.location.origin;
+        }
         this.ws = null;
         this.reconnectInterval = 5000;
         this.maxReconnectAttempts = 10;
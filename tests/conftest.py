@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os módulos de app/ são importados pelo nome, como nos benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
@@ -0,0 +1,201 @@
+"""
+Testes do anel de instantâneos em memória compartilhada.
+
+    python -m pytest tests/test_anel_compartilhado.py -q
+"""
+import json
+import threading
+import uuid
+
+import pytest
+
+import anel_compartilhado
+from anel_compartilhado import CONTADOR_CONFIG, CONTADOR_DADOS, AnelInstantaneos, LeitorAnel
+
+@pytest.fixture
+def anel():
+    anel = AnelInstantaneos.criar(f'pe_teste_{uuid.uuid4().hex[:12]}', slots=4, tamanho_slot=512,
+                                  inicio_ms=1234, hardware=True)
+    yield anel
+    anel.destruir()
+
+def ciclo(seq):
+    dados = json.dumps({'rede': {'tensao': 220.0 + seq, 'estado': 'ATIVA'}}).encode('utf-8')
+    extras = json.dumps({'apagao': [False, None, None], 'seq': seq}).encode('utf-8')
+    return dados, extras
+
+def publicar(anel, seq):
+    dados, extras = ciclo(seq)
+    anel.publicar(seq, 1000 * seq, 0.5 * seq, dados, extras)
+
+def test_cabecalho_visivel_para_quem_abre(anel):
+    worker = AnelInstantaneos.abrir(anel.nome)
+    try:
+        assert worker.slots == 4
+        assert worker.tamanho_slot == 512
+        assert worker.inicio_ms == 1234
+        assert worker.hardware is True
+        assert worker.dono is False
+    finally:
+        worker.fechar()
+
+def test_vazio_antes_do_primeiro_ciclo(anel):
+    assert anel.seq_atual() == 0
+    assert anel.ler() is None
+    assert anel.ler(1) is None
+
+def test_publicar_e_ler(anel):
+    publicar(anel, 1)
+    worker = AnelInstantaneos.abrir(anel.nome)
+    try:
+        dados, extras = ciclo(1)
+        assert worker.seq_atual() == 1
+        assert worker.ler() == (1, 1000, 0.5, dados, extras)
+        assert worker.ler(1) == (1, 1000, 0.5, dados, extras)
+        # Ciclo ainda não publicado
+        assert worker.ler(2) is None
+    finally:
+        worker.fechar()
+
+def test_extras_vazios(anel):
+    anel.publicar(1, 10, 0.0, b'{}')
+    assert anel.ler(1) == (1, 10, 0.0, b'{}', b'')
+
+def test_ciclo_maior_que_o_slot(anel):
+    with pytest.raises(ValueError):
+        anel.publicar(1, 0, 0.0, b'x' * anel.capacidade, b'y')
+    assert anel.seq_atual() == 0
+
+def test_volta_do_anel(anel):
+    for seq in range(1, 11):
+        publicar(anel, seq)
+    assert anel.seq_atual() == 10
+    # Os últimos `slots` ciclos continuam legíveis
+    for seq in range(7, 11):
+        registro = anel.ler(seq)
+        assert registro[0] == seq
+        assert registro[3:] == ciclo(seq)
+    # Os anteriores já foram sobrescritos
+    for seq in range(1, 7):
+        assert anel.ler(seq) is None
+
+def test_escrita_em_andamento_nao_e_lida(anel):
+    publicar(anel, 1)
+    publicar(anel, 2)
+    base = anel._base(5)  # mesmo slot do ciclo 1, que será sobrescrito
+    # Simula o escritor parado no meio do ciclo 5: versão ímpar no slot
+    anel_compartilhado._SEQ.pack_into(anel._buf, base, 2 * 5 - 1)
+    assert anel.ler(1) is None
+    # O último ciclo publicado segue intacto
+    assert anel.ler()[0] == 2
+
+def test_conteudo_corrompido_e_rejeitado(anel):
+    publicar(anel, 1)
+    inicio = anel._base(1) + anel_compartilhado._SLOT.size
+    anel._buf[inicio] ^= 0xFF
+    assert anel.ler(1) is None
+
+def test_leitor_recebe_ciclos_em_ordem(anel):
+    leitor = LeitorAnel(anel)
+    recebidos = []
+    leitor.assinar(lambda inst: recebidos.append(inst.seq))
+
+    publicar(anel, 1)
+    leitor.sincronizar()
+    publicar(anel, 2)
+    publicar(anel, 3)
+    leitor.sincronizar()
+
+    assert recebidos == [1, 2, 3]
+    assert leitor.ciclos_perdidos == 0
+    instantaneo = leitor.instantaneo()
+    assert instantaneo.seq == 3
+    assert instantaneo.ts_ms == 3000
+    assert instantaneo.dados == json.loads(ciclo(3)[0])
+    assert instantaneo.mensagem == ciclo(3)[0].decode('utf-8')
+    assert leitor.extras()['seq'] == 3
+
+def test_leitor_na_partida_pega_so_o_ultimo(anel):
+    for seq in range(1, 4):
+        publicar(anel, seq)
+    leitor = LeitorAnel(anel)
+    recebidos = []
+    leitor.assinar(lambda inst: recebidos.append(inst.seq))
+    leitor.sincronizar()
+    assert recebidos == [3]
+    assert leitor.ciclos_perdidos == 0
+
+def test_leitor_atrasado_conta_ciclos_perdidos(anel):
+    leitor = LeitorAnel(anel)
+    recebidos = []
+    leitor.assinar(lambda inst: recebidos.append(inst.seq))
+    publicar(anel, 1)
+    leitor.sincronizar()
+
+    # 10 ciclos sem ler: só os 4 últimos ainda estão no anel
+    for seq in range(2, 12):
+        publicar(anel, seq)
+    leitor.sincronizar()
+
+    assert recebidos == [1, 8, 9, 10, 11]
+    assert leitor.ciclos_perdidos == 6
+    assert leitor.metricas()['seq'] == 11
+
+def test_contadores_somam_as_celulas_dos_processos(anel):
+    assert anel.versao(CONTADOR_DADOS) == 0
+    assert anel.versao(CONTADOR_CONFIG) == 0
+    worker = AnelInstantaneos.abrir(anel.nome)
+    try:
+        anel.incrementar(CONTADOR_DADOS, 0)
+        worker.incrementar(CONTADOR_DADOS, 2)
+        worker.incrementar(CONTADOR_DADOS, 2)
+        worker.incrementar(CONTADOR_CONFIG, 3)
+        assert anel.versao(CONTADOR_DADOS) == worker.versao(CONTADOR_DADOS) == 3
+        assert anel.versao(CONTADOR_CONFIG) == 1
+    finally:
+        worker.fechar()
+
+def test_leitor_avisa_mudancas_de_versao(anel):
+    avisos = []
+    leitor = LeitorAnel(anel, ao_mudar_dados=lambda: avisos.append('dados'),
+                        ao_mudar_config=lambda: avisos.append('config'))
+    leitor.sincronizar()
+    assert avisos == []
+
+    anel.incrementar(CONTADOR_DADOS, 1)
+    leitor.sincronizar()
+    assert avisos == ['dados']
+
+    anel.incrementar(CONTADOR_CONFIG, 2)
+    anel.incrementar(CONTADOR_DADOS, 0)
+    leitor.sincronizar()
+    leitor.sincronizar()
+    assert avisos == ['dados', 'config', 'dados']
+
+def test_leituras_concorrentes_nunca_veem_ciclo_misturado(anel):
+    total = 20000
+    parar = threading.Event()
+
+    def escritor():
+        for seq in range(1, total + 1):
+            publicar(anel, seq)
+        parar.set()
+
+    worker = AnelInstantaneos.abrir(anel.nome)
+    thread = threading.Thread(target=escritor)
+    thread.start()
+    lidos = 0
+    try:
+        while not parar.is_set():
+            registro = worker.ler()
+            if registro is None:
+                continue
+            seq, ts_ms, monotonico, dados, extras = registro
+            assert (ts_ms, monotonico) == (1000 * seq, 0.5 * seq)
+            assert (dados, extras) == ciclo(seq)
+            lidos += 1
+    finally:
+        thread.join()
+        worker.fechar()
+    assert lidos > 0
+    assert anel.ler()[0] == total